@@ -1,4 +1,4 @@
 
 from ideal_spot.evaluate import EvaluateSpots
-from ideal_spot.spots import Spot
-from ideal_spot.targets import WeatherTarget
\ No newline at end of file
+from ideal_spot.spots import Spot, SpotCollection
+from ideal_spot.targets import WeatherTarget
@@ -0,0 +1,240 @@
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from json import dump, dumps
+import platform
+from time import perf_counter
+import tracemalloc
+from typing import Callable, Dict, List, Set
+
+import numpy as np
+import pandas
+from pandas import DataFrame
+
+from ideal_spot.cube import ForecastCube
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.feed import ForecastWeatherFeedFactory
+from ideal_spot.server import generate_forecast_payload
+from ideal_spot.spots import Spot, SpotCollection
+from ideal_spot.targets import IdealTempTarget, IdealWindTarget, NewRainTarget, WeatherTarget
+
+DEFAULT_SPOT_COUNTS = [10, 1000, 100000, 1000000]
+DEFAULT_DEPTHS = [1, 10, 200]
+
+# Per spot stages are measured on at most this many spots
+DEFAULT_MAX_SPOTS = 10000
+
+# Vectorized stages are measured on at most this many spot x decorator scores
+DEFAULT_MAX_SCORES = 20000000
+
+# Each stage is timed this many times after a warm-up run and the fastest run is kept
+DEFAULT_REPEATS = 3
+
+# Number of distinct synthetic forecasts shared out between spots
+PAYLOAD_COUNT = 100
+
+BENCHMARK_START = 1546300800
+BENCHMARK_METRICS = {'temp', 'wind', 'rain'}
+
+
+class SyntheticWeatherTarget(WeatherTarget):
+    """
+    WeatherTarget serving previously parsed synthetic forecasts, every
+    spot shares the forecast generated for its coordinates
+    """
+
+    def __init__(self, frames: List[DataFrame]):
+        super().__init__('benchmark')
+        self.frames = {(_get_lat(i), _get_long(i)): frame for i, frame in enumerate(frames)}
+
+    def generate_forecast_data(self, spot: Spot, metrics: Set[str]) -> DataFrame:
+        return self.frames[(spot.get_lat(), spot.get_long())]
+
+
+def generate_payloads(count: int = PAYLOAD_COUNT) -> List[bytes]:
+    return [dumps(generate_forecast_payload(_get_lat(i), _get_long(i), BENCHMARK_START)).encode()
+            for i in range(count)]
+
+
+def generate_target(depth: int, frames: List[DataFrame]) -> WeatherTarget:
+    """
+    Chain of depth decorators alternating temperature, wind and rain
+    targets over windows spread across the forecast
+    """
+
+    start = datetime.fromtimestamp(BENCHMARK_START)
+
+    target = SyntheticWeatherTarget(frames)
+    for i in range(depth):
+
+        range_start = start + timedelta(hours=3 * (i % 32))
+        range_end = range_start + timedelta(hours=3 * (1 + i % 8))
+        name = 'decorator_%d' % i
+
+        if i % 3 == 0:
+            target = IdealTempTarget(target, name, range_start, range_end, 290.0)
+        elif i % 3 == 1:
+            target = IdealWindTarget(target, name, range_start, range_end, 8.0)
+        else:
+            target = NewRainTarget(target, name, range_start, range_end)
+
+    return target
+
+
+def generate_collection(spot_count: int) -> SpotCollection:
+    index = np.arange(spot_count)
+    return SpotCollection(np.char.add('spot_', index.astype(str)).astype(object),
+                          np.array([_get_lat(i) for i in index % PAYLOAD_COUNT]),
+                          np.array([_get_long(i) for i in index % PAYLOAD_COUNT]))
+
+
+def run_benchmark(spot_counts: List[int] = None, depths: List[int] = None, max_spots: int = DEFAULT_MAX_SPOTS,
+                  max_scores: int = DEFAULT_MAX_SCORES, trace_memory: bool = True, label: str = None,
+                  repeats: int = DEFAULT_REPEATS) -> Dict:
+    """
+    Sweep spot counts and decorator chain depths over synthetic forecasts
+    and time each stage of an evaluation
+
+    Parameters
+    ----------
+    spot_counts : List[int]
+        Numbers of spots to evaluate
+    depths : List[int]
+        Numbers of decorators in the target chain
+    max_spots : int
+        Maximum number of spots the per spot parse and score stages are
+        measured on
+    max_scores : int
+        Maximum number of spot x decorator scores the vectorized scoring
+        and report stages are measured on
+    trace_memory : bool
+        Measure the peak memory allocated by each stage in an extra
+        traced run which is not timed
+    label : str
+        Optional label stored with the results, such as a commit id
+    repeats : int
+        Number of timed runs of each stage after a warm-up run, the
+        fastest run is reported
+
+    Returns
+    -------
+    Dict
+        Results with the throughput, run time and peak memory of each
+        stage for every spot count and depth
+    """
+
+    assert repeats > 0, 'Number of repeats %s must be positive' % str(repeats)
+
+    spot_counts = spot_counts if spot_counts is not None else DEFAULT_SPOT_COUNTS
+    depths = depths if depths is not None else DEFAULT_DEPTHS
+
+    payloads = generate_payloads()
+    feeds = [ForecastWeatherFeedFactory('benchmark', _get_lat(i), _get_long(i)).generate_feed(BENCHMARK_METRICS)
+             for i in range(len(payloads))]
+    frames = [feed._generate_data(payload) for feed, payload in zip(feeds, payloads)]
+    cube = ForecastCube.from_frames({'payload_%d' % i: frame for i, frame in enumerate(frames)},
+                                    sorted(BENCHMARK_METRICS))
+
+    results = []
+    for spot_count in spot_counts:
+        for depth in depths:
+
+            target = generate_target(depth, frames)
+            stages = dict()
+
+            parse_count = min(spot_count, max_spots)
+            stages['parse'] = _measure(lambda: [feeds[i % len(feeds)]._generate_data(payloads[i % len(payloads)])
+                                                for i in range(parse_count)], parse_count, trace_memory,
+                                       repeats)
+
+            score_count = min(spot_count, max_spots)
+            stages['score'] = _measure(lambda: EvaluateSpots.score_spots(
+                [Spot('spot_%d' % i, _get_lat(i), _get_long(i)) for i in range(score_count)], target),
+                score_count, trace_memory, repeats)
+
+            vectorized_count = max(1, min(spot_count, max_scores // depth))
+            collection = generate_collection(vectorized_count)
+
+            stages['cube'] = _measure(lambda: _tile_cube(cube, collection), vectorized_count, trace_memory,
+                                      repeats)
+            spot_cube = _tile_cube(cube, collection)
+
+            stages['score_vectorized'] = _measure(lambda: EvaluateSpots.score_spots_vectorized(
+                collection, target, cube=spot_cube), vectorized_count, trace_memory, repeats)
+            del spot_cube
+
+            stages['report'] = _measure(lambda: EvaluateSpots.generate_score_report(collection), vectorized_count,
+                                        trace_memory, repeats)
+
+            results.append({'spot_count': spot_count, 'depth': depth, 'stages': stages})
+
+    return {'label': label, 'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pandas.__version__,
+            'trace_memory': trace_memory, 'repeats': repeats, 'results': results}
+
+
+def _measure(function: Callable[[], object], spot_count: int, trace_memory: bool, repeats: int) -> Dict:
+
+    # Timed runs never trace allocations since tracing slows down every allocation
+    function()
+
+    seconds = None
+    for _ in range(repeats):
+        start = perf_counter()
+        function()
+        run_seconds = perf_counter() - start
+        seconds = run_seconds if seconds is None else min(seconds, run_seconds)
+
+    peak_memory = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {'spots': spot_count, 'seconds': seconds, 'spots_per_second': spot_count / seconds if seconds > 0 else None,
+            'peak_memory_bytes': peak_memory}
+
+
+def _tile_cube(cube: ForecastCube, collection: SpotCollection) -> ForecastCube:
+    payload_index = np.arange(len(collection)) % len(cube.get_names())
+    return ForecastCube(collection.get_names(), cube.get_times(), cube.get_metrics(), cube.get_values()[payload_index])
+
+
+def _get_lat(i: int) -> float:
+    return round(-60.0 + (i % PAYLOAD_COUNT) * 1.2, 3)
+
+
+def _get_long(i: int) -> float:
+    return round(-170.0 + (i % PAYLOAD_COUNT) * 3.4, 3)
+
+
+def main(args: List[str] = None):
+
+    parser = ArgumentParser(description='Benchmark feed parsing, scoring and report generation')
+    parser.add_argument('--spot-counts', type=int, nargs='+', default=DEFAULT_SPOT_COUNTS)
+    parser.add_argument('--depths', type=int, nargs='+', default=DEFAULT_DEPTHS)
+    parser.add_argument('--max-spots', type=int, default=DEFAULT_MAX_SPOTS)
+    parser.add_argument('--max-scores', type=int, default=DEFAULT_MAX_SCORES)
+    parser.add_argument('--no-trace-memory', action='store_true', help='Skip measuring peak memory')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help='Timed runs of each stage after a warm-up run, the fastest is reported')
+    parser.add_argument('--label', help='Label stored with the results such as a commit id')
+    parser.add_argument('--output', help='Path of the JSON results, printed when not given')
+    parsed_args = parser.parse_args(args)
+
+    results = run_benchmark(parsed_args.spot_counts, parsed_args.depths, parsed_args.max_spots,
+                            parsed_args.max_scores, not parsed_args.no_trace_memory, parsed_args.label,
+                            parsed_args.repeats)
+
+    if parsed_args.output is None:
+        print(dumps(results, indent=2))
+        return
+
+    with open(parsed_args.output, 'w') as output_file:
+        dump(results, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+from collections import OrderedDict
+import sqlite3
+from threading import Lock
+from time import time
+from typing import Callable, Dict, Tuple
+
+# OpenWeatherMap publishes a new 5 day / 3 hr forecast run every three hours
+FORECAST_CYCLE = 3 * 60 * 60
+
+
+class ForecastCache:
+    """
+    Two level cache of raw forecast API responses keyed by normalized
+    lat / long coordinates. An in-memory LRU is backed by an optional
+    SQLite store so responses survive between runs. Entries expire after
+    the TTL and, unless align_to_cycle is disabled, at the next forecast
+    cycle boundary when a fresh forecast is published.
+
+    Coordinates are rounded to precision decimal places, so spots closer
+    than that share one entry. The default of 4 places (about 11 m) only
+    merges spots at practically the same location, a precision of 2
+    (about 1 km) trades accuracy for sharing forecasts between nearby
+    spots.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = 1024, ttl: float = FORECAST_CYCLE,
+                 align_to_cycle: bool = True, precision: int = 4, clock: Callable[[], float] = time):
+        assert max_entries > 0, 'Max entries %s must be positive' % str(max_entries)
+        assert ttl > 0, 'TTL %s must be positive' % str(ttl)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.align_to_cycle = align_to_cycle
+        self.precision = precision
+        self.clock = clock
+
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        self.lock = Lock()
+
+        self.connection = None
+        if path is not None:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS forecast_cache '
+                                    '(key TEXT PRIMARY KEY, api_data BLOB, expires_at REAL)')
+            self.connection.commit()
+
+    def get(self, lat: float, long: float) -> bytes:
+        """
+        Return the cached raw response for the coordinates or None
+        if no unexpired entry exists
+        """
+        return self.get_entry(self.get_key(lat, long))
+
+    def get_entry(self, key: str) -> bytes:
+        """
+        Return the cached raw response stored under a key or None if no
+        unexpired entry exists
+        """
+
+        with self.lock:
+            now = self.clock()
+            entry = self.entries.get(key)
+
+            if entry is None and self.connection is not None:
+                row = self.connection.execute('SELECT api_data, expires_at FROM forecast_cache WHERE key = ?',
+                                              (key,)).fetchone()
+                if row is not None:
+                    entry = (bytes(row[0]), row[1])
+                    self._add_entry(key, entry)
+
+            if entry is not None and entry[1] <= now:
+                self._remove_entry(key)
+                self.stats['expirations'] += 1
+                entry = None
+
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def set(self, lat: float, long: float, api_data: bytes):
+        self.set_entry(self.get_key(lat, long), api_data)
+
+    def set_entry(self, key: str, api_data: bytes):
+        with self.lock:
+            entry = (api_data, self._get_expiry(self.clock()))
+            self._add_entry(key, entry)
+
+            if self.connection is not None:
+                self.connection.execute('INSERT OR REPLACE INTO forecast_cache VALUES (?, ?, ?)',
+                                        (key, api_data, entry[1]))
+                self.connection.commit()
+
+    def contains(self, lat: float, long: float) -> bool:
+        """
+        Check for an unexpired entry without touching the statistics
+        """
+
+        key = self.get_key(lat, long)
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None and self.connection is not None:
+                row = self.connection.execute('SELECT expires_at FROM forecast_cache WHERE key = ?',
+                                              (key,)).fetchone()
+                if row is not None:
+                    return row[0] > self.clock()
+
+            return entry is not None and entry[1] > self.clock()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.connection is not None:
+                self.connection.execute('DELETE FROM forecast_cache')
+                self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def __getstate__(self) -> Dict:
+        # The SQLite connection and lock are reopened by the copy, in memory entries are copied
+        with self.lock:
+            return {'config': {'path': self.path, 'max_entries': self.max_entries, 'ttl': self.ttl,
+                               'align_to_cycle': self.align_to_cycle, 'precision': self.precision,
+                               'clock': self.clock},
+                    'entries': list(self.entries.items())}
+
+    def __setstate__(self, state: Dict):
+        self.__init__(**state['config'])
+        self.entries.update(state['entries'])
+
+    def get_key(self, lat: float, long: float) -> str:
+        return f'{round(lat, self.precision):.{self.precision}f},{round(long, self.precision):.{self.precision}f}'
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.stats)
+
+    def _add_entry(self, key: str, entry: Tuple[bytes, float]):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _get_expiry(self, now: float) -> float:
+        expires_at = now + self.ttl
+        if self.align_to_cycle:
+            expires_at = min(expires_at, (now // FORECAST_CYCLE + 1) * FORECAST_CYCLE)
+        return expires_at
+
+    def _remove_entry(self, key: str):
+        self.entries.pop(key, None)
+        if self.connection is not None:
+            self.connection.execute('DELETE FROM forecast_cache WHERE key = ?', (key,))
+            self.connection.commit()
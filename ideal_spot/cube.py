@@ -0,0 +1,116 @@
+from json import dump, load
+import os
+from typing import Dict, List
+
+import numpy as np
+from pandas import DataFrame, DatetimeIndex
+
+from ideal_spot.targets import TIME_UNIT
+
+
+class ForecastCube:
+    """
+    Compact store of forecasts for many spots as one contiguous
+    spot x time x metric float32 array over a shared time axis.
+    Times a spot has no forecast for are NaN. Cubes are saved as a
+    directory of NumPy files which may be memory-mapped when loaded.
+    """
+
+    VALUES_FILE = 'values.npy'
+    TIMES_FILE = 'times.npy'
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, names: List[str], times: np.ndarray, metrics: List[str], values: np.ndarray):
+        assert values.shape == (len(names), len(times), len(metrics)), \
+            'Values shape %s does not match %d spots, %d times and %d metrics' % (str(values.shape), len(names),
+                                                                                 len(times), len(metrics))
+
+        self.names = list(names)
+        self.name_index = {name: i for i, name in enumerate(self.names)}
+        self.times = times.astype(TIME_UNIT)
+        self.metrics = list(metrics)
+        self.values = values
+
+        assert len(self.name_index) == len(self.names), 'Spot names must be unique'
+
+    def get_names(self) -> List[str]:
+        return self.names
+
+    def get_times(self) -> np.ndarray:
+        return self.times
+
+    def get_metrics(self) -> List[str]:
+        return self.metrics
+
+    def get_values(self) -> np.ndarray:
+        return self.values
+
+    def get_spot_index(self, name: str) -> int:
+        return self.name_index[name]
+
+    def get_frame(self, name: str) -> DataFrame:
+        """
+        Forecast DataFrame for a single spot in the same layout as
+        the forecast feeds, times without data are dropped
+        """
+
+        spot_values = self.values[self.name_index[name]]
+        available = ~np.all(np.isnan(spot_values), axis=1)
+
+        times = self.times[available]
+        columns = {'datetime': times}
+        for i, metric in enumerate(self.metrics):
+            columns[metric] = spot_values[available, i]
+
+        return DataFrame(columns, index=DatetimeIndex(times))
+
+    def save(self, path: str):
+
+        os.makedirs(path, exist_ok=True)
+
+        np.save(os.path.join(path, ForecastCube.VALUES_FILE), self.values)
+        np.save(os.path.join(path, ForecastCube.TIMES_FILE), self.times.astype(np.int64))
+
+        with open(os.path.join(path, ForecastCube.INDEX_FILE), 'w') as index_file:
+            dump({'names': self.names, 'metrics': self.metrics, 'time_unit': TIME_UNIT}, index_file)
+
+    @staticmethod
+    def load(path: str, mmap: bool = True) -> 'ForecastCube':
+
+        with open(os.path.join(path, ForecastCube.INDEX_FILE)) as index_file:
+            index = load(index_file)
+
+        values = np.load(os.path.join(path, ForecastCube.VALUES_FILE), mmap_mode='r' if mmap else None)
+        times = np.load(os.path.join(path, ForecastCube.TIMES_FILE)).astype(index['time_unit'])
+
+        return ForecastCube(index['names'], times, index['metrics'], values)
+
+    @staticmethod
+    def from_frames(frames: Dict[str, DataFrame], metrics: List[str]) -> 'ForecastCube':
+        """
+        Stack forecast DataFrames keyed by spot name onto a shared time axis
+
+        Parameters
+        ----------
+        frames : Dict[str, DataFrame]
+            Forecast data for each spot with a datetime column
+        metrics : List[str]
+            Metric columns to store
+
+        Returns
+        -------
+        ForecastCube
+            Cube holding the metrics of every spot
+        """
+
+        spot_times = [frame['datetime'].to_numpy().astype(TIME_UNIT) for frame in frames.values()]
+        times = np.unique(np.concatenate(spot_times)) if len(frames) > 0 else np.array([], dtype=TIME_UNIT)
+
+        values = np.full((len(frames), len(times), len(metrics)), np.nan, dtype=np.float32)
+
+        for i, (frame, frame_times) in enumerate(zip(frames.values(), spot_times)):
+            time_index = np.searchsorted(times, frame_times)
+            for j, metric in enumerate(metrics):
+                values[i, time_index, j] = frame[metric].to_numpy(dtype=np.float32)
+
+        return ForecastCube(list(frames), times, metrics, values)
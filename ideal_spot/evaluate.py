@@ -1,8 +1,19 @@
-from typing import Set, Dict
+from asyncio import gather, Semaphore
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Union
 
-from pandas import DataFrame
+import numpy as np
+from pandas import DataFrame, Index
 
-from ideal_spot.spots import Spot
+from ideal_spot.cube import ForecastCube
+from ideal_spot.feed import LazyClientSession
+from ideal_spot.plan import get_weight_vector, ScoringPlan
+from ideal_spot.report import TopScoreReport
+from ideal_spot.spatial import GridIndex, SpatialIndex
+from ideal_spot.spots import Spot, SpotCollection
 from ideal_spot.targets import WeatherTarget
 
 
@@ -13,9 +24,11 @@ class EvaluateSpots:
     """
 
     @staticmethod
-    def generate_spots(df: DataFrame, name_column: str, lat_column: str, long_column: str) -> Set[Spot]:
+    def generate_spots(df: DataFrame, name_column: str, lat_column: str, long_column: str,
+                       as_collection: bool = False) -> Union[Set[Spot], SpotCollection]:
         """
-        Convert pandas DataFrame into set of Spot classes
+        Convert pandas DataFrame into set of Spot classes or a column
+        based SpotCollection suitable for a large number of spots
 
         Parameters
         ----------
@@ -27,13 +40,18 @@ class EvaluateSpots:
             Name of column for latitude float value
         long_column : str
             Name of column for longitude float value
+        as_collection : bool
+            Return a SpotCollection instead of a set of Spot classes
 
         Returns
         -------
-        Set[Spot]
-            Set of configured Spot classes
+        Union[Set[Spot], SpotCollection]
+            Set of configured Spot classes or SpotCollection
         """
 
+        if as_collection:
+            return SpotCollection.from_dataframe(df, name_column, lat_column, long_column)
+
         spots_data = df[[name_column, lat_column, long_column]].to_dict('records')
 
         spots = set()
@@ -44,13 +62,411 @@ class EvaluateSpots:
         return spots
 
     @staticmethod
-    def score_spots(spots: Set[Spot], target: WeatherTarget, score_weight_map: Dict[str, float] = None) -> Set[Spot]:
+    def score_spots(spots: Union[Set[Spot], SpotCollection], target: WeatherTarget,
+                    score_weight_map: Dict[str, float] = None, workers: int = None) -> Union[Set[Spot], SpotCollection]:
         """
         Apply scoring to a set of Spots using a configured WeatherTarget.
         An weight map may be used to adjust the individual weight of the
         WeatherTarget decorators. The string keys are based on the names
         specified for the individual decorator.
 
+        If a number of workers is given the spots are evaluated concurrently
+        using a thread pool. The forecast data is passed explicitly through
+        the WeatherTarget decorator chain so a single target is shared by
+        all workers.
+
+        Parameters
+        ----------
+        spots : Union[Set[Spot], SpotCollection]
+            Set or collection of un-scored spots
+        target : WeatherTarget
+            Configure WeatherTarget class used to generate scores
+        score_weight_map : Dict[str, float]
+            Optional weight map for WeatherClass decorators
+        workers : int
+            Optional number of worker threads used to evaluate spots
+
+        Returns
+        -------
+        Union[Set[Spot], SpotCollection]
+            Spots with scores and overall score set
+        """
+
+        for _ in EvaluateSpots.iter_score_spots(spots, target, score_weight_map, workers):
+            pass
+
+        return spots
+
+    @staticmethod
+    def iter_score_spots(spots: Iterable[Spot], target: WeatherTarget, score_weight_map: Dict[str, float] = None,
+                         workers: int = None) -> Iterator[Spot]:
+        """
+        Score Spots in the same way as score_spots yielding each Spot
+        as soon as it has been scored, which allows reports to be built
+        while scoring is still in progress
+
+        Parameters
+        ----------
+        spots : Iterable[Spot]
+            Un-scored spots
+        target : WeatherTarget
+            Configure WeatherTarget class used to generate scores
+        score_weight_map : Dict[str, float]
+            Optional weight map for WeatherClass decorators
+        workers : int
+            Optional number of worker threads used to evaluate spots
+
+        Returns
+        -------
+        Iterator[Spot]
+            Spots with scores and overall score set
+        """
+
+        if workers is None:
+
+            for spot in spots:
+                target.evaluate_spot(spot)
+                spot.set_overall_score(EvaluateSpots.calculate_overall_score(spot.get_scores(), score_weight_map))
+                yield spot
+
+            return
+
+        assert workers > 0, 'Number of workers %s must be positive' % str(workers)
+
+        # At most two spots per worker are in flight so spots are read from the iterable as they are scored
+        spot_iterator = iter(spots)
+        futures = deque()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for spot in islice(spot_iterator, 2 * workers):
+                futures.append(executor.submit(EvaluateSpots._evaluate_spot, spot, target))
+
+            while len(futures) > 0:
+                spot = futures.popleft().result()
+
+                for next_spot in islice(spot_iterator, 1):
+                    futures.append(executor.submit(EvaluateSpots._evaluate_spot, next_spot, target))
+
+                spot.set_overall_score(EvaluateSpots.calculate_overall_score(spot.get_scores(), score_weight_map))
+                yield spot
+
+    @staticmethod
+    def score_spots_vectorized(spots: Union[Set[Spot], SpotCollection], target: WeatherTarget,
+                               score_weight_map: Dict[str, float] = None, workers: int = None,
+                               cube: ForecastCube = None) -> Union[Set[Spot], SpotCollection]:
+        """
+        Apply scoring to a set of Spots using a ScoringPlan compiled from
+        the WeatherTarget decorator chain. Forecast data for all spots is
+        stacked into a ForecastCube and every decorator is scored for all
+        spots at once. Only Range and IdealValue decorators are supported.
+
+        Parameters
+        ----------
+        spots : Union[Set[Spot], SpotCollection]
+            Set or collection of un-scored spots
+        target : WeatherTarget
+            Configure WeatherTarget class used to generate scores
+        score_weight_map : Dict[str, float]
+            Optional weight map for WeatherClass decorators
+        workers : int
+            Optional number of worker threads used to fetch forecast data
+        cube : ForecastCube
+            Optional previously generated forecast data for the spots,
+            no forecast data is fetched when given
+
+        Returns
+        -------
+        Union[Set[Spot], SpotCollection]
+            Spots with scores and overall score set
+        """
+
+        plan = ScoringPlan(target)
+
+        if cube is None:
+            cube = EvaluateSpots.generate_forecast_cube(spots, target, workers)
+
+        if isinstance(spots, SpotCollection):
+            spot_list = None
+            spot_index = [cube.get_spot_index(name) for name in spots.get_names()]
+        else:
+            spot_list = list(spots)
+            spot_index = [cube.get_spot_index(spot.get_name()) for spot in spot_list]
+
+        scores = plan.score_cube(cube)[spot_index]
+
+        score_names = plan.get_score_names()
+        overall_scores = scores @ get_weight_vector(score_names, score_weight_map)
+
+        if spot_list is None:
+            spots.set_score_matrix(score_names, scores)
+            spots.set_overall_scores(overall_scores)
+            return spots
+
+        for spot, spot_scores, overall_score in zip(spot_list, scores.tolist(), overall_scores.tolist()):
+            spot.set_scores(dict(zip(score_names, spot_scores)))
+            spot.set_overall_score(overall_score)
+
+        return spots
+
+    @staticmethod
+    def find_best_windows(spots: Union[Set[Spot], SpotCollection], target: WeatherTarget,
+                          score_weight_map: Dict[str, float] = None, top_n: int = 10, workers: int = None,
+                          cube: ForecastCube = None) -> DataFrame:
+        """
+        Find the best combinations of spot and start time for a target.
+        The decorator windows of the target are shifted together so that
+        the earliest range start falls on every forecast time for which
+        the whole shifted window is covered by the forecast. All spots
+        and start times are scored in a single vectorized pass.
+
+        Parameters
+        ----------
+        spots : Union[Set[Spot], SpotCollection]
+            Set or collection of spots
+        target : WeatherTarget
+            Configure WeatherTarget class with Range or IdealValue decorators
+        score_weight_map : Dict[str, float]
+            Optional weight map for WeatherClass decorators
+        top_n : int
+            Number of best spot and start time combinations returned
+        workers : int
+            Optional number of worker threads used to fetch forecast data
+        cube : ForecastCube
+            Optional previously generated forecast data for the spots
+
+        Returns
+        -------
+        DataFrame
+            Best spot and window combinations sorted by overall score
+        """
+
+        plan = ScoringPlan(target)
+
+        if cube is None:
+            cube = EvaluateSpots.generate_forecast_cube(spots, target, workers)
+
+        spot_list = list(spots)
+        spot_index = [cube.get_spot_index(spot.get_name()) for spot in spot_list]
+
+        times = cube.get_times()
+        span = np.timedelta64(plan.get_span(), 'us')
+        starts = times[times + span <= times[-1]] if len(times) > 0 else times
+
+        scores = plan.score_window_starts(times, cube.get_values()[spot_index], cube.get_metrics(), starts)
+        overall_scores = scores @ get_weight_vector(plan.get_score_names(), score_weight_map)
+
+        top_n = min(top_n, overall_scores.size)
+        best = np.argpartition(-overall_scores, top_n - 1, axis=None)[:top_n] if top_n > 0 else np.array([], int)
+        spot_rows, start_columns = np.unravel_index(best, overall_scores.shape)
+
+        data = []
+        for spot_row, start_column in zip(spot_rows, start_columns):
+            spot = spot_list[spot_row]
+            start = starts[start_column].astype(datetime)
+            window_data = {'name': spot.get_name(), 'lat': spot.get_lat(), 'long': spot.get_long(),
+                           'start': start, 'end': start + plan.get_span(),
+                           'overall_score': float(overall_scores[spot_row, start_column])}
+            window_data.update(zip(plan.get_score_names(), scores[spot_row, start_column].tolist()))
+            data.append(window_data)
+
+        df = DataFrame(data, columns=['name', 'lat', 'long', 'start', 'end', 'overall_score']
+                       + plan.get_score_names())
+        df = df.sort_values('overall_score', ascending=False)
+
+        return df
+
+    @staticmethod
+    def score_spots_snapped(spots: Union[Set[Spot], SpotCollection], target: WeatherTarget,
+                            score_weight_map: Dict[str, float] = None, spatial_index: SpatialIndex = None,
+                            workers: int = None) -> Union[Set[Spot], SpotCollection]:
+        """
+        Score Spots in the same way as score_spots after snapping them to
+        the cells of a spatial index. Forecast data is fetched and parsed
+        once for the center of each cell and shared by every spot within
+        it, each spot is still scored individually.
+
+        Parameters
+        ----------
+        spots : Union[Set[Spot], SpotCollection]
+            Set or collection of un-scored spots
+        target : WeatherTarget
+            Configure WeatherTarget class used to generate scores
+        score_weight_map : Dict[str, float]
+            Optional weight map for WeatherClass decorators
+        spatial_index : SpatialIndex
+            Optional index used to snap spots, defaults to a 0.01 degree grid
+        workers : int
+            Optional number of worker threads used to fetch forecast data
+
+        Returns
+        -------
+        Union[Set[Spot], SpotCollection]
+            Spots with scores and overall score set
+        """
+
+        if spatial_index is None:
+            spatial_index = GridIndex()
+
+        metrics = target.get_forecast_metrics()
+        cell_spots = spatial_index.group_spots(spots)
+
+        def score_cell(cell) -> int:
+
+            lat, long = spatial_index.get_cell_center(cell)
+            forecast_data = target.generate_forecast_data(Spot(str(cell), lat, long), metrics)
+
+            for spot in cell_spots[cell]:
+                spot.set_scores(target.calculate_scores(spot, forecast_data))
+                spot.set_overall_score(EvaluateSpots.calculate_overall_score(spot.get_scores(), score_weight_map))
+
+            return len(cell_spots[cell])
+
+        if workers is None:
+            for cell in cell_spots:
+                score_cell(cell)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(score_cell, cell_spots))
+
+        return spots
+
+    @staticmethod
+    def generate_forecast_cube(spots: Set[Spot], target: WeatherTarget, workers: int = None,
+                               spatial_index: SpatialIndex = None, all_columns: bool = False) -> ForecastCube:
+        """
+        Fetch the forecast data required by a WeatherTarget for a set
+        of Spots and store it in a ForecastCube keyed by spot name
+
+        Parameters
+        ----------
+        spots : Set[Spot]
+            Set of spots
+        target : WeatherTarget
+            Configure WeatherTarget class used to fetch forecast data
+        workers : int
+            Optional number of worker threads used to fetch forecast data
+        spatial_index : SpatialIndex
+            Optional index used to snap spots, forecast data is then
+            fetched once for the center of each cell
+        all_columns : bool
+            Store every value column of the feeds, such as temp_min and
+            temp_max, rather than only the metric columns
+
+        Returns
+        -------
+        ForecastCube
+            Forecast data for every spot
+        """
+
+        metrics = target.get_forecast_metrics()
+
+        if spatial_index is None:
+            fetch_spots = {spot.get_name(): spot for spot in spots}
+            spot_fetch_keys = {name: name for name in fetch_spots}
+        else:
+            fetch_spots = dict()
+            spot_fetch_keys = dict()
+            for cell, cell_spot_list in spatial_index.group_spots(spots).items():
+                fetch_spots[cell] = Spot(str(cell), *spatial_index.get_cell_center(cell))
+                spot_fetch_keys.update((spot.get_name(), cell) for spot in cell_spot_list)
+
+        def fetch_forecast_data(spot: Spot) -> DataFrame:
+            return target.generate_forecast_data(spot, metrics)
+
+        fetch_spot_list = list(fetch_spots.values())
+        if workers is None:
+            frames = [fetch_forecast_data(spot) for spot in fetch_spot_list]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                frames = list(executor.map(fetch_forecast_data, fetch_spot_list))
+
+        fetch_frames = dict(zip(fetch_spots, frames))
+
+        columns = sorted(metrics)
+        if all_columns and len(frames) > 0:
+            columns = sorted(set.intersection(*[set(frame.columns) for frame in frames]) - {'datetime'})
+
+        return ForecastCube.from_frames({name: fetch_frames[key] for name, key in spot_fetch_keys.items()}, columns)
+
+    @staticmethod
+    def score_spots_multi_target(spots: Set[Spot], targets: Dict[str, WeatherTarget],
+                                 score_weight_maps: Dict[str, Dict[str, float]] = None,
+                                 workers: int = None) -> Dict[str, Set[Spot]]:
+        """
+        Score a set of Spots against several WeatherTargets at once.
+        Forecast data is fetched at most once for each coordinate, parsed
+        with every metric required by any target and shared by all targets.
+        The data is fetched using the configuration of the first target.
+
+        Parameters
+        ----------
+        spots : Set[Spot]
+            Set of un-scored spots
+        targets : Dict[str, WeatherTarget]
+            Configured WeatherTarget classes keyed by target name
+        score_weight_maps : Dict[str, Dict[str, float]]
+            Optional weight maps keyed by target name
+        workers : int
+            Optional number of worker threads used to fetch forecast data
+
+        Returns
+        -------
+        Dict[str, Set[Spot]]
+            Set of scored copies of the Spots for each target name
+        """
+
+        assert len(targets) > 0, 'At least one target is required'
+
+        fetch_target = next(iter(targets.values()))
+        metrics = set()
+        for target in targets.values():
+            metrics.update(target.get_forecast_metrics())
+
+        coordinate_spots = dict()
+        for spot in spots:
+            coordinate_spots.setdefault((spot.get_lat(), spot.get_long()), []).append(spot)
+
+        def fetch_forecast_data(coordinate_spot_list: List[Spot]) -> DataFrame:
+            return fetch_target.generate_forecast_data(coordinate_spot_list[0], metrics)
+
+        target_spots = {target_name: set() for target_name in targets}
+
+        executor = ThreadPoolExecutor(max_workers=workers) if workers is not None else None
+        try:
+            spot_lists = list(coordinate_spots.values())
+            if executor is None:
+                feed_data_list = map(fetch_forecast_data, spot_lists)
+            else:
+                feed_data_list = executor.map(fetch_forecast_data, spot_lists)
+
+            for spot_list, feed_data in zip(spot_lists, feed_data_list):
+                for spot in spot_list:
+                    for target_name, target in targets.items():
+
+                        score_weight_map = None
+                        if score_weight_maps is not None:
+                            score_weight_map = score_weight_maps.get(target_name)
+
+                        target_spot = Spot(spot.get_name(), spot.get_lat(), spot.get_long())
+                        target_spot.set_scores(target.calculate_scores(target_spot, feed_data))
+                        target_spot.set_overall_score(
+                            EvaluateSpots.calculate_overall_score(target_spot.get_scores(), score_weight_map))
+                        target_spots[target_name].add(target_spot)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return target_spots
+
+    @staticmethod
+    async def score_spots_async(spots: Set[Spot], target: WeatherTarget, score_weight_map: Dict[str, float] = None,
+                                concurrency: int = 100) -> Set[Spot]:
+        """
+        Coroutine version of score_spots which fetches forecast data using
+        a non-blocking HTTP session shared by all spots, the session is
+        only opened once a spot needs a request. The number of spot
+        evaluations in flight at once is bounded by the concurrency.
+
         Parameters
         ----------
         spots : Set[Spot]
@@ -59,6 +475,8 @@ class EvaluateSpots:
             Configure WeatherTarget class used to generate scores
         score_weight_map : Dict[str, float]
             Optional weight map for WeatherClass decorators
+        concurrency : int
+            Maximum number of concurrent spot evaluations
 
         Returns
         -------
@@ -66,32 +484,139 @@ class EvaluateSpots:
             Set of Spots with scores and overall score set
         """
 
-        for spot in spots:
+        assert concurrency > 0, 'Concurrency %s must be positive' % str(concurrency)
 
-            target.evaluate_spot(spot)
+        semaphore = Semaphore(concurrency)
 
-            overall_score = 0.0
-            for score_name, score in spot.get_scores().items():
+        async def evaluate_spot(spot: Spot, session):
+            async with semaphore:
+                await target.evaluate_spot_async(spot, session)
+            spot.set_overall_score(EvaluateSpots.calculate_overall_score(spot.get_scores(), score_weight_map))
 
-                weight = 1.0
-                if score_weight_map is not None and score_name in score_weight_map:
-                    weight = score_weight_map[score_name]
-                overall_score += score * weight
-
-            spot.set_overall_score(overall_score)
+        async with LazyClientSession(concurrency) as session:
+            await gather(*[evaluate_spot(spot, session) for spot in spots])
 
         return spots
 
     @staticmethod
-    def generate_score_report(spots: Set[Spot]) -> DataFrame:
+    def calculate_overall_score(scores: Dict[str, float], score_weight_map: Dict[str, float] = None) -> float:
+        """
+        Combine individual decorator scores into an overall score using
+        an optional weight map, scores without a weight default to 1.0
+
+        Parameters
+        ----------
+        scores : Dict[str, float]
+            Individual decorator scores keyed by decorator name
+        score_weight_map : Dict[str, float]
+            Optional weight map for WeatherClass decorators
+
+        Returns
+        -------
+        float
+            Weighted overall score
+        """
+
+        overall_score = 0.0
+        for score_name, score in scores.items():
+
+            weight = 1.0
+            if score_weight_map is not None and score_name in score_weight_map:
+                weight = score_weight_map[score_name]
+            overall_score += score * weight
+
+        return overall_score
+
+    @staticmethod
+    def evaluate_weight_profiles(spots: Union[Set[Spot], SpotCollection],
+                                 score_weight_maps: Dict[str, Dict[str, float]]) -> Tuple[DataFrame, DataFrame]:
+        """
+        Calculate overall scores and rankings of already scored Spots for
+        many weight maps at once. The individual decorator scores are
+        gathered into a spots x scores matrix which is multiplied by a
+        scores x profiles weight matrix, no forecast data is fetched and
+        no decorator scores are recalculated.
+
+        Parameters
+        ----------
+        spots : Union[Set[Spot], SpotCollection]
+            Set or collection of scored Spots
+        score_weight_maps : Dict[str, Dict[str, float]]
+            Weight maps keyed by profile name
+
+        Returns
+        -------
+        Tuple[DataFrame, DataFrame]
+            Overall scores and rankings, indexed by spot name with a
+            column for each profile. Rank 1 is the best spot.
+        """
+
+        if isinstance(spots, SpotCollection):
+            names = spots.get_names()
+            score_names = spots.get_score_names()
+            score_matrix = spots.get_score_matrix(score_names)
+        else:
+            spot_list = list(spots)
+            names = [spot.get_name() for spot in spot_list]
+            score_names = list(dict.fromkeys(score_name for spot in spot_list for score_name in spot.get_scores()))
+            score_index = {score_name: i for i, score_name in enumerate(score_names)}
+            score_matrix = np.full((len(spot_list), len(score_names)), np.nan, dtype=np.float64)
+            for i, spot in enumerate(spot_list):
+                for score_name, score in spot.get_scores().items():
+                    score_matrix[i, score_index[score_name]] = score
+
+        # Spots without a decorator score do not contribute to its weight
+        score_matrix = np.nan_to_num(score_matrix, nan=0.0)
+
+        profile_names = list(score_weight_maps)
+        weight_matrix = np.zeros((len(score_names), len(profile_names)), dtype=np.float64)
+        for i, profile_name in enumerate(profile_names):
+            weight_matrix[:, i] = get_weight_vector(score_names, score_weight_maps[profile_name])
+
+        overall_scores = DataFrame(score_matrix @ weight_matrix, index=Index(names, name='name'),
+                                   columns=profile_names)
+        rankings = overall_scores.rank(axis=0, method='min', ascending=False).astype(np.int64)
+
+        return overall_scores, rankings
+
+    @staticmethod
+    def generate_top_score_report(spots: Iterable[Spot], k: int, score_names: List[str] = None) -> TopScoreReport:
+        """
+        Generate a bounded memory report of the K best scored Spots which
+        may be consumed from a stream such as iter_score_spots
+
+        Parameters
+        ----------
+        spots : Iterable[Spot]
+            Scored Spots
+        k : int
+            Number of top Spots to keep
+        score_names : List[str]
+            Optional decorator score names with their own top K table
+
+        Returns
+        -------
+        TopScoreReport
+            Report holding the top K Spots
+        """
+
+        return TopScoreReport(k, score_names).add_spots(spots)
+
+    @staticmethod
+    def _evaluate_spot(spot: Spot, target: WeatherTarget) -> Spot:
+        target.evaluate_spot(spot)
+        return spot
+
+    @staticmethod
+    def generate_score_report(spots: Union[Set[Spot], SpotCollection]) -> DataFrame:
         """
         Generate score summary report which gives overall score
         for each spot as well as individual decorator score
 
         Parameters
         ----------
-        spots : Set[Spot]
-            Set of scored Spots
+        spots : Union[Set[Spot], SpotCollection]
+            Set or collection of scored Spots
 
         Returns
         -------
@@ -99,6 +624,9 @@ class EvaluateSpots:
             Score summary table
         """
 
+        if isinstance(spots, SpotCollection):
+            return spots.to_dataframe().sort_values('overall_score', ascending=False)
+
         data = []
 
         for spot in spots:
@@ -1,26 +1,63 @@
 
 from abc import ABC, abstractmethod
-import datetime
-from json import loads
-from typing import Dict, Set
+from typing import Dict, List, Set
 
-from pandas import DataFrame
-from requests import get
+import numpy as np
+from pandas import DataFrame, DatetimeIndex
+
+from ideal_spot.cache import ForecastCache
+from ideal_spot.parse import DEFAULT_JSON_LOADS, ForecastField, parse_forecast
+from ideal_spot.transport import get_default_transport, WeatherTransport
+
+try:
+    from aiohttp import ClientSession, TCPConnector
+except ImportError:
+    ClientSession = None
+    TCPConnector = None
 
 
 class WeatherFeed(ABC):
 
-    def __init__(self, api_key: str, lat: float, long: float):
+    def __init__(self, api_key: str, lat: float, long: float, transport: WeatherTransport = None):
         self.api_key = api_key
         self.lat = lat
         self.long = long
+        self.transport = transport
 
     def get_api_key(self) -> str:
         return self.api_key
 
     def get_data(self) -> DataFrame:
-        api_data = get(self._get_api_call()).content
+
+        api_data = self._load_api_data()
+        cached = api_data is not None
+
+        if not cached:
+            api_data = self.get_transport().get(self._get_api_call())
+
+        data = self._generate_data(api_data)
+
+        if not cached:
+            self._store_api_data(api_data)
+
+        return data
+
+    async def get_data_async(self, session: 'ClientSession' = None) -> DataFrame:
+        if session is None:
+            async with create_async_session() as session:
+                return await self.get_data_async(session)
+
+        api_data = self._load_api_data()
+        cached = api_data is not None
+
+        if not cached:
+            api_data = await self.get_transport().get_async(session, self._get_api_call())
+
         data = self._generate_data(api_data)
+
+        if not cached:
+            self._store_api_data(api_data)
+
         return data
 
     def get_lat(self) -> float:
@@ -29,6 +66,11 @@ class WeatherFeed(ABC):
     def get_long(self) -> float:
         return self.long
 
+    def get_transport(self) -> WeatherTransport:
+        if self.transport is None:
+            return get_default_transport()
+        return self.transport
+
     @abstractmethod
     def _get_api_call(self) -> str:
         pass
@@ -37,42 +79,97 @@ class WeatherFeed(ABC):
     def _generate_data(self, api_data: str) -> DataFrame:
         pass
 
+    def _load_api_data(self) -> bytes:
+        return None
+
+    def _store_api_data(self, api_data: bytes):
+        pass
+
+
+def create_async_session(connection_limit: int = 100) -> 'ClientSession':
+    assert ClientSession is not None, 'aiohttp must be installed to use asynchronous feeds'
+    return ClientSession(connector=TCPConnector(limit=connection_limit))
+
+
+class LazyClientSession:
+    """
+    Asynchronous HTTP session which is only opened by the first request,
+    so evaluations whose forecasts are all cached never open a session
+    """
+
+    def __init__(self, connection_limit: int = 100):
+        self.connection_limit = connection_limit
+        self.session = None
+
+    def get_session(self) -> 'ClientSession':
+        return self.session
+
+    def get(self, url: str, **kwargs):
+        if self.session is None:
+            self.session = create_async_session(self.connection_limit)
+        return self.session.get(url, **kwargs)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self) -> 'LazyClientSession':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
 
 class ForecastWeatherFeed(WeatherFeed):
 
-    def __init__(self, api_key: str, lat: float, long: float):
-        super().__init__(api_key, lat, long)
+    def __init__(self, api_key: str, lat: float, long: float, transport: WeatherTransport = None,
+                 cache: ForecastCache = None):
+        super().__init__(api_key, lat, long, transport)
+        self.cache = cache
+
+    def get_cache(self) -> ForecastCache:
+        return self.cache
 
     def _get_api_call(self) -> str:
 
-        api_call = f'http://api.openweathermap.org/data/2.5/forecast?lat={self.lat}&lon={self.long}' \
+        api_call = f'{self.get_transport().get_base_url()}/data/2.5/forecast?lat={self.lat}&lon={self.long}' \
             + f'&appid={self.api_key}'
 
         return api_call
 
     def _generate_data(self, api_data: str) -> DataFrame:
 
-        json_data = loads(api_data)
-        data = list()
+        columns = parse_forecast(api_data, self._get_forecast_fields())
 
-        for hour_forecast_data in json_data['list']:
-            data.append(self._add_hourly_metrics(hour_forecast_data))
+        times = columns['datetime']
+        if len(times) > 1 and np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind='stable')
+            columns = {column_name: values[order] for column_name, values in columns.items()}
 
-        df = DataFrame(data)
+        df = DataFrame(columns, index=DatetimeIndex(columns['datetime']))
 
         return df
 
-    def _add_hourly_metrics(self, hour_forecast_data: Dict) -> Dict:
-        data = dict()
-        timestamp_int = hour_forecast_data['dt']
-        data['datetime'] = datetime.datetime.fromtimestamp(timestamp_int)
-        return data
+    def _load_api_data(self) -> bytes:
+        cache = self.get_cache()
+        if cache is None:
+            return None
+        return cache.get(self.get_lat(), self.get_long())
+
+    def _store_api_data(self, api_data: bytes):
+        cache = self.get_cache()
+        if cache is not None:
+            cache.set(self.get_lat(), self.get_long(), api_data)
+
+    def _get_forecast_fields(self) -> Dict[str, ForecastField]:
+        return dict()
 
 
 class ForecastWeatherFeedDecorator(ForecastWeatherFeed, ABC):
 
     def __init__(self, feed: ForecastWeatherFeed):
-        super().__init__(feed.get_api_key(), feed.get_lat(), feed.get_long())
+        super().__init__(feed.get_api_key(), feed.get_lat(), feed.get_long(), feed.get_transport(), feed.get_cache())
         self.feed = feed
 
     def get_api_key(self) -> str:
@@ -84,65 +181,68 @@ class ForecastWeatherFeedDecorator(ForecastWeatherFeed, ABC):
     def get_long(self) -> float:
         return self.feed.get_long()
 
+    def get_transport(self) -> WeatherTransport:
+        return self.feed.get_transport()
+
+    def get_cache(self) -> ForecastCache:
+        return self.feed.get_cache()
+
     @abstractmethod
-    def _add_hourly_metrics(self, hour_forecast_data: Dict) -> Dict:
-        return self.feed._add_hourly_metrics(hour_forecast_data)
+    def _get_forecast_fields(self) -> Dict[str, ForecastField]:
+        return self.feed._get_forecast_fields()
 
 
 class TemperatureForecastDecorator(ForecastWeatherFeedDecorator):
 
-    def _add_hourly_metrics(self, hour_forecast_data: Dict) -> Dict:
-        data = super()._add_hourly_metrics(hour_forecast_data)
-        data['temp'] = hour_forecast_data['main']['temp']
-        data['temp_min'] = hour_forecast_data['main']['temp_min']
-        data['temp_max'] = hour_forecast_data['main']['temp_max']
-        return data
+    def _get_forecast_fields(self) -> Dict[str, ForecastField]:
+        fields = super()._get_forecast_fields()
+        fields['temp'] = ('main', 'temp', None)
+        fields['temp_min'] = ('main', 'temp_min', None)
+        fields['temp_max'] = ('main', 'temp_max', None)
+        return fields
 
 
 class RainForecastDecorator(ForecastWeatherFeedDecorator):
 
-    def _add_hourly_metrics(self, hour_forecast_data: Dict) -> Dict:
-        data = super()._add_hourly_metrics(hour_forecast_data)
-        rain_amount = 0.0
-        if 'rain' in hour_forecast_data and '3h' in hour_forecast_data['rain']:
-            rain_amount = hour_forecast_data['rain']['3h']
-        data['rain'] = rain_amount
-        return data
+    def _get_forecast_fields(self) -> Dict[str, ForecastField]:
+        fields = super()._get_forecast_fields()
+        fields['rain'] = ('rain', '3h', 0.0)
+        return fields
 
 
 class SnowForecastDecorator(ForecastWeatherFeedDecorator):
 
-    def _add_hourly_metrics(self, hour_forecast_data: Dict) -> Dict:
-        data = super()._add_hourly_metrics(hour_forecast_data)
-        snow_amount = 0.0
-        if 'snow' in hour_forecast_data and '3h' in hour_forecast_data['snow']:
-            snow_amount = hour_forecast_data['snow']['3h']
-        data['snow'] = snow_amount
-        return data
+    def _get_forecast_fields(self) -> Dict[str, ForecastField]:
+        fields = super()._get_forecast_fields()
+        fields['snow'] = ('snow', '3h', 0.0)
+        return fields
 
 
 class CloudForecastDecorator(ForecastWeatherFeedDecorator):
 
-    def _add_hourly_metrics(self, hour_forecast_data: Dict) -> Dict:
-        data = super()._add_hourly_metrics(hour_forecast_data)
-        data['cloud'] = hour_forecast_data['clouds']['all']
-        return data
+    def _get_forecast_fields(self) -> Dict[str, ForecastField]:
+        fields = super()._get_forecast_fields()
+        fields['cloud'] = ('clouds', 'all', None)
+        return fields
 
 
 class WindForecastDecorator(ForecastWeatherFeedDecorator):
 
-    def _add_hourly_metrics(self, hour_forecast_data: Dict) -> Dict:
-        data = super()._add_hourly_metrics(hour_forecast_data)
-        data['wind'] = hour_forecast_data['wind']['speed']
-        return data
+    def _get_forecast_fields(self) -> Dict[str, ForecastField]:
+        fields = super()._get_forecast_fields()
+        fields['wind'] = ('wind', 'speed', None)
+        return fields
 
 
 class ForecastWeatherFeedFactory:
 
-    def __init__(self, api_key: str, lat: float, long: float):
+    def __init__(self, api_key: str, lat: float, long: float, transport: WeatherTransport = None,
+                 cache: ForecastCache = None):
         self.api_key = api_key
         self.lat = lat
         self.long = long
+        self.transport = transport
+        self.cache = cache
 
         self.forecast_decorators = {
             'temp': TemperatureForecastDecorator,
@@ -154,10 +254,119 @@ class ForecastWeatherFeedFactory:
 
     def generate_feed(self, forecast_metrics: Set[str]) -> ForecastWeatherFeed:
 
-        forecast_feed = ForecastWeatherFeed(self.api_key, self.lat, self.long)
+        forecast_feed = ForecastWeatherFeed(self.api_key, self.lat, self.long, self.transport, self.cache)
 
         for forecast_metric in forecast_metrics:
             assert forecast_metric in self.forecast_decorators, 'Forecast metric %s is not supported' % forecast_metric
             forecast_feed = self.forecast_decorators[forecast_metric](forecast_feed)
 
         return forecast_feed
+
+
+class GroupWeatherFeed:
+    """
+    Current weather for up to twenty OpenWeatherMap city ids fetched
+    with a single call to the group endpoint. The group endpoint only
+    reports the latest observation of each city and provides no rain
+    or snow totals comparable to the 3 hour forecast values.
+    """
+
+    MAX_GROUP_SIZE = 20
+
+    GROUP_FIELDS = {
+        'temp': {'temp': ('main', 'temp', None), 'temp_min': ('main', 'temp_min', None),
+                 'temp_max': ('main', 'temp_max', None)},
+        'cloud': {'cloud': ('clouds', 'all', None)},
+        'wind': {'wind': ('wind', 'speed', None)}
+    }
+
+    def __init__(self, api_key: str, city_ids: List[int], transport: WeatherTransport = None,
+                 cache: ForecastCache = None):
+        assert 0 < len(city_ids) <= GroupWeatherFeed.MAX_GROUP_SIZE, \
+            'Group of %d city ids must contain between 1 and %d ids' % (len(city_ids), GroupWeatherFeed.MAX_GROUP_SIZE)
+
+        self.api_key = api_key
+        self.city_ids = list(city_ids)
+        self.transport = transport
+        self.cache = cache
+
+    def get_city_ids(self) -> List[int]:
+        return self.city_ids
+
+    def get_cache(self) -> ForecastCache:
+        return self.cache
+
+    def get_transport(self) -> WeatherTransport:
+        if self.transport is None:
+            return get_default_transport()
+        return self.transport
+
+    def get_data(self) -> Dict[int, DataFrame]:
+        """
+        Current weather of every provided metric keyed by city id, city
+        ids missing from the response are left out
+        """
+        return self._get_data()
+
+    def get_city_data(self, city_id: int) -> DataFrame:
+        """
+        Current weather of a single city of the group or None if the
+        city is missing from the response
+        """
+        return self._get_data({city_id}).get(city_id)
+
+    def _get_api_call(self) -> str:
+
+        api_call = f'{self.get_transport().get_base_url()}/data/2.5/group' \
+            + f'?id={",".join(str(city_id) for city_id in self.city_ids)}&appid={self.api_key}'
+
+        return api_call
+
+    def _get_data(self, city_ids: Set[int] = None) -> Dict[int, DataFrame]:
+
+        api_data = self._load_api_data()
+        cached = api_data is not None
+
+        if not cached:
+            api_data = self.get_transport().get(self._get_api_call())
+
+        # Responses are only cached once they parse so a failed call never poisons the group
+        data = self._generate_data(api_data, city_ids)
+
+        if not cached:
+            self._store_api_data(api_data)
+
+        return data
+
+    def _get_cache_key(self) -> str:
+        return 'group:' + ','.join(str(city_id) for city_id in self.city_ids)
+
+    def _load_api_data(self) -> bytes:
+        if self.cache is None:
+            return None
+        return self.cache.get_entry(self._get_cache_key())
+
+    def _store_api_data(self, api_data: bytes):
+        if self.cache is not None:
+            self.cache.set_entry(self._get_cache_key(), api_data)
+
+    def _generate_data(self, api_data: bytes, city_ids: Set[int] = None) -> Dict[int, DataFrame]:
+
+        fields = dict()
+        for metric_fields in GroupWeatherFeed.GROUP_FIELDS.values():
+            fields.update(metric_fields)
+
+        data = dict()
+        for row in DEFAULT_JSON_LOADS(api_data)['list']:
+            if city_ids is not None and int(row['id']) not in city_ids:
+                continue
+
+            # Each city is parsed as a forecast with a single time step
+            columns = parse_forecast({'list': [row]}, fields, json_loads=lambda parsed_data: parsed_data)
+            data[int(row['id'])] = DataFrame(columns, index=DatetimeIndex(columns['datetime']))
+
+        return data
+
+    @staticmethod
+    def get_provided_metrics() -> Set[str]:
+        return set(GroupWeatherFeed.GROUP_FIELDS)
@@ -0,0 +1,221 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.plan import ScoringPlan
+from ideal_spot.spots import Spot
+from ideal_spot.targets import ForecastWindows, WeatherTarget, WeatherTargetDecorator
+
+
+class RescoreResult:
+    """
+    Outcome of an IncrementalEvaluator update
+    """
+
+    def __init__(self, rescored_spots: Set[str], rank_changes: Dict[str, Tuple[int, int]],
+                 recalculated_score_count: int, report: DataFrame):
+        self.rescored_spots = rescored_spots
+        self.rank_changes = rank_changes
+        self.recalculated_score_count = recalculated_score_count
+        self.report = report
+
+    def get_rescored_spots(self) -> Set[str]:
+        """
+        Names of spots with at least one changed decorator score
+        """
+        return self.rescored_spots
+
+    def get_rank_changes(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Previous and new rank keyed by spot name for every spot whose
+        rank changed, the previous rank of a new spot is None
+        """
+        return self.rank_changes
+
+    def get_recalculated_score_count(self) -> int:
+        return self.recalculated_score_count
+
+    def get_report(self) -> DataFrame:
+        """
+        Score report of every evaluated spot, None when the update was
+        asked not to generate one
+        """
+        return self.report
+
+
+class IncrementalEvaluator:
+    """
+    Stateful evaluation which keeps the forecast data, scores and ranking
+    of every spot between updates. When fresh forecast data arrives only
+    the decorators whose window of data changed are recalculated. Range
+    and IdealValue decorators are compared over their own window and
+    value, any other decorator is recalculated whenever the spot's
+    forecast data changed.
+
+    Overall scores are kept in a sorted index, so an update only
+    re-ranks the spots whose rank can change. Generating the score report
+    covers every spot and costs O(N) per update, it can be skipped when
+    only the rank changes are needed.
+    """
+
+    def __init__(self, target: WeatherTarget, score_weight_map: Dict[str, float] = None):
+        self.target = target
+        self.score_weight_map = score_weight_map
+
+        # Only the last decorator with a given name determines its score
+        decorators = dict()
+        for decorator in ScoringPlan.get_decorators(target):
+            decorators.pop(decorator.name, None)
+            decorators[decorator.name] = decorator
+        self.decorators = list(decorators.values())
+
+        self.spots = dict()
+        self.forecast_data = dict()
+        self.scores = dict()
+        self.overall_scores = dict()
+        self.ranks = dict()
+
+        # Negated overall scores in ascending order with the matching spot names
+        self.sorted_scores = []
+        self.sorted_names = []
+
+    def get_ranks(self) -> Dict[str, int]:
+        return self.ranks
+
+    def update(self, spots: Iterable[Spot], forecast_data: Dict[str, DataFrame] = None,
+               generate_report: bool = True) -> RescoreResult:
+        """
+        Re-score spots against fresh forecast data
+
+        Parameters
+        ----------
+        spots : Iterable[Spot]
+            Spots to update, previously evaluated spots which are not
+            given keep their scores
+        forecast_data : Dict[str, DataFrame]
+            Optional fresh forecast data keyed by spot name, data is
+            fetched using the target when not given
+        generate_report : bool
+            Whether to generate the score report of every spot, which is
+            O(N) unlike the rest of the update
+
+        Returns
+        -------
+        RescoreResult
+            Changed spots and ranks
+        """
+
+        metrics = self.target.get_forecast_metrics()
+        rescored_spots = set()
+        recalculated_score_count = 0
+        score_changes = dict()
+
+        for spot in spots:
+
+            name = spot.get_name()
+            fresh_data = None if forecast_data is None else forecast_data.get(name)
+            if fresh_data is None:
+                fresh_data = self.target.generate_forecast_data(spot, metrics)
+
+            previous_data = self.forecast_data.get(name)
+
+            if previous_data is None:
+                scores = self.target.calculate_scores(spot, fresh_data)
+                recalculated_score_count += len(scores)
+            else:
+                scores = dict(self.scores[name])
+                fresh_windows = ForecastWindows(fresh_data)
+                for decorator in self._get_changed_decorators(previous_data, fresh_data, fresh_windows):
+                    scores[decorator.name] = decorator._calculate_window_score(spot, fresh_windows)
+                    recalculated_score_count += 1
+
+            if scores != self.scores.get(name):
+                rescored_spots.add(name)
+
+            spot.set_scores(scores)
+            spot.set_overall_score(EvaluateSpots.calculate_overall_score(scores, self.score_weight_map))
+
+            self.spots[name] = spot
+            self.forecast_data[name] = fresh_data
+            self.scores[name] = scores
+
+            previous_score = self.overall_scores.get(name)
+            if previous_score is None or previous_score != spot.get_overall_score():
+                score_changes.setdefault(name, previous_score)
+                self._move_score(name, previous_score, spot.get_overall_score())
+                self.overall_scores[name] = spot.get_overall_score()
+
+        rank_changes = self._rerank(score_changes)
+
+        report = EvaluateSpots.generate_score_report(set(self.spots.values())) if generate_report else None
+
+        return RescoreResult(rescored_spots, rank_changes, recalculated_score_count, report)
+
+    def _get_changed_decorators(self, previous_data: DataFrame, fresh_data: DataFrame,
+                                fresh_windows: ForecastWindows) -> List[WeatherTargetDecorator]:
+
+        previous_windows = ForecastWindows(previous_data)
+        data_changed = None
+
+        changed_decorators = []
+        for decorator in self.decorators:
+
+            if ScoringPlan.is_compilable(decorator):
+                changed = IncrementalEvaluator._is_window_changed(decorator, previous_windows, fresh_windows)
+            else:
+                if data_changed is None:
+                    data_changed = not previous_data.equals(fresh_data)
+                changed = data_changed
+
+            if changed:
+                changed_decorators.append(decorator)
+
+        return changed_decorators
+
+    def _move_score(self, name: str, previous_score: float, score: float):
+
+        if previous_score is not None:
+            start = bisect_left(self.sorted_scores, -previous_score)
+            end = bisect_right(self.sorted_scores, -previous_score)
+            i = start + self.sorted_names[start:end].index(name)
+            del self.sorted_scores[i]
+            del self.sorted_names[i]
+
+        i = bisect_right(self.sorted_scores, -score)
+        self.sorted_scores.insert(i, -score)
+        self.sorted_names.insert(i, name)
+
+    def _rerank(self, score_changes: Dict[str, float]) -> Dict[str, Tuple[int, int]]:
+
+        # A spot is ranked by the number of higher scores, which only changes for spots scoring
+        # between the previous and new score of a changed spot, a new spot pushes down all lower scores
+        names = set(score_changes)
+        for name, previous_score in score_changes.items():
+            score = self.overall_scores[name]
+            low = -np.inf if previous_score is None else min(previous_score, score)
+            high = score if previous_score is None else max(previous_score, score)
+            names.update(self.sorted_names[bisect_right(self.sorted_scores, -high):
+                                           bisect_right(self.sorted_scores, -low)])
+
+        rank_changes = dict()
+        for name in names:
+            rank = bisect_left(self.sorted_scores, -self.overall_scores[name]) + 1
+            if self.ranks.get(name) != rank:
+                rank_changes[name] = (self.ranks.get(name), rank)
+                self.ranks[name] = rank
+
+        return rank_changes
+
+    @staticmethod
+    def _is_window_changed(decorator, previous_windows: ForecastWindows, fresh_windows: ForecastWindows) -> bool:
+
+        window = (decorator.range_start, decorator.range_end)
+
+        if not np.array_equal(previous_windows.get_window_times(*window), fresh_windows.get_window_times(*window)):
+            return True
+
+        return not np.array_equal(previous_windows.get_window_values(*window, decorator.value_name),
+                                  fresh_windows.get_window_values(*window, decorator.value_name), equal_nan=True)
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+from json import loads
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+
+try:
+    from orjson import loads as fast_loads
+except ImportError:
+    fast_loads = None
+
+# Forecast fields are read from nested hourly data as (outer key, inner key, default),
+# a default of None marks the field as required
+ForecastField = Tuple[str, str, float]
+
+DEFAULT_JSON_LOADS = fast_loads if fast_loads is not None else loads
+
+# UTC offsets are probed at this interval to find transitions within a series,
+# local time zones never change offset twice within a day
+OFFSET_PROBE_STEP = 86400
+
+
+def parse_forecast(api_data: bytes, fields: Dict[str, ForecastField],
+                   json_loads: Callable[[bytes], Any] = None) -> Dict[str, np.ndarray]:
+    """
+    Parse a raw forecast response straight into typed columns. Only the
+    requested fields are extracted, timestamps become local datetime64
+    values and metric values float32.
+
+    Parameters
+    ----------
+    api_data : bytes
+        Raw forecast API response
+    fields : Dict[str, ForecastField]
+        Field specification for each output column
+    json_loads : Callable[[bytes], Any]
+        Optional JSON backend, orjson is used by default when installed
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Columns keyed by name starting with the datetime column
+    """
+
+    if json_loads is None:
+        json_loads = DEFAULT_JSON_LOADS
+
+    rows = json_loads(api_data)['list']
+
+    columns = {'datetime': to_local_datetime64(np.array([row['dt'] for row in rows], dtype=np.int64))}
+
+    for column_name, (outer_key, inner_key, default) in fields.items():
+
+        if default is None:
+            values = [row[outer_key][inner_key] for row in rows]
+        else:
+            values = [row[outer_key].get(inner_key, default) if outer_key in row else default for row in rows]
+
+        columns[column_name] = np.array(values, dtype=np.float32)
+
+    return columns
+
+
+def to_local_datetime64(timestamps: np.ndarray) -> np.ndarray:
+    """
+    Convert unix timestamps into naive local time datetime64 values,
+    matching datetime.fromtimestamp without building Python objects
+    """
+
+    if len(timestamps) == 0:
+        return timestamps.astype('datetime64[s]')
+
+    # A series whose offset never changes is shifted at once, otherwise every row gets its own offset
+    first, last = int(timestamps.min()), int(timestamps.max())
+    probes = list(range(first, last, OFFSET_PROBE_STEP)) + [last]
+    offsets = {_get_utc_offset(probe) for probe in probes}
+
+    if len(offsets) == 1:
+        offsets = offsets.pop()
+    else:
+        offsets = np.array([_get_utc_offset(int(timestamp)) for timestamp in timestamps])
+
+    return (timestamps + offsets).astype('datetime64[s]')
+
+
+def _get_utc_offset(timestamp: int) -> int:
+    local = datetime.fromtimestamp(timestamp)
+    utc = datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+    return int((local - utc).total_seconds())
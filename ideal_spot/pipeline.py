@@ -0,0 +1,167 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator
+
+from pandas import DataFrame, read_csv
+
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.report import TopScoreReport
+from ideal_spot.spots import SpotCollection
+from ideal_spot.targets import WeatherTarget
+
+try:
+    from pyarrow import Table
+    from pyarrow.parquet import ParquetFile, ParquetWriter
+except ImportError:
+    Table = None
+    ParquetFile = None
+    ParquetWriter = None
+
+
+def read_spot_chunks(path: str, name_column: str, lat_column: str, long_column: str,
+                     chunk_size: int = 10000) -> Iterator[SpotCollection]:
+    """
+    Read spots from a CSV or Parquet file in chunks, only a single chunk
+    is held in memory at a time. Duplicate names are only detected within
+    a chunk.
+
+    Parameters
+    ----------
+    path : str
+        Path of a CSV file or a Parquet file ending with .parquet
+    name_column : str
+        Name of column for string spot name
+    lat_column : str
+        Name of column for latitude float value
+    long_column : str
+        Name of column for longitude float value
+    chunk_size : int
+        Maximum number of spots in each chunk
+
+    Returns
+    -------
+    Iterator[SpotCollection]
+        Collection of spots for each chunk
+    """
+
+    assert chunk_size > 0, 'Chunk size %s must be positive' % str(chunk_size)
+
+    columns = [name_column, lat_column, long_column]
+
+    if path.endswith('.parquet'):
+        assert ParquetFile is not None, 'pyarrow must be installed to read Parquet files'
+        for batch in ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield SpotCollection.from_dataframe(batch.to_pandas(), name_column, lat_column, long_column)
+        return
+
+    for df in read_csv(path, chunksize=chunk_size, usecols=columns, dtype={name_column: str}):
+        yield SpotCollection.from_dataframe(df, name_column, lat_column, long_column)
+
+
+class ScoreSink(ABC):
+    """
+    Output for the scores of each chunk of a SpotPipeline
+    """
+
+    @abstractmethod
+    def write(self, df: DataFrame):
+        pass
+
+    def close(self):
+        pass
+
+
+class CsvScoreSink(ScoreSink):
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header_written = False
+
+    def write(self, df: DataFrame):
+        df.to_csv(self.path, mode='a' if self.header_written else 'w', header=not self.header_written, index=False)
+        self.header_written = True
+
+
+class ParquetScoreSink(ScoreSink):
+
+    def __init__(self, path: str):
+        assert ParquetWriter is not None, 'pyarrow must be installed to write Parquet files'
+        self.path = path
+        self.writer = None
+
+    def write(self, df: DataFrame):
+        table = Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class SpotPipeline:
+    """
+    Streaming evaluation which scores spots chunk by chunk and writes
+    the scores of each chunk to a sink before the next chunk is read,
+    so memory use is bounded by the chunk size rather than spot count
+    """
+
+    def __init__(self, target: WeatherTarget, score_weight_map: Dict[str, float] = None, workers: int = None,
+                 vectorized: bool = False):
+        self.target = target
+        self.score_weight_map = score_weight_map
+        self.workers = workers
+        self.vectorized = vectorized
+
+    def run(self, chunks: Iterable[SpotCollection], sink: ScoreSink, report: TopScoreReport = None) -> int:
+        """
+        Score every chunk and write the scores to the sink
+
+        Parameters
+        ----------
+        chunks : Iterable[SpotCollection]
+            Chunks of un-scored spots
+        sink : ScoreSink
+            Output for the scores of each chunk
+        report : TopScoreReport
+            Optional report of the top spots across all chunks
+
+        Returns
+        -------
+        int
+            Number of spots scored
+        """
+
+        spot_count = 0
+
+        try:
+            for chunk in chunks:
+
+                if self.vectorized:
+                    EvaluateSpots.score_spots_vectorized(chunk, self.target, self.score_weight_map, self.workers)
+                else:
+                    EvaluateSpots.score_spots(chunk, self.target, self.score_weight_map, self.workers)
+
+                sink.write(chunk.to_dataframe())
+
+                if report is not None:
+                    report.add_spots(chunk)
+
+                spot_count += len(chunk)
+        finally:
+            sink.close()
+
+        return spot_count
+
+    def run_file(self, source_path: str, name_column: str, lat_column: str, long_column: str, output_path: str,
+                 chunk_size: int = 10000, report: TopScoreReport = None) -> int:
+        """
+        Score spots read from a CSV or Parquet file and write the scores
+        to a CSV or Parquet file based on the output file extension
+        """
+
+        sink = ParquetScoreSink(output_path) if output_path.endswith('.parquet') else CsvScoreSink(output_path)
+        chunks = read_spot_chunks(source_path, name_column, lat_column, long_column, chunk_size)
+
+        return self.run(chunks, sink, report)
@@ -0,0 +1,260 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from ideal_spot.cube import ForecastCube
+from ideal_spot.targets import IdealValueTargetDecorator, RangeTargetDecorator, TIME_UNIT, WeatherTarget, \
+    WeatherTargetDecorator
+
+
+class ScoringPlan:
+    """
+    ScoringPlan compiles a WeatherTarget decorator chain into vector
+    operations which score many spots at once over a stacked
+    spot x time x metric array of forecast values
+    """
+
+    def __init__(self, target: WeatherTarget):
+
+        self.decorators = ScoringPlan.get_decorators(target)
+
+        for decorator in self.decorators:
+            assert ScoringPlan.is_compilable(decorator), \
+                'Decorator %s of type %s cannot be compiled' % (decorator.name, type(decorator).__name__)
+
+        self.metrics = sorted({decorator.value_name for decorator in self.decorators})
+
+        # Decorators sharing a name overwrite the earlier score as in WeatherTarget.calculate_scores
+        self.score_index = dict()
+        for decorator in self.decorators:
+            self.score_index.setdefault(decorator.name, len(self.score_index))
+
+    def get_metrics(self) -> List[str]:
+        return self.metrics
+
+    def get_score_names(self) -> List[str]:
+        return list(self.score_index)
+
+    def score(self, times: np.ndarray, values: np.ndarray, metrics: List[str]) -> np.ndarray:
+        """
+        Score stacked forecast values for every decorator in the plan
+
+        Parameters
+        ----------
+        times : np.ndarray
+            Sorted time axis of length T
+        values : np.ndarray
+            Forecast values with shape N x T x M, missing values are NaN
+        metrics : List[str]
+            Metric name for each of the M value columns
+
+        Returns
+        -------
+        np.ndarray
+            Score matrix with shape N x S ordered as the score names
+        """
+
+        times = times.astype(TIME_UNIT)
+        metric_index = {metric: i for i, metric in enumerate(metrics)}
+
+        scores = np.zeros((values.shape[0], len(self.score_index)), dtype=np.float64)
+
+        # Windows and aggregates shared by several decorators are only computed once
+        windows = dict()
+        aggregates = dict()
+
+        for decorator in self.decorators:
+
+            window_key = (decorator.range_start, decorator.range_end)
+            if window_key not in windows:
+                windows[window_key] = (times >= np.datetime64(decorator.range_start, 'us')) & \
+                                      (times <= np.datetime64(decorator.range_end, 'us'))
+
+            aggregate_key = (decorator.range_start, decorator.range_end, decorator.value_name, decorator.operation)
+            if aggregate_key not in aggregates:
+
+                window_values = values[:, windows[window_key], metric_index[decorator.value_name]]
+
+                cumulative_values = np.nansum(window_values, axis=1, dtype=np.float64)
+                if decorator.operation == 'mean':
+                    counts = np.count_nonzero(~np.isnan(window_values), axis=1)
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        cumulative_values = cumulative_values / counts
+
+                aggregates[aggregate_key] = cumulative_values
+
+            cumulative_values = aggregates[aggregate_key]
+            scores[:, self.score_index[decorator.name]] = ScoringPlan.normalize_scores(decorator, cumulative_values)
+
+        return scores
+
+    def score_window_starts(self, times: np.ndarray, values: np.ndarray, metrics: List[str],
+                            starts: np.ndarray) -> np.ndarray:
+        """
+        Score every decorator for many candidate start times at once. The
+        decorator windows are shifted together so the earliest range start
+        of the plan falls on each candidate start. Window sums and counts
+        are read from cumulative sums over the time axis, so the cost does
+        not grow with the window length.
+
+        Parameters
+        ----------
+        times : np.ndarray
+            Sorted time axis of length T
+        values : np.ndarray
+            Forecast values with shape N x T x M, missing values are NaN
+        metrics : List[str]
+            Metric name for each of the M value columns
+        starts : np.ndarray
+            K candidate start times
+
+        Returns
+        -------
+        np.ndarray
+            Score array with shape N x K x S ordered as the score names
+        """
+
+        assert len(self.decorators) > 0, 'Target has no decorators to score'
+
+        times = times.astype(TIME_UNIT)
+        starts = np.asarray(starts).astype(TIME_UNIT)
+        anchor = np.datetime64(self.get_anchor(), 'us')
+        metric_index = {metric: i for i, metric in enumerate(metrics)}
+
+        scores = np.zeros((values.shape[0], len(starts), len(self.score_index)), dtype=np.float64)
+
+        # Cumulative sums and counts with a leading zero so a window [lo, hi) sums to P[hi] - P[lo]
+        prefixes = dict()
+        aggregates = dict()
+
+        for decorator in self.decorators:
+
+            if decorator.value_name not in prefixes:
+                metric_values = values[:, :, metric_index[decorator.value_name]]
+                available = ~np.isnan(metric_values)
+                prefix_sums = np.zeros((values.shape[0], len(times) + 1), dtype=np.float64)
+                prefix_counts = np.zeros((values.shape[0], len(times) + 1), dtype=np.int64)
+                np.cumsum(np.where(available, metric_values, 0.0), axis=1, dtype=np.float64, out=prefix_sums[:, 1:])
+                np.cumsum(available, axis=1, out=prefix_counts[:, 1:])
+                prefixes[decorator.value_name] = (prefix_sums, prefix_counts)
+
+            aggregate_key = (decorator.range_start, decorator.range_end, decorator.value_name, decorator.operation)
+            if aggregate_key not in aggregates:
+
+                window_starts = starts + (np.datetime64(decorator.range_start, 'us') - anchor)
+                window_ends = starts + (np.datetime64(decorator.range_end, 'us') - anchor)
+                start_index = np.searchsorted(times, window_starts, side='left')
+                end_index = np.maximum(start_index, np.searchsorted(times, window_ends, side='right'))
+
+                prefix_sums, prefix_counts = prefixes[decorator.value_name]
+                cumulative_values = prefix_sums[:, end_index] - prefix_sums[:, start_index]
+                if decorator.operation == 'mean':
+                    counts = prefix_counts[:, end_index] - prefix_counts[:, start_index]
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        cumulative_values = cumulative_values / counts
+
+                aggregates[aggregate_key] = cumulative_values
+
+            cumulative_values = aggregates[aggregate_key]
+            scores[:, :, self.score_index[decorator.name]] = ScoringPlan.normalize_scores(decorator, cumulative_values)
+
+        return scores
+
+    def get_anchor(self) -> datetime:
+        """
+        Earliest range start of the plan which window starts refer to
+        """
+        return min(decorator.range_start for decorator in self.decorators)
+
+    def get_span(self) -> timedelta:
+        """
+        Time from the earliest range start to the latest range end
+        """
+        return max(decorator.range_end for decorator in self.decorators) - self.get_anchor()
+
+    def score_cube(self, cube: ForecastCube) -> np.ndarray:
+        """
+        Score every spot held in a ForecastCube, rows of the score
+        matrix follow the spot order of the cube
+        """
+
+        return self.score(cube.get_times(), cube.get_values(), cube.get_metrics())
+
+    @staticmethod
+    def get_decorators(target: WeatherTarget) -> List[WeatherTargetDecorator]:
+        """
+        Walk a WeatherTarget chain and return the decorators ordered
+        from the innermost to the outermost
+        """
+
+        decorators = []
+        while isinstance(target, WeatherTargetDecorator):
+            decorators.append(target)
+            target = target.target
+
+        return decorators[::-1]
+
+    @staticmethod
+    def is_compilable(decorator: WeatherTargetDecorator) -> bool:
+        """
+        Only Range and IdealValue decorators which keep the built in
+        score calculation can be turned into vector operations
+        """
+
+        if not isinstance(decorator, RangeTargetDecorator):
+            return False
+
+        decorator_type = type(decorator)
+        if decorator_type._calculate_score is not RangeTargetDecorator._calculate_score or \
+                decorator_type._calculate_window_score is not RangeTargetDecorator._calculate_window_score:
+            return False
+
+        if isinstance(decorator, IdealValueTargetDecorator):
+            return decorator_type._score_value is IdealValueTargetDecorator._score_value
+        return decorator_type._score_value is RangeTargetDecorator._score_value
+
+    @staticmethod
+    def get_score_bounds(decorator: WeatherTargetDecorator) -> Tuple[float, float]:
+        """
+        Lowest and highest score a decorator can produce, decorators with
+        their own score calculation are unbounded
+        """
+
+        if not ScoringPlan.is_compilable(decorator):
+            return -np.inf, np.inf
+
+        if not isinstance(decorator, IdealValueTargetDecorator):
+            return 0.0, 1.0
+
+        value_range = decorator.max_value - decorator.min_value
+        ideal_value = min(max(decorator.ideal_value, decorator.min_value), decorator.max_value)
+        farthest_distance = max(abs(decorator.ideal_value - decorator.min_value),
+                                abs(decorator.ideal_value - decorator.max_value))
+
+        return 1.0 - farthest_distance / value_range, 1.0 - abs(decorator.ideal_value - ideal_value) / value_range
+
+    @staticmethod
+    def normalize_scores(decorator: RangeTargetDecorator, cumulative_values: np.ndarray) -> np.ndarray:
+
+        value_range = decorator.max_value - decorator.min_value
+
+        normalized_values = (cumulative_values - decorator.min_value) / value_range
+        normalized_values = np.where(np.isnan(normalized_values), 0.0, np.clip(normalized_values, 0.0, 1.0))
+
+        if not isinstance(decorator, IdealValueTargetDecorator):
+            return normalized_values
+
+        value_averages = normalized_values * value_range + decorator.min_value
+        return 1.0 - np.abs(decorator.ideal_value - value_averages) / value_range
+
+
+def get_weight_vector(score_names: List[str], score_weight_map: Dict[str, float] = None) -> np.ndarray:
+    """
+    Weight for each score name, scores without a weight default to 1.0
+    """
+
+    if score_weight_map is None:
+        score_weight_map = dict()
+
+    return np.array([score_weight_map.get(score_name, 1.0) for score_name in score_names], dtype=np.float64)
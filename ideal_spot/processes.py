@@ -0,0 +1,141 @@
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Set, Tuple, Union
+
+import numpy as np
+
+from ideal_spot.cache import ForecastCache
+from ideal_spot.cube import ForecastCube
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.plan import ScoringPlan
+from ideal_spot.spots import Spot, SpotCollection
+from ideal_spot.targets import RangeTargetDecorator, WeatherTarget, WeatherTargetDecorator
+
+# State of a worker process set once by the pool initializer
+_worker_state = dict()
+
+
+def _initialize_worker(target: WeatherTarget, shared_memory_name: str, shape: Tuple[int, int, int],
+                       names: List[str], times: np.ndarray, metrics: List[str]):
+
+    shared_memory = SharedMemory(name=shared_memory_name)
+    values = np.ndarray(shape, dtype=np.float32, buffer=shared_memory.buf)
+
+    _worker_state['target'] = target
+    _worker_state['shared_memory'] = shared_memory
+    _worker_state['cube'] = ForecastCube(names, times, metrics, values)
+
+
+def _score_chunk(spot_data: List[Tuple[str, float, float]]) -> List[Dict[str, float]]:
+
+    target = _worker_state['target']
+    cube = _worker_state['cube']
+
+    scores = []
+    for name, lat, long in spot_data:
+        scores.append(target.calculate_scores(Spot(name, lat, long), cube.get_frame(name)))
+
+    return scores
+
+
+def _strip_caches(target: WeatherTarget) -> WeatherTarget:
+    """
+    Copy of a target chain without forecast caches, which workers never
+    read and would otherwise receive every cached entry of
+    """
+
+    target = copy(target)
+
+    if isinstance(target, WeatherTargetDecorator):
+        target.target = _strip_caches(target.target)
+    else:
+        for attribute_name, value in vars(target).items():
+            if isinstance(value, ForecastCache):
+                setattr(target, attribute_name, None)
+
+    return target
+
+
+class ProcessPoolEvaluator:
+    """
+    Multi-process evaluation for CPU bound scoring of spots whose
+    forecasts are already available. Forecast data is stacked into a
+    ForecastCube whose values are placed in shared memory, so workers
+    read forecasts without them being pickled. The WeatherTarget chain
+    is sent to each worker once when the pool starts, without its
+    forecast caches, and only spot coordinates and scores are passed per
+    chunk. Each spot is scored through the decorator chain on the
+    forecast frame rebuilt from the cube. A cube generated by the
+    evaluator holds every feed column, so decorators with their own
+    score calculation see the same values as in score_spots. A cube
+    passed in must hold the value column of every Range decorator,
+    other decorators only see the columns it holds.
+    """
+
+    def __init__(self, target: WeatherTarget, score_weight_map: Dict[str, float] = None, processes: int = None,
+                 chunk_size: int = 1000):
+        assert processes is None or processes > 0, 'Number of processes %s must be positive' % str(processes)
+        assert chunk_size > 0, 'Chunk size %s must be positive' % str(chunk_size)
+
+        self.target = target
+        self.score_weight_map = score_weight_map
+        self.processes = processes
+        self.chunk_size = chunk_size
+
+    def score_spots(self, spots: Union[Set[Spot], SpotCollection], cube: ForecastCube = None,
+                    workers: int = None) -> Union[Set[Spot], SpotCollection]:
+        """
+        Score spots across a pool of processes
+
+        Parameters
+        ----------
+        spots : Union[Set[Spot], SpotCollection]
+            Set or collection of un-scored spots
+        cube : ForecastCube
+            Optional previously generated forecast data for the spots
+        workers : int
+            Optional number of worker threads used to fetch forecast data
+            when no cube is given
+
+        Returns
+        -------
+        Union[Set[Spot], SpotCollection]
+            Spots with scores and overall score set
+        """
+
+        spot_list = list(spots)
+        if len(spot_list) == 0:
+            return spots
+
+        if cube is None:
+            cube = EvaluateSpots.generate_forecast_cube(spot_list, self.target, workers, all_columns=True)
+
+        missing_columns = {decorator.value_name for decorator in ScoringPlan.get_decorators(self.target)
+                           if isinstance(decorator, RangeTargetDecorator)} - set(cube.get_metrics())
+        assert len(missing_columns) == 0, 'Forecast cube is missing columns %s' % str(sorted(missing_columns))
+
+        values = np.ascontiguousarray(cube.get_values(), dtype=np.float32)
+        shared_memory = SharedMemory(create=True, size=max(values.nbytes, 1))
+
+        try:
+            np.ndarray(values.shape, dtype=np.float32, buffer=shared_memory.buf)[:] = values
+
+            spot_data = [(spot.get_name(), spot.get_lat(), spot.get_long()) for spot in spot_list]
+            chunks = [spot_data[i:i + self.chunk_size] for i in range(0, len(spot_data), self.chunk_size)]
+
+            initargs = (_strip_caches(self.target), shared_memory.name, values.shape, cube.get_names(), cube.get_times(),
+                        cube.get_metrics())
+
+            with ProcessPoolExecutor(max_workers=self.processes, initializer=_initialize_worker,
+                                     initargs=initargs) as executor:
+
+                chunk_scores = executor.map(_score_chunk, chunks)
+                for spot, scores in zip(spot_list, (scores for chunk in chunk_scores for scores in chunk)):
+                    spot.set_scores(scores)
+                    spot.set_overall_score(EvaluateSpots.calculate_overall_score(scores, self.score_weight_map))
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+        return spots
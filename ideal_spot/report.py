@@ -0,0 +1,89 @@
+from heapq import heappush, heapreplace
+from itertools import count
+from typing import Dict, Iterable, List
+
+from pandas import DataFrame
+
+from ideal_spot.spots import Spot
+
+
+class TopScoreReport:
+    """
+    Streaming score report which keeps only the K best spots by overall
+    score, and optionally by individual decorator scores, using fixed
+    size heaps. Rankings may be generated at any time while spots are
+    still being added.
+    """
+
+    def __init__(self, k: int, score_names: List[str] = None):
+        assert k > 0, 'K %s must be positive' % str(k)
+
+        self.k = k
+        self.heap = []
+        self.score_heaps = {score_name: [] for score_name in (score_names or [])}
+        self.counter = count()
+        self.spot_count = 0
+
+    def add_spot(self, spot: Spot):
+
+        scores = spot.get_scores()
+
+        spot_data = {'name': spot.get_name(), 'lat': spot.get_lat(), 'long': spot.get_long(),
+                     'overall_score': spot.get_overall_score()}
+        spot_data.update(scores)
+
+        order = next(self.counter)
+        self._push(self.heap, spot_data['overall_score'], order, spot_data)
+
+        for score_name, score_heap in self.score_heaps.items():
+            if score_name in scores:
+                self._push(score_heap, scores[score_name], order, spot_data)
+
+        self.spot_count += 1
+
+    def add_spots(self, spots: Iterable[Spot]) -> 'TopScoreReport':
+        for spot in spots:
+            self.add_spot(spot)
+        return self
+
+    def get_k(self) -> int:
+        return self.k
+
+    def get_spot_count(self) -> int:
+        return self.spot_count
+
+    def get_report(self) -> DataFrame:
+        """
+        Current top K spots sorted by overall score
+        """
+
+        return self._generate_report(self.heap)
+
+    def get_score_report(self, score_name: str) -> DataFrame:
+        """
+        Current top K spots sorted by an individual decorator score
+        """
+
+        assert score_name in self.score_heaps, 'Score %s is not tracked' % score_name
+        return self._generate_report(self.score_heaps[score_name])
+
+    def _push(self, heap: List, score: float, order: int, spot_data: Dict):
+
+        # Negative order keeps the earliest spot when scores are tied
+        entry = (score, -order, spot_data)
+
+        if len(heap) < self.k:
+            heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapreplace(heap, entry)
+
+    @staticmethod
+    def _generate_report(heap: List) -> DataFrame:
+
+        data = [spot_data for _, _, spot_data in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+
+        df = DataFrame(data)
+        if len(data) == 0:
+            df = DataFrame(columns=['name', 'lat', 'long', 'overall_score'])
+
+        return df
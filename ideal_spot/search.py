@@ -0,0 +1,181 @@
+from heapq import heappop, heappush
+from itertools import count
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.spots import Spot
+from ideal_spot.targets import WeatherTarget
+
+
+class GridCell:
+    """
+    Rectangular cell of a search grid evaluated at its center
+    """
+
+    __slots__ = ('min_lat', 'min_long', 'max_lat', 'max_long', 'depth')
+
+    def __init__(self, min_lat: float, min_long: float, max_lat: float, max_long: float, depth: int = 0):
+        self.min_lat = min_lat
+        self.min_long = min_long
+        self.max_lat = max_lat
+        self.max_long = max_long
+        self.depth = depth
+
+    def get_center(self) -> Tuple[float, float]:
+        return (self.min_lat + self.max_lat) / 2.0, (self.min_long + self.max_long) / 2.0
+
+    def get_depth(self) -> int:
+        return self.depth
+
+    def split(self, subdivisions: int) -> List['GridCell']:
+        """
+        Split the cell into subdivisions x subdivisions child cells
+        """
+
+        lats = np.linspace(self.min_lat, self.max_lat, subdivisions + 1)
+        longs = np.linspace(self.min_long, self.max_long, subdivisions + 1)
+
+        return [GridCell(float(lats[i]), float(longs[j]), float(lats[i + 1]), float(longs[j + 1]), self.depth + 1)
+                for i in range(subdivisions) for j in range(subdivisions)]
+
+
+class SpotSearch:
+    """
+    Coarse to fine search for the best spots within a bounding box.
+    A coarse grid of spots is evaluated first, then the cells with the
+    highest overall scores are repeatedly split into finer cells until
+    the budget of API calls is used up. Each evaluated spot costs one
+    forecast request, spots sharing a cell center are only evaluated
+    once.
+    """
+
+    def __init__(self, target: WeatherTarget, score_weight_map: Dict[str, float] = None, grid_size: int = 4,
+                 subdivisions: int = 3, max_depth: int = 8, precision: int = 4, workers: int = None):
+        """
+        Parameters
+        ----------
+        target : WeatherTarget
+            Configure WeatherTarget class used to generate scores
+        score_weight_map : Dict[str, float]
+            Optional weight map for WeatherClass decorators
+        grid_size : int
+            Number of coarse cells along each side of the bounding box
+        subdivisions : int
+            Number of child cells along each side of a refined cell, an
+            odd number lets the center child reuse its parent's score
+        max_depth : int
+            Maximum number of times a coarse cell is refined
+        precision : int
+            Decimal places cell centers are rounded to, which also names
+            the generated spots
+        workers : int
+            Optional number of worker threads used to evaluate spots
+        """
+
+        assert grid_size > 0, 'Grid size %s must be positive' % str(grid_size)
+        assert subdivisions > 1, 'Subdivisions %s must be greater than one' % str(subdivisions)
+
+        self.target = target
+        self.score_weight_map = score_weight_map
+        self.grid_size = grid_size
+        self.subdivisions = subdivisions
+        self.max_depth = max_depth
+        self.precision = precision
+        self.workers = workers
+
+        self.spots = dict()
+        self.api_call_count = 0
+
+    def get_api_call_count(self) -> int:
+        return self.api_call_count
+
+    def get_spots(self) -> Set[Spot]:
+        """
+        Every spot evaluated by the search so far
+        """
+        return set(self.spots.values())
+
+    def search(self, min_lat: float, min_long: float, max_lat: float, max_long: float,
+               api_call_budget: int) -> Set[Spot]:
+        """
+        Search a bounding box for the best spots
+
+        Parameters
+        ----------
+        min_lat : float
+            Southern edge of the bounding box
+        min_long : float
+            Western edge of the bounding box
+        max_lat : float
+            Northern edge of the bounding box
+        max_long : float
+            Eastern edge of the bounding box
+        api_call_budget : int
+            Maximum number of spots evaluated by this search
+
+        Returns
+        -------
+        Set[Spot]
+            Scored spots evaluated by this search
+        """
+
+        assert min_lat < max_lat, 'Min lat %s must be less than max lat %s' % (str(min_lat), str(max_lat))
+        assert min_long < max_long, 'Min long %s must be less than max long %s' % (str(min_long), str(max_long))
+        assert api_call_budget > 0, 'API call budget %s must be positive' % str(api_call_budget)
+
+        budget = api_call_budget
+        searched_spots = dict()
+
+        # Max heap of evaluated cells by the overall score at their center
+        heap = []
+        counter = count()
+
+        cells = GridCell(min_lat, min_long, max_lat, max_long).split(self.grid_size)
+
+        while True:
+
+            cell_spots, budget = self._evaluate_cells(cells, budget)
+            for cell, spot in cell_spots:
+                searched_spots[spot.get_name()] = spot
+                # Coarse cells have a depth of one
+                if cell.get_depth() <= self.max_depth:
+                    heappush(heap, (-spot.get_overall_score(), next(counter), cell))
+
+            if budget == 0 or len(heap) == 0:
+                break
+
+            _, _, cell = heappop(heap)
+            cells = cell.split(self.subdivisions)
+
+        return set(searched_spots.values())
+
+    def _evaluate_cells(self, cells: List[GridCell], budget: int) -> Tuple[List[Tuple[GridCell, Spot]], int]:
+
+        cell_spots = []
+        new_spots = []
+
+        for cell in cells:
+
+            lat, long = self._round(cell.get_center())
+            name = '%.*f,%.*f' % (self.precision, lat, self.precision, long)
+
+            spot = self.spots.get(name)
+            if spot is None:
+                if budget == 0:
+                    continue
+                spot = Spot(name, lat, long)
+                self.spots[name] = spot
+                new_spots.append(spot)
+                budget -= 1
+
+            cell_spots.append((cell, spot))
+
+        EvaluateSpots.score_spots(new_spots, self.target, self.score_weight_map, self.workers)
+        self.api_call_count += len(new_spots)
+
+        return cell_spots, budget
+
+    def _round(self, coordinates: Tuple[float, float]) -> Tuple[float, float]:
+        return round(coordinates[0], self.precision), round(coordinates[1], self.precision)
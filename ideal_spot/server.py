@@ -0,0 +1,228 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from math import cos, sin
+from random import Random
+from threading import Lock, Thread
+from time import monotonic, sleep, time
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+from ideal_spot.cache import FORECAST_CYCLE
+
+FORECAST_STEP = 10800
+
+
+def generate_forecast_payload(lat: float, long: float, start: int, count: int = 40) -> Dict:
+    """
+    Deterministic synthetic response of the forecast endpoint, values
+    vary smoothly with the coordinates and time
+
+    Parameters
+    ----------
+    lat : float
+        Latitude of the forecast
+    long : float
+        Longitude of the forecast
+    start : int
+        Unix timestamp of the first forecast step
+    count : int
+        Number of 3 hour forecast steps
+
+    Returns
+    -------
+    Dict
+        Forecast response in the OpenWeatherMap layout
+    """
+
+    rows = []
+    for i in range(count):
+
+        phase = lat * 0.1 + long * 0.05 + i * 0.4
+        temp = 285.0 - abs(lat) * 0.3 + 8.0 * sin(phase)
+        row = {'dt': start + FORECAST_STEP * i,
+               'main': {'temp': round(temp, 2), 'temp_min': round(temp - 1.5, 2), 'temp_max': round(temp + 1.5, 2)},
+               'clouds': {'all': int(50 + 50 * sin(phase * 0.7))},
+               'wind': {'speed': round(6.0 + 5.0 * cos(phase * 1.3), 2)}}
+
+        precipitation = round(max(0.0, 3.0 * sin(phase * 0.9)), 2)
+        if precipitation > 0.0:
+            row['snow' if temp < 273.15 else 'rain'] = {'3h': precipitation}
+
+        rows.append(row)
+
+    return {'cod': '200', 'cnt': count, 'list': rows,
+            'city': {'coord': {'lat': lat, 'lon': long}, 'timezone': 0}}
+
+
+def generate_group_payload(city_ids: List[int], timestamp: int) -> Dict:
+    """
+    Deterministic synthetic response of the group endpoint
+    """
+
+    rows = []
+    for city_id in city_ids:
+        temp = 270.0 + city_id % 40
+        rows.append({'id': city_id, 'dt': timestamp,
+                     'main': {'temp': temp, 'temp_min': temp - 1.0, 'temp_max': temp + 1.0},
+                     'clouds': {'all': city_id % 100}, 'wind': {'speed': float(city_id % 15)}})
+
+    return {'cnt': len(rows), 'list': rows}
+
+
+class ForecastServer:
+    """
+    Local stand-in for the OpenWeatherMap forecast and group endpoints
+    serving synthetic data, with configurable response latency, a rate
+    of random server errors and a rate limit answered with 429 responses.
+    Point a WeatherTransport at it using its base URL.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, error_rate: float = 0.0,
+                 calls_per_minute: float = None, start: int = None, count: int = 40, seed: int = None,
+                 missing_city_ids: List[int] = None):
+        """
+        Parameters
+        ----------
+        host : str
+            Interface the server listens on
+        port : int
+            Port the server listens on, a free port is picked when zero
+        latency : float
+            Seconds each response is delayed by
+        error_rate : float
+            Fraction of requests answered with a 500 error
+        calls_per_minute : float
+            Optional rate limit, requests above it are answered with 429
+        start : int
+            Unix timestamp of the first forecast step, defaults to the
+            start of the current forecast cycle
+        count : int
+            Number of forecast steps in each response
+        seed : int
+            Optional seed for the random errors
+        missing_city_ids : List[int]
+            Optional city ids left out of group responses, as the API
+            does for unknown cities
+        """
+
+        assert latency >= 0.0, 'Latency %s must not be negative' % str(latency)
+        assert 0.0 <= error_rate <= 1.0, 'Error rate %s must be between 0 and 1' % str(error_rate)
+        assert calls_per_minute is None or calls_per_minute > 0, \
+            'Calls per minute %s must be positive' % str(calls_per_minute)
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls_per_minute = calls_per_minute
+        self.start = start if start is not None else int(time() // FORECAST_CYCLE * FORECAST_CYCLE)
+        self.count = count
+        self.random = Random(seed)
+        self.missing_city_ids = set(missing_city_ids) if missing_city_ids is not None else set()
+
+        self.tokens = 1.0
+        self.last_refill = monotonic()
+        self.stats = {'requests': 0, 'errors': 0, 'throttled': 0}
+        self.lock = Lock()
+
+        self.server = ThreadingHTTPServer((host, port), _ForecastRequestHandler)
+        self.server.daemon_threads = True
+        self.server.forecast_server = self
+        self.thread = None
+
+    def get_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def get_start(self) -> int:
+        return self.start
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.stats)
+
+    def start_server(self) -> 'ForecastServer':
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop_server(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self) -> 'ForecastServer':
+        return self.start_server()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop_server()
+
+    def _get_status(self) -> int:
+        """
+        Status of the next request, applying the rate limit and random errors
+        """
+
+        with self.lock:
+            self.stats['requests'] += 1
+
+            if self.calls_per_minute is not None:
+                now = monotonic()
+                self.tokens = min(1.0, self.tokens + (now - self.last_refill) * self.calls_per_minute / 60.0)
+                self.last_refill = now
+                if self.tokens < 1.0:
+                    self.stats['throttled'] += 1
+                    return 429
+                self.tokens -= 1.0
+
+            if self.error_rate > 0.0 and self.random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 500
+
+        return 200
+
+    def _get_retry_after(self) -> int:
+        return max(1, int(60.0 / self.calls_per_minute + 0.5)) if self.calls_per_minute is not None else 1
+
+
+class _ForecastRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+
+        forecast_server = self.server.forecast_server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if forecast_server.latency > 0.0:
+            sleep(forecast_server.latency)
+
+        status = forecast_server._get_status()
+
+        if status == 429:
+            self._send_json(status, {'cod': 429, 'message': 'Too many requests'},
+                            {'Retry-After': str(forecast_server._get_retry_after())})
+        elif status != 200:
+            self._send_json(status, {'cod': status, 'message': 'Internal error'})
+        elif url.path == '/data/2.5/forecast' and 'lat' in query and 'lon' in query:
+            self._send_json(200, generate_forecast_payload(float(query['lat'][0]), float(query['lon'][0]),
+                                                           forecast_server.start, forecast_server.count))
+        elif url.path == '/data/2.5/group' and 'id' in query:
+            city_ids = [int(city_id) for city_id in query['id'][0].split(',')
+                        if int(city_id) not in forecast_server.missing_city_ids]
+            self._send_json(200, generate_group_payload(city_ids, forecast_server.start))
+        else:
+            self._send_json(404, {'cod': '404', 'message': 'Not found'})
+
+    def _send_json(self, status: int, body: Dict, headers: Dict[str, str] = None):
+
+        content = dumps(body).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for header_name, header_value in (headers or dict()).items():
+            self.send_header(header_name, header_value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,272 @@
+from abc import ABC, abstractmethod
+from hashlib import sha1
+import os
+import sqlite3
+from threading import Lock
+from time import time
+from typing import Callable, Dict, Iterable, List, Union
+
+from pandas import concat, DataFrame, read_csv
+
+from ideal_spot.pipeline import CsvScoreSink, SpotPipeline
+from ideal_spot.spatial import encode_geohash
+from ideal_spot.spots import Spot, SpotCollection
+from ideal_spot.targets import WeatherTarget
+
+
+class ShardQueue(ABC):
+    """
+    Work queue handing out shard ids to workers, a shard which is
+    claimed but never completed is handed out again after a timeout
+    """
+
+    @abstractmethod
+    def put(self, shard_ids: Iterable[str]):
+        """
+        Queue shard ids, shards already in the queue keep their status
+        """
+        pass
+
+    @abstractmethod
+    def claim(self) -> str:
+        """
+        Claim the next pending shard id or return None if no shard is pending
+        """
+        pass
+
+    @abstractmethod
+    def complete(self, shard_id: str):
+        pass
+
+    def release(self, shard_id: str):
+        """
+        Hand a claimed shard back as pending, queues which do not support
+        this hand the shard out again after the claim timeout
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteShardQueue(ShardQueue):
+    """
+    Shard queue stored in a SQLite database which may be shared by
+    worker processes on the same host without external services
+    """
+
+    def __init__(self, path: str, claim_timeout: float = 3600.0, clock: Callable[[], float] = time):
+        assert claim_timeout > 0, 'Claim timeout %s must be positive' % str(claim_timeout)
+
+        self.path = path
+        self.claim_timeout = claim_timeout
+        self.clock = clock
+        self.lock = Lock()
+
+        self.connection = sqlite3.connect(path, timeout=60.0, isolation_level=None, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS shard_queue '
+                                '(shard_id TEXT PRIMARY KEY, status TEXT, claimed_at REAL)')
+
+    def put(self, shard_ids: Iterable[str]):
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany('INSERT OR IGNORE INTO shard_queue VALUES (?, \'pending\', NULL)',
+                                        ((shard_id,) for shard_id in shard_ids))
+            self.connection.execute('COMMIT')
+
+    def claim(self) -> str:
+        with self.lock:
+            now = self.clock()
+
+            # Immediate transactions stop two workers from claiming the same shard
+            self.connection.execute('BEGIN IMMEDIATE')
+            row = self.connection.execute('SELECT shard_id FROM shard_queue WHERE status = \'pending\' '
+                                          'OR (status = \'claimed\' AND claimed_at <= ?) ORDER BY shard_id LIMIT 1',
+                                          (now - self.claim_timeout,)).fetchone()
+            if row is not None:
+                self.connection.execute('UPDATE shard_queue SET status = \'claimed\', claimed_at = ? '
+                                        'WHERE shard_id = ?', (now, row[0]))
+            self.connection.execute('COMMIT')
+
+        return row[0] if row is not None else None
+
+    def complete(self, shard_id: str):
+        with self.lock:
+            self.connection.execute('UPDATE shard_queue SET status = \'done\' WHERE shard_id = ?', (shard_id,))
+
+    def release(self, shard_id: str):
+        with self.lock:
+            self.connection.execute('UPDATE shard_queue SET status = \'pending\', claimed_at = NULL '
+                                    'WHERE shard_id = ? AND status = \'claimed\'', (shard_id,))
+
+    def get_status_counts(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.connection.execute('SELECT status, COUNT(*) FROM shard_queue GROUP BY status'))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class ShardedRunner:
+    """
+    Checkpointed evaluation of a large spot set split into shards of
+    nearby spots by geohash prefix. The spots of each shard are written
+    to the output directory, shards are handed out through a ShardQueue
+    and the scores of each shard are saved as soon as it completes.
+    Shards with saved scores are skipped when a run is restarted, so
+    only missing shards are evaluated again. A hash of the spot set is
+    kept in the output directory and a restart with different spots is
+    rejected. Any number of workers may share the output directory and
+    queue.
+    """
+
+    SPOTS_HASH_FILE = 'spots.sha1'
+    SPOTS_SUFFIX = '.spots.csv'
+    SCORES_SUFFIX = '.scores.csv'
+
+    def __init__(self, target: WeatherTarget, output_path: str, queue: ShardQueue = None,
+                 score_weight_map: Dict[str, float] = None, geohash_precision: int = 3, workers: int = None,
+                 vectorized: bool = False):
+
+        os.makedirs(output_path, exist_ok=True)
+
+        self.target = target
+        self.output_path = output_path
+        self.queue = queue if queue is not None else SQLiteShardQueue(os.path.join(output_path, 'queue.db'))
+        self.geohash_precision = geohash_precision
+        self.pipeline = SpotPipeline(target, score_weight_map, workers, vectorized)
+
+    def get_queue(self) -> ShardQueue:
+        return self.queue
+
+    def get_shard_ids(self) -> List[str]:
+        return sorted(file_name[:-len(ShardedRunner.SPOTS_SUFFIX)] for file_name in os.listdir(self.output_path)
+                      if file_name.endswith(ShardedRunner.SPOTS_SUFFIX))
+
+    def get_missing_shard_ids(self) -> List[str]:
+        return [shard_id for shard_id in self.get_shard_ids() if not os.path.exists(self._get_scores_path(shard_id))]
+
+    def prepare(self, spots: Union[Iterable[Spot], SpotCollection]) -> List[str]:
+        """
+        Split spots into shards, write the spots of each shard and queue
+        every shard without saved scores. The spots must match those of
+        any earlier run in the output directory.
+
+        Returns
+        -------
+        List[str]
+            Queued shard ids
+        """
+
+        if not isinstance(spots, SpotCollection):
+            spots = SpotCollection.from_spots(spots)
+
+        df = spots.to_dataframe()[['name', 'lat', 'long']]
+        shard_ids = [encode_geohash(lat, long, self.geohash_precision) for lat, long in zip(df['lat'], df['long'])]
+
+        # Existing shard files are kept, so they must have been written for the same spots and precision
+        spots_hash = self._get_spots_hash(df)
+        hash_path = os.path.join(self.output_path, ShardedRunner.SPOTS_HASH_FILE)
+        if os.path.exists(hash_path):
+            with open(hash_path) as hash_file:
+                prepared_hash = hash_file.read().strip()
+            assert prepared_hash == spots_hash, \
+                'Spots differ from the spots already prepared in %s' % str(self.output_path)
+        else:
+            temporary_path = '%s.%d.tmp' % (hash_path, os.getpid())
+            with open(temporary_path, 'w') as hash_file:
+                hash_file.write(spots_hash)
+            os.replace(temporary_path, hash_path)
+
+        for shard_id, shard_df in df.groupby(shard_ids, sort=True):
+            spots_path = self._get_spots_path(shard_id)
+            if not os.path.exists(spots_path):
+                self._write_atomic(shard_df, spots_path)
+
+        missing_shard_ids = self.get_missing_shard_ids()
+        self.queue.put(missing_shard_ids)
+
+        return missing_shard_ids
+
+    def work(self) -> int:
+        """
+        Claim and score shards until the queue has no pending shard
+
+        Returns
+        -------
+        int
+            Number of shards scored
+        """
+
+        shard_count = 0
+
+        while True:
+
+            shard_id = self.queue.claim()
+            if shard_id is None:
+                return shard_count
+
+            if not os.path.exists(self._get_scores_path(shard_id)):
+                try:
+                    self._score_shard(shard_id)
+                except BaseException:
+                    self.queue.release(shard_id)
+                    raise
+                shard_count += 1
+
+            self.queue.complete(shard_id)
+
+    def merge(self) -> DataFrame:
+        """
+        Merge the saved scores of every shard into one report ranked by
+        overall score
+        """
+
+        missing_shard_ids = self.get_missing_shard_ids()
+        assert len(missing_shard_ids) == 0, 'Shards %s have no saved scores' % str(missing_shard_ids)
+
+        frames = [read_csv(self._get_scores_path(shard_id), dtype={'name': str}) for shard_id in self.get_shard_ids()]
+        if len(frames) == 0:
+            return DataFrame(columns=['name', 'lat', 'long', 'overall_score', 'rank'])
+
+        df = concat(frames, ignore_index=True).sort_values(['overall_score', 'name'], ascending=[False, True])
+        df['rank'] = df['overall_score'].rank(method='min', ascending=False).astype(int)
+
+        return df.reset_index(drop=True)
+
+    def run(self, spots: Union[Iterable[Spot], SpotCollection]) -> DataFrame:
+        """
+        Prepare, score and merge shards in a single worker
+        """
+
+        self.prepare(spots)
+        self.work()
+        return self.merge()
+
+    def _score_shard(self, shard_id: str):
+
+        shard_df = read_csv(self._get_spots_path(shard_id), dtype={'name': str})
+        collection = SpotCollection.from_dataframe(shard_df, 'name', 'lat', 'long')
+
+        # Scores are written to a temporary file first so a crash never leaves a partial shard behind
+        scores_path = self._get_scores_path(shard_id)
+        temporary_path = '%s.%d.tmp' % (scores_path, os.getpid())
+        self.pipeline.run([collection], CsvScoreSink(temporary_path))
+        os.replace(temporary_path, scores_path)
+
+    def _get_spots_hash(self, df: DataFrame) -> str:
+        df = df.sort_values(['name', 'lat', 'long'])
+        return sha1(('%d\n' % self.geohash_precision + df.to_csv(index=False)).encode()).hexdigest()
+
+    def _get_spots_path(self, shard_id: str) -> str:
+        return os.path.join(self.output_path, shard_id + ShardedRunner.SPOTS_SUFFIX)
+
+    def _get_scores_path(self, shard_id: str) -> str:
+        return os.path.join(self.output_path, shard_id + ShardedRunner.SCORES_SUFFIX)
+
+    @staticmethod
+    def _write_atomic(df: DataFrame, path: str):
+        temporary_path = '%s.%d.tmp' % (path, os.getpid())
+        df.to_csv(temporary_path, index=False)
+        os.replace(temporary_path, path)
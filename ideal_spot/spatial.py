@@ -0,0 +1,133 @@
+from abc import ABC, abstractmethod
+from math import floor
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+from ideal_spot.spots import Spot
+
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(lat: float, long: float, precision: int = 7) -> str:
+    """
+    Encode a coordinate as a geohash string of the given length
+    """
+
+    assert precision > 0, 'Geohash precision %s must be positive' % str(precision)
+
+    lat_range = [-90.0, 90.0]
+    long_range = [-180.0, 180.0]
+
+    geohash = []
+    bits = 0
+    bit_count = 0
+    is_long = True
+
+    while len(geohash) < precision:
+
+        coordinate_range, value = (long_range, long) if is_long else (lat_range, lat)
+        middle = (coordinate_range[0] + coordinate_range[1]) / 2.0
+        if value >= middle:
+            bits = (bits << 1) | 1
+            coordinate_range[0] = middle
+        else:
+            bits = bits << 1
+            coordinate_range[1] = middle
+
+        is_long = not is_long
+        bit_count += 1
+
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def decode_geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """
+    Bounding box of a geohash as min lat, min long, max lat, max long
+    """
+
+    lat_range = [-90.0, 90.0]
+    long_range = [-180.0, 180.0]
+    is_long = True
+
+    for character in geohash:
+        bits = GEOHASH_ALPHABET.index(character)
+        for shift in range(4, -1, -1):
+            coordinate_range = long_range if is_long else lat_range
+            middle = (coordinate_range[0] + coordinate_range[1]) / 2.0
+            if (bits >> shift) & 1:
+                coordinate_range[0] = middle
+            else:
+                coordinate_range[1] = middle
+            is_long = not is_long
+
+    return lat_range[0], long_range[0], lat_range[1], long_range[1]
+
+
+class SpatialIndex(ABC):
+    """
+    Snaps coordinates to cells so nearby spots can share a single
+    forecast. Every cell is represented by the coordinate of its center.
+    """
+
+    @abstractmethod
+    def get_cell(self, lat: float, long: float) -> Hashable:
+        pass
+
+    @abstractmethod
+    def get_cell_center(self, cell: Hashable) -> Tuple[float, float]:
+        pass
+
+    def group_spots(self, spots: Iterable[Spot]) -> Dict[Hashable, List[Spot]]:
+        """
+        Spots grouped by the cell containing them
+        """
+
+        cell_spots = dict()
+        for spot in spots:
+            cell_spots.setdefault(self.get_cell(spot.get_lat(), spot.get_long()), []).append(spot)
+
+        return cell_spots
+
+
+class GridIndex(SpatialIndex):
+    """
+    Regular lat long grid where the tolerance is the cell size in degrees
+    """
+
+    def __init__(self, tolerance: float = 0.01):
+        assert tolerance > 0, 'Tolerance %s must be positive' % str(tolerance)
+        self.tolerance = tolerance
+
+    def get_tolerance(self) -> float:
+        return self.tolerance
+
+    def get_cell(self, lat: float, long: float) -> Tuple[int, int]:
+        return floor(lat / self.tolerance), floor(long / self.tolerance)
+
+    def get_cell_center(self, cell: Tuple[int, int]) -> Tuple[float, float]:
+        return (cell[0] + 0.5) * self.tolerance, (cell[1] + 0.5) * self.tolerance
+
+
+class GeohashIndex(SpatialIndex):
+    """
+    Geohash cells where the precision is the length of the geohash
+    """
+
+    def __init__(self, precision: int = 6):
+        assert precision > 0, 'Geohash precision %s must be positive' % str(precision)
+        self.precision = precision
+
+    def get_precision(self) -> int:
+        return self.precision
+
+    def get_cell(self, lat: float, long: float) -> str:
+        return encode_geohash(lat, long, self.precision)
+
+    def get_cell_center(self, cell: str) -> Tuple[float, float]:
+        min_lat, min_long, max_lat, max_long = decode_geohash_bounds(cell)
+        return (min_lat + max_lat) / 2.0, (min_long + max_long) / 2.0
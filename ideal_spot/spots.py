@@ -1,8 +1,14 @@
-from typing import Dict
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+from pandas import DataFrame, Series
 
 
 class Spot:
 
+    __slots__ = ('name', 'lat', 'long', 'scores', 'overall_score')
+
     def __init__(self, name: str, lat: float, long: float):
 
         self.name = name
@@ -38,3 +44,183 @@ class Spot:
 
     def __hash__(self) -> int:
         return hash(self.get_name())
+
+
+class SpotCollection:
+    """
+    Column store for a large number of spots. Names, coordinates,
+    individual decorator scores and overall scores are kept in parallel
+    arrays and spots are accessed through lightweight SpotView objects.
+    Spots with duplicate names are dropped keeping the first occurrence.
+    """
+
+    def __init__(self, names: Iterable[str], lats: Iterable[float], longs: Iterable[float]):
+
+        names = np.asarray(names, dtype=object)
+        lats = np.asarray(lats, dtype=np.float64)
+        longs = np.asarray(longs, dtype=np.float64)
+
+        assert len(names) == len(lats) == len(longs), 'Names, lats and longs must have the same length'
+
+        unique = ~Series(names).duplicated(keep='first').to_numpy()
+        if not np.all(unique):
+            names, lats, longs = names[unique], lats[unique], longs[unique]
+
+        self.names = names
+        self.lats = lats
+        self.longs = longs
+
+        self.score_columns = dict()
+        self.overall_scores = np.zeros(len(names), dtype=np.float64)
+        self.name_index = None
+        self.lock = Lock()
+
+    def get_names(self) -> np.ndarray:
+        return self.names
+
+    def get_lats(self) -> np.ndarray:
+        return self.lats
+
+    def get_longs(self) -> np.ndarray:
+        return self.longs
+
+    def get_overall_scores(self) -> np.ndarray:
+        return self.overall_scores
+
+    def get_score_names(self) -> List[str]:
+        with self.lock:
+            return list(self.score_columns)
+
+    def get_score_column(self, score_name: str) -> np.ndarray:
+        return self.score_columns[score_name]
+
+    def get_score_matrix(self, score_names: List[str] = None) -> np.ndarray:
+        """
+        Individual decorator scores as a spots x scores matrix, missing
+        scores are NaN
+        """
+
+        if score_names is None:
+            score_names = self.get_score_names()
+
+        matrix = np.full((len(self), len(score_names)), np.nan, dtype=np.float64)
+        with self.lock:
+            for i, score_name in enumerate(score_names):
+                if score_name in self.score_columns:
+                    matrix[:, i] = self.score_columns[score_name]
+
+        return matrix
+
+    def get_spot(self, index: int) -> 'SpotView':
+        return SpotView(self, index)
+
+    def get_spot_index(self, name: str) -> int:
+        if self.name_index is None:
+            self.name_index = Series(np.arange(len(self.names)), index=self.names)
+        return int(self.name_index[name])
+
+    def get_spot_scores(self, index: int) -> Dict[str, float]:
+        # Setters may add score columns and write rows from other threads
+        scores = dict()
+        with self.lock:
+            for score_name, score_column in self.score_columns.items():
+                score = score_column[index]
+                if not np.isnan(score):
+                    scores[score_name] = float(score)
+        return scores
+
+    def set_overall_scores(self, overall_scores: np.ndarray):
+        self.overall_scores[:] = overall_scores
+
+    def set_score_column(self, score_name: str, scores: np.ndarray):
+        with self.lock:
+            self._get_score_column(score_name)[:] = scores
+
+    def set_score_matrix(self, score_names: List[str], matrix: np.ndarray):
+        with self.lock:
+            for i, score_name in enumerate(score_names):
+                self._get_score_column(score_name)[:] = matrix[:, i]
+
+    def set_spot_scores(self, index: int, scores: Dict[str, float]):
+        with self.lock:
+            for score_name, score_column in self.score_columns.items():
+                if score_name not in scores:
+                    score_column[index] = np.nan
+            for score_name, score in scores.items():
+                self._get_score_column(score_name)[index] = score
+
+    def to_dataframe(self) -> DataFrame:
+
+        columns = {'name': self.names, 'lat': self.lats, 'long': self.longs, 'overall_score': self.overall_scores}
+        with self.lock:
+            columns.update(self.score_columns)
+
+        return DataFrame(columns)
+
+    @staticmethod
+    def from_dataframe(df: DataFrame, name_column: str, lat_column: str, long_column: str) -> 'SpotCollection':
+        return SpotCollection(df[name_column].to_numpy(dtype=object), df[lat_column].to_numpy(dtype=np.float64),
+                              df[long_column].to_numpy(dtype=np.float64))
+
+    @staticmethod
+    def from_spots(spots: Iterable[Spot]) -> 'SpotCollection':
+
+        unique_spots = dict()
+        for spot in spots:
+            unique_spots.setdefault(spot.get_name(), spot)
+        spots = list(unique_spots.values())
+
+        collection = SpotCollection([spot.get_name() for spot in spots], [spot.get_lat() for spot in spots],
+                                    [spot.get_long() for spot in spots])
+
+        for i, spot in enumerate(spots):
+            if len(spot.get_scores()) > 0:
+                collection.set_spot_scores(i, spot.get_scores())
+            collection.overall_scores[i] = spot.get_overall_score()
+
+        return collection
+
+    def _get_score_column(self, score_name: str) -> np.ndarray:
+        if score_name not in self.score_columns:
+            self.score_columns[score_name] = np.full(len(self), np.nan, dtype=np.float64)
+        return self.score_columns[score_name]
+
+    def __iter__(self) -> Iterator['SpotView']:
+        for index in range(len(self)):
+            yield SpotView(self, index)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class SpotView(Spot):
+    """
+    Spot backed by a row of a SpotCollection
+    """
+
+    __slots__ = ('collection', 'index')
+
+    def __init__(self, collection: SpotCollection, index: int):
+        self.collection = collection
+        self.index = index
+
+    def get_lat(self) -> float:
+        return float(self.collection.lats[self.index])
+
+    def get_long(self) -> float:
+        return float(self.collection.longs[self.index])
+
+    def get_name(self) -> str:
+        return self.collection.names[self.index]
+
+    def get_overall_score(self) -> float:
+        return float(self.collection.overall_scores[self.index])
+
+    def get_scores(self) -> Dict[str, float]:
+        return self.collection.get_spot_scores(self.index)
+
+    def set_overall_score(self, overall_score: float):
+        self.collection.overall_scores[self.index] = overall_score
+
+    def set_scores(self, scores: Dict[str, float]):
+        self.collection.set_spot_scores(self.index, scores)
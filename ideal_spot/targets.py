@@ -1,28 +1,145 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Dict, Set
+from inspect import signature
+from threading import RLock
+from typing import Dict, List, Set, Tuple
 
-from pandas import DataFrame
+import numpy as np
+from pandas import concat, DataFrame, DatetimeIndex
 
-from ideal_spot.feed import ForecastWeatherFeedFactory
+from ideal_spot.cache import FORECAST_CYCLE, ForecastCache
+from ideal_spot.feed import ClientSession, ForecastWeatherFeedFactory, GroupWeatherFeed
 from ideal_spot.spots import Spot
+from ideal_spot.transport import WeatherTransport
+
+TIME_UNIT = 'datetime64[us]'
+
+# Decorators which still read their forecast through get_forecast_data share
+# the data stored on the target, so they are scored one at a time
+_forecast_data_lock = RLock()
+
+
+class ForecastWindows:
+    """
+    Forecast data for a single spot which finds each time window using a
+    binary search over the sorted forecast times and reuses aggregates
+    shared by decorators over the same window. Windows of time ordered
+    data are returned as slices rather than filtered copies.
+    """
+
+    def __init__(self, forecast_data: DataFrame):
+        self.forecast_data = forecast_data
+        self.windows = dict()
+        self.aggregates = dict()
+        self.columns = dict()
+
+        if isinstance(forecast_data.index, DatetimeIndex) and forecast_data.index.is_monotonic_increasing:
+            times = forecast_data.index.to_numpy()
+        else:
+            times = forecast_data['datetime'].to_numpy()
+
+        self.times = times.astype(TIME_UNIT)
+        self.order = None
+        if len(self.times) > 1 and np.any(self.times[1:] < self.times[:-1]):
+            self.order = np.argsort(self.times, kind='stable')
+            self.times = self.times[self.order]
+
+    def get_data(self) -> DataFrame:
+        return self.forecast_data
+
+    def get_window(self, range_start: datetime, range_end: datetime) -> DataFrame:
+
+        start_index, end_index = self.get_window_bounds(range_start, range_end)
+
+        if self.order is None:
+            return self.forecast_data.iloc[start_index:end_index]
+        return self.forecast_data.iloc[self.order[start_index:end_index]]
+
+    def get_window_bounds(self, range_start: datetime, range_end: datetime) -> Tuple[int, int]:
+
+        key = (range_start, range_end)
+
+        if key not in self.windows:
+            start_index = int(np.searchsorted(self.times, np.datetime64(range_start, 'us'), side='left'))
+            end_index = int(np.searchsorted(self.times, np.datetime64(range_end, 'us'), side='right'))
+            self.windows[key] = (start_index, max(start_index, end_index))
+
+        return self.windows[key]
+
+    def get_window_times(self, range_start: datetime, range_end: datetime) -> np.ndarray:
+        start_index, end_index = self.get_window_bounds(range_start, range_end)
+        return self.times[start_index:end_index]
+
+    def get_window_values(self, range_start: datetime, range_end: datetime, value_name: str) -> np.ndarray:
+        start_index, end_index = self.get_window_bounds(range_start, range_end)
+        return self._get_column(value_name)[start_index:end_index]
+
+    def get_aggregate(self, range_start: datetime, range_end: datetime, value_name: str, operation: str) -> float:
+
+        key = (range_start, range_end, value_name, operation)
+
+        if key not in self.aggregates:
+            start_index, end_index = self.get_window_bounds(range_start, range_end)
+            values = self._get_column(value_name)[start_index:end_index]
+
+            cumulative_value = None
+            if operation == 'sum':
+                cumulative_value = float(np.nansum(values, dtype=np.float64))
+            elif operation == 'mean':
+                count = np.count_nonzero(~np.isnan(values))
+                cumulative_value = float(np.nansum(values, dtype=np.float64)) / count if count > 0 else np.nan
+
+            self.aggregates[key] = cumulative_value
+
+        return self.aggregates[key]
+
+    def _get_column(self, value_name: str) -> np.ndarray:
+
+        if value_name not in self.columns:
+            values = self.forecast_data[value_name].to_numpy()
+            if values.dtype.kind != 'f':
+                values = values.astype(np.float64)
+            if self.order is not None:
+                values = values[self.order]
+            self.columns[value_name] = values
+
+        return self.columns[value_name]
 
 
 class WeatherTarget(ABC):
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, transport: WeatherTransport = None, cache: ForecastCache = None):
         self.api_key = api_key
+        self.transport = transport
+        self.cache = cache
         self.forecast_data = None
 
     def evaluate_spot(self, spot: Spot):
         metrics = self.get_forecast_metrics()
         feed_data = self.generate_forecast_data(spot, metrics)
-        self.set_forecast_data(feed_data)
-        spot.set_scores(self.calculate_scores(spot))
+        self._score_spot(spot, feed_data)
+
+    async def evaluate_spot_async(self, spot: Spot, session: ClientSession = None):
+        metrics = self.get_forecast_metrics()
+        feed_data = await self.generate_forecast_data_async(spot, metrics, session)
+        self._score_spot(spot, feed_data)
+
+    def is_stateless(self) -> bool:
+        """
+        Check whether the chain scores the forecast data passed to it
+        without reading it back through get_forecast_data
+        """
+        return True
 
     def get_api_key(self) -> str:
         return self.api_key
 
+    def get_cache(self) -> ForecastCache:
+        return self.cache
+
+    def get_transport(self) -> WeatherTransport:
+        return self.transport
+
     def get_forecast_data(self) -> DataFrame:
         return self.forecast_data
 
@@ -32,14 +149,133 @@ class WeatherTarget(ABC):
     def get_forecast_metrics(self) -> Set[str]:
         return set()
 
-    def calculate_scores(self, spot: Spot) -> Dict:
+    def register_range(self, value_name: str, range_start: datetime, range_end: datetime):
+        """
+        Called by each range decorator wrapping the target with the time
+        window it scores a value over
+        """
+        pass
+
+    def calculate_scores(self, spot: Spot, forecast_data: DataFrame = None) -> Dict:
         return dict()
 
+    def _calculate_window_scores(self, spot: Spot, windows: ForecastWindows) -> Dict:
+        return self.calculate_scores(spot, windows.get_data())
+
+    def _score_spot(self, spot: Spot, feed_data: DataFrame):
+
+        if self.is_stateless():
+            spot.set_scores(self.calculate_scores(spot, feed_data))
+            return
+
+        # Chains with decorators written against the old API see the forecast of the spot on the target
+        with _forecast_data_lock:
+            self.set_forecast_data(feed_data)
+            spot.set_scores(self.calculate_scores(spot))
+
     def generate_forecast_data(self, spot: Spot, metrics: Set[str]) -> DataFrame:
-        feed = ForecastWeatherFeedFactory(self.get_api_key(), spot.get_lat(), spot.get_long()).generate_feed(metrics)
+        feed = ForecastWeatherFeedFactory(self.get_api_key(), spot.get_lat(), spot.get_long(),
+                                          self.get_transport(), self.get_cache()).generate_feed(metrics)
         feed_data = feed.get_data()
         return feed_data
 
+    async def generate_forecast_data_async(self, spot: Spot, metrics: Set[str],
+                                           session: ClientSession = None) -> DataFrame:
+        feed = ForecastWeatherFeedFactory(self.get_api_key(), spot.get_lat(), spot.get_long(),
+                                          self.get_transport(), self.get_cache()).generate_feed(metrics)
+        feed_data = await feed.get_data_async(session)
+        return feed_data
+
+
+class GroupWeatherTarget(WeatherTarget):
+    """
+    WeatherTarget which fetches the metrics provided by the OpenWeatherMap
+    group endpoint for many spots at once. Spots are matched to city ids
+    by name and the city ids are split into the largest groups the
+    endpoint allows, the whole group of a spot is fetched the first time
+    any of its spots is evaluated and kept in the group cache until the
+    next forecast cycle. Group data holds the current observation only,
+    so it is used for a metric only when every range decorator window
+    over the metric contains the observation time and ends before the
+    next forecast step. Other metrics, and every metric of spots without
+    a city id, are fetched from the per spot forecast endpoint and joined
+    on time. Asynchronous evaluation fetches every metric from the per
+    spot forecast endpoint.
+    """
+
+    def __init__(self, api_key: str, spot_city_ids: Dict[str, int], transport: WeatherTransport = None,
+                 cache: ForecastCache = None, group_cache: ForecastCache = None):
+        super().__init__(api_key, transport, cache)
+        self.spot_city_ids = dict(spot_city_ids)
+
+        city_ids = list(dict.fromkeys(self.spot_city_ids.values()))
+        self.city_groups = [city_ids[i:i + GroupWeatherFeed.MAX_GROUP_SIZE]
+                            for i in range(0, len(city_ids), GroupWeatherFeed.MAX_GROUP_SIZE)]
+        self.city_group_index = {city_id: i for i, city_group in enumerate(self.city_groups) for city_id in city_group}
+
+        self.group_cache = group_cache if group_cache is not None else ForecastCache(align_to_cycle=True)
+        self.ranges = dict()
+
+    def get_city_groups(self) -> List[List[int]]:
+        return self.city_groups
+
+    def get_group_cache(self) -> ForecastCache:
+        return self.group_cache
+
+    def register_range(self, value_name: str, range_start: datetime, range_end: datetime):
+        self.ranges.setdefault(value_name, []).append((range_start, range_end))
+
+    def generate_forecast_data(self, spot: Spot, metrics: Set[str]) -> DataFrame:
+
+        city_id = self.spot_city_ids.get(spot.get_name())
+        group_metrics = metrics & GroupWeatherFeed.get_provided_metrics() if city_id is not None else set()
+
+        frames = []
+        if len(group_metrics) > 0:
+            group_frame = self._get_group_data(city_id)
+            if group_frame is not None:
+                observed_at = group_frame.index[0].to_pydatetime()
+                group_metrics = {metric for metric in group_metrics if self._is_observed(metric, observed_at)}
+            else:
+                group_metrics = set()
+
+            if len(group_metrics) > 0:
+                columns = ['datetime'] + [column_name for metric in sorted(group_metrics)
+                                          for column_name in GroupWeatherFeed.GROUP_FIELDS[metric]]
+                frames.append(group_frame[columns])
+
+        fallback_metrics = metrics - group_metrics
+        if len(fallback_metrics) > 0 or len(frames) == 0:
+            frames.append(super().generate_forecast_data(spot, fallback_metrics))
+
+        if len(frames) == 1:
+            return frames[0]
+
+        return concat(frames).sort_index(kind='stable')
+
+    def _get_group_data(self, city_id: int) -> DataFrame:
+
+        # Concurrent requests for the same group are coalesced by the transport
+        feed = GroupWeatherFeed(self.get_api_key(), self.city_groups[self.city_group_index[city_id]],
+                                self.get_transport(), self.group_cache)
+
+        return feed.get_city_data(city_id)
+
+    def _is_observed(self, metric: str, observed_at: datetime) -> bool:
+        """
+        Check whether every window over the metric is covered by an
+        observation, windows reaching the next forecast step need the
+        forecast
+        """
+
+        ranges = [window for column_name in GroupWeatherFeed.GROUP_FIELDS[metric]
+                  for window in self.ranges.get(column_name, [])]
+
+        next_step = (observed_at.timestamp() // FORECAST_CYCLE + 1) * FORECAST_CYCLE
+
+        return len(ranges) > 0 and all(range_start <= observed_at <= range_end and range_end.timestamp() < next_step
+                                       for range_start, range_end in ranges)
+
 
 class WeatherTargetDecorator(WeatherTarget, ABC):
 
@@ -48,9 +284,18 @@ class WeatherTargetDecorator(WeatherTarget, ABC):
         self.target = target
         self.name = name
 
+        # Decorators written before forecast data was passed explicitly override _calculate_score(spot)
+        self.legacy_score = len(signature(self._calculate_score).parameters) < 2
+
     def get_api_key(self) -> str:
         return self.target.get_api_key()
 
+    def get_cache(self) -> ForecastCache:
+        return self.target.get_cache()
+
+    def get_transport(self) -> WeatherTransport:
+        return self.target.get_transport()
+
     def get_forecast_data(self) -> DataFrame:
         return self.target.get_forecast_data()
 
@@ -61,18 +306,42 @@ class WeatherTargetDecorator(WeatherTarget, ABC):
     def get_forecast_metrics(self) -> Set[str]:
         return self.target.get_forecast_metrics()
 
-    def calculate_scores(self, spot: Spot) -> Dict:
-        scores = self.target.calculate_scores(spot)
-        scores[self.name] = self._calculate_score(spot)
-        return scores
+    def is_stateless(self) -> bool:
+        return not self.legacy_score and self.target.is_stateless()
+
+    def register_range(self, value_name: str, range_start: datetime, range_end: datetime):
+        self.target.register_range(value_name, range_start, range_end)
+
+    def calculate_scores(self, spot: Spot, forecast_data: DataFrame = None) -> Dict:
+        if forecast_data is None:
+            forecast_data = self.get_forecast_data()
+        return self._calculate_window_scores(spot, ForecastWindows(forecast_data))
 
     def generate_forecast_data(self, spot: Spot, metrics: Set[str]) -> DataFrame:
         return self.target.generate_forecast_data(spot, metrics)
 
+    async def generate_forecast_data_async(self, spot: Spot, metrics: Set[str],
+                                           session: ClientSession = None) -> DataFrame:
+        return await self.target.generate_forecast_data_async(spot, metrics, session)
+
     @abstractmethod
-    def _calculate_score(self, spot: Spot) -> float:
+    def _calculate_score(self, spot: Spot, forecast_data: DataFrame = None) -> float:
         pass
 
+    def _calculate_window_score(self, spot: Spot, windows: ForecastWindows) -> float:
+
+        if not self.legacy_score:
+            return self._calculate_score(spot, windows.get_data())
+
+        with _forecast_data_lock:
+            self.set_forecast_data(windows.get_data())
+            return self._calculate_score(spot)
+
+    def _calculate_window_scores(self, spot: Spot, windows: ForecastWindows) -> Dict:
+        scores = self.target._calculate_window_scores(spot, windows)
+        scores[self.name] = self._calculate_window_score(spot, windows)
+        return scores
+
 
 class RangeTargetDecorator(WeatherTargetDecorator, ABC):
 
@@ -90,18 +359,27 @@ class RangeTargetDecorator(WeatherTargetDecorator, ABC):
                                                                                                    str(self.min_value))
         assert self.operation in ['sum', 'mean']
 
-    def _calculate_score(self, spot: Spot) -> float:
+        self.target.register_range(value_name, range_start, range_end)
+
+    def _calculate_score(self, spot: Spot, forecast_data: DataFrame = None) -> float:
+
+        df = forecast_data
+        if df is None:
+            df = self.get_forecast_data()
+
+        return self._score_value(ForecastWindows(df).get_aggregate(self.range_start, self.range_end,
+                                                                   self.value_name, self.operation))
+
+    def _calculate_window_score(self, spot: Spot, windows: ForecastWindows) -> float:
 
-        df = self.get_forecast_data()
+        # Subclasses with their own score calculation expect the full forecast DataFrame
+        if type(self)._calculate_score is not RangeTargetDecorator._calculate_score:
+            return super()._calculate_window_score(spot, windows)
 
-        df = df[df['datetime'] >= self.range_start]
-        df = df[df['datetime'] <= self.range_end]
+        return self._score_value(windows.get_aggregate(self.range_start, self.range_end,
+                                                       self.value_name, self.operation))
 
-        cumulative_value = None
-        if self.operation == 'sum':
-            cumulative_value = df[self.value_name].sum()
-        elif self.operation == 'mean':
-            cumulative_value = df[self.value_name].mean()
+    def _score_value(self, cumulative_value: float) -> float:
 
         normalized_cumulative_value = (cumulative_value - self.min_value) / (self.max_value - self.min_value)
         normalized_cumulative_value = max(0.0, normalized_cumulative_value)
@@ -141,9 +419,9 @@ class IdealValueTargetDecorator(RangeTargetDecorator, ABC):
         super().__init__(target, name, range_start, range_end, value_name, max_value, min_value, 'mean')
         self.ideal_value = ideal_value
 
-    def _calculate_score(self, spot: Spot) -> float:
+    def _score_value(self, cumulative_value: float) -> float:
 
-        normalized_value_average = super()._calculate_score(spot)
+        normalized_value_average = super()._score_value(cumulative_value)
         value_average = normalized_value_average * (self.max_value - self.min_value) + self.min_value
 
         score = abs(self.ideal_value - value_average)
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from typing import List, Set, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from ideal_spot.cache import ForecastCache
+from ideal_spot.spots import Spot
+from ideal_spot.targets import IdealTempTarget, IdealWindTarget, NewRainTarget, WeatherTarget
+from ideal_spot.transport import WeatherTransport
+
+
+class RandomDataWeatherTarget(WeatherTarget):
+    """
+    Target generating random 3 hourly forecasts seeded by the spot latitude,
+    fetched spot names are recorded and fetches for failing_lat raise
+    """
+
+    def __init__(self, api_key: str = 'not used', transport: WeatherTransport = None, cache: ForecastCache = None,
+                 step_counts: Tuple[int, int] = (16, 16), max_start_step: int = 0, failing_lat: float = None):
+        super().__init__(api_key, transport, cache)
+
+        assert step_counts[0] <= step_counts[1], 'Step counts %s are not increasing' % str(step_counts)
+
+        self.step_counts = step_counts
+        self.max_start_step = max_start_step
+        self.failing_lat = failing_lat
+        self.fetches = []
+
+    def generate_forecast_data(self, spot: Spot, metrics: Set[str]) -> DataFrame:
+
+        if spot.get_lat() == self.failing_lat:
+            raise ConnectionError('Forecast request failed')
+        self.fetches.append(spot.get_name())
+
+        random = np.random.default_rng(int((spot.get_lat() + 90.0) * 1000))
+
+        start = datetime(2019, 1, 1) + timedelta(hours=3 * int(random.integers(0, self.max_start_step + 1)))
+        step_count = int(random.integers(self.step_counts[0], self.step_counts[1] + 1))
+        times = [start + timedelta(hours=3 * i) for i in range(step_count)]
+
+        return DataFrame({'datetime': times,
+                          'temp': random.uniform(250.0, 320.0, step_count).astype(np.float32),
+                          'wind': random.uniform(0.0, 25.0, step_count).astype(np.float32),
+                          'rain': random.uniform(0.0, 3.0, step_count).astype(np.float32),
+                          'temp_min': random.uniform(240.0, 250.0, step_count).astype(np.float32)})
+
+
+def generate_target(fetch_target: WeatherTarget = None) -> WeatherTarget:
+    """Wind, temperature and rain targets over the first day on top of fetch_target"""
+
+    if fetch_target is None:
+        fetch_target = RandomDataWeatherTarget()
+
+    target = IdealWindTarget(fetch_target, 'wind', datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 14), 10.0)
+    target = IdealTempTarget(target, 'temp', datetime(2019, 1, 1, 6), datetime(2019, 1, 2), 295.0)
+    target = NewRainTarget(target, 'rain', datetime(2019, 1, 1), datetime(2019, 1, 2))
+    return target
+
+
+def generate_spots(count: int, lat_start: float = 1.0, lat_step: float = 0.37, long_start: float = 0.0,
+                   long_step: float = 2.0) -> List[Spot]:
+    """Spots named spot_<i> spread along a line of evenly stepped coordinates"""
+    return [Spot('spot_%d' % i, lat_start + i * lat_step, long_start + i * long_step) for i in range(count)]
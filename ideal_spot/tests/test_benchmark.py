@@ -0,0 +1,58 @@
+from json import load
+import tracemalloc
+
+import pytest
+
+from ideal_spot.benchmark import _measure, main, run_benchmark
+
+STAGES = ['parse', 'score', 'cube', 'score_vectorized', 'report']
+
+
+class TestBenchmark:
+
+    def test_run_benchmark(self):
+
+        results = run_benchmark([5, 20], [1, 4], max_spots=10, max_scores=40, label='test')
+
+        assert results['label'] == 'test'
+        assert [(result['spot_count'], result['depth']) for result in results['results']] == \
+            [(5, 1), (5, 4), (20, 1), (20, 4)]
+
+        stages = results['results'][-1]['stages']
+        assert list(stages) == STAGES
+        assert stages['parse']['spots'] == 10
+        assert stages['score_vectorized']['spots'] == 10
+        assert stages['report']['peak_memory_bytes'] > 0
+        assert all(stage['seconds'] >= 0.0 for stage in stages.values())
+
+    def test_main(self, tmp_path):
+
+        output_path = str(tmp_path / 'results.json')
+        main(['--spot-counts', '3', '--depths', '2', '--no-trace-memory', '--output', output_path])
+
+        with open(output_path) as output_file:
+            results = load(output_file)
+
+        stages = results['results'][0]['stages']
+        assert list(stages) == STAGES
+        assert stages['score']['peak_memory_bytes'] is None
+
+    def test_measure(self):
+
+        tracing = []
+        result = _measure(lambda: tracing.append(tracemalloc.is_tracing()), 5, True, 3)
+
+        # A warm-up run and three timed runs without tracing followed by one traced run
+        assert tracing == [False, False, False, False, True]
+        assert result['spots'] == 5
+        assert result['peak_memory_bytes'] > 0
+
+        tracing = []
+        result = _measure(lambda: tracing.append(tracemalloc.is_tracing()), 5, False, 2)
+
+        assert tracing == [False, False, False]
+        assert result['peak_memory_bytes'] is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,134 @@
+from json import dumps
+
+import pytest
+
+from ideal_spot.cache import FORECAST_CYCLE, ForecastCache
+from ideal_spot.feed import ForecastWeatherFeedFactory
+from ideal_spot.transport import WeatherTransport
+
+
+class _DummyClock:
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _FailingSession:
+
+    def get(self, url: str, timeout: float = None):
+        raise AssertionError('Network call was not expected')
+
+
+def _generate_api_data() -> bytes:
+    return dumps({'list': [
+        {'dt': 1546308000 + hour * 10800, 'main': {'temp': 280.0 + hour, 'temp_min': 279.0, 'temp_max': 281.0},
+         'clouds': {'all': 10}, 'wind': {'speed': 4.5}}
+        for hour in range(8)
+    ]}).encode()
+
+
+class TestForecastCache:
+
+    def test_get_set(self):
+
+        cache = ForecastCache()
+
+        assert cache.get(40.0, 104.0) is None
+
+        cache.set(40.0, 104.0, b'forecast')
+
+        assert cache.get(40.0, 104.0) == b'forecast'
+        assert cache.get(40.00001, 104.00002) == b'forecast'
+        assert cache.get(40.001, 104.0) is None
+        assert cache.get_stats() == {'hits': 2, 'misses': 2, 'evictions': 0, 'expirations': 0}
+
+    def test_precision(self):
+
+        cache = ForecastCache(precision=2)
+        cache.set(40.0, 104.0, b'forecast')
+
+        # Spots a few hundred metres apart share an entry at a precision of 2
+        assert cache.get(40.001, 104.002) == b'forecast'
+        assert cache.get(40.1, 104.0) is None
+
+    def test_evictions(self):
+
+        cache = ForecastCache(max_entries=2)
+
+        cache.set(1.0, 1.0, b'a')
+        cache.set(2.0, 2.0, b'b')
+        cache.get(1.0, 1.0)
+        cache.set(3.0, 3.0, b'c')
+
+        assert cache.get(2.0, 2.0) is None
+        assert cache.get(1.0, 1.0) == b'a'
+        assert cache.get(3.0, 3.0) == b'c'
+        assert cache.get_stats()['evictions'] == 1
+
+    def test_ttl(self):
+
+        clock = _DummyClock(1000.0)
+        cache = ForecastCache(ttl=60.0, clock=clock)
+
+        cache.set(1.0, 1.0, b'a')
+        clock.now = 1059.0
+        assert cache.contains(1.0, 1.0)
+        assert cache.get(1.0, 1.0) == b'a'
+
+        clock.now = 1060.0
+        assert not cache.contains(1.0, 1.0)
+        assert cache.get(1.0, 1.0) is None
+        assert cache.get_stats()['expirations'] == 1
+
+    def test_align_to_cycle(self):
+
+        clock = _DummyClock(FORECAST_CYCLE * 10 + FORECAST_CYCLE - 60.0)
+        cache = ForecastCache(clock=clock)
+        unaligned_cache = ForecastCache(align_to_cycle=False, clock=clock)
+
+        cache.set(1.0, 1.0, b'a')
+        unaligned_cache.set(1.0, 1.0, b'a')
+        clock.now += 60.0
+
+        assert cache.get(1.0, 1.0) is None
+        assert unaligned_cache.get(1.0, 1.0) == b'a'
+
+    def test_persistence(self, tmp_path):
+
+        path = str(tmp_path / 'forecast_cache.sqlite')
+
+        cache = ForecastCache(path)
+        cache.set(1.0, 1.0, b'a')
+        cache.close()
+
+        cache = ForecastCache(path)
+
+        assert cache.contains(1.0, 1.0)
+        assert cache.get(1.0, 1.0) == b'a'
+        assert cache.get_stats()['hits'] == 1
+
+
+class TestForecastWeatherFeedCache:
+
+    def test_get_data(self):
+
+        cache = ForecastCache()
+        cache.set(40.0, 104.0, _generate_api_data())
+
+        transport = WeatherTransport()
+        transport.session = _FailingSession()
+
+        feed = ForecastWeatherFeedFactory('not used', 40.0, 104.0, transport, cache).generate_feed({'temp', 'wind'})
+        data = feed.get_data()
+
+        assert len(data.index) == 8
+        assert set(data.columns) == {'datetime', 'temp', 'temp_min', 'temp_max', 'wind'}
+        assert transport.get_stats()['requests'] == 0
+        assert cache.get_stats()['hits'] == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
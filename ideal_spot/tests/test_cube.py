@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import numpy as np
+from pandas import DataFrame
+import pytest
+
+from ideal_spot.cube import ForecastCube
+
+
+def _generate_frames():
+    return {
+        'spot_a': DataFrame({'datetime': [datetime(2019, 1, 1, 3), datetime(2019, 1, 1, 6)],
+                             'temp': [1.0, 2.0], 'wind': [5.0, 6.0]}),
+        'spot_b': DataFrame({'datetime': [datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 9)],
+                             'temp': [3.0, 4.0], 'wind': [7.0, 8.0]}),
+    }
+
+
+class TestForecastCube:
+
+    def test_from_frames(self):
+
+        cube = ForecastCube.from_frames(_generate_frames(), ['temp', 'wind'])
+
+        assert cube.get_names() == ['spot_a', 'spot_b']
+        assert cube.get_metrics() == ['temp', 'wind']
+        assert len(cube.get_times()) == 3
+        assert cube.get_values().dtype == np.float32
+        assert cube.get_values().shape == (2, 3, 2)
+        np.testing.assert_array_equal(cube.get_values()[:, :, 0], [[1.0, 2.0, np.nan], [np.nan, 3.0, 4.0]])
+
+    def test_get_frame(self):
+
+        cube = ForecastCube.from_frames(_generate_frames(), ['temp', 'wind'])
+
+        frame = cube.get_frame('spot_b')
+
+        assert list(frame.columns) == ['datetime', 'temp', 'wind']
+        assert list(frame['datetime']) == [datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 9)]
+        assert list(frame['wind']) == [7.0, 8.0]
+
+    def test_save_load(self, tmp_path):
+
+        cube = ForecastCube.from_frames(_generate_frames(), ['temp', 'wind'])
+        cube.save(str(tmp_path / 'cube'))
+
+        for mmap in [True, False]:
+
+            loaded_cube = ForecastCube.load(str(tmp_path / 'cube'), mmap)
+
+            assert isinstance(loaded_cube.get_values(), np.memmap) == mmap
+            assert loaded_cube.get_names() == cube.get_names()
+            assert loaded_cube.get_metrics() == cube.get_metrics()
+            np.testing.assert_array_equal(loaded_cube.get_times(), cube.get_times())
+            np.testing.assert_array_equal(loaded_cube.get_values(), cube.get_values())
+            assert loaded_cube.get_spot_index('spot_b') == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -1,3 +1,4 @@
+from asyncio import run
 from datetime import datetime
 from typing import Set
 
@@ -6,7 +7,7 @@ from pandas import DataFrame
 
 from ideal_spot.evaluate import EvaluateSpots
 from ideal_spot.feed import ForecastWeatherFeed
-from ideal_spot.spots import Spot
+from ideal_spot.spots import Spot, SpotCollection
 from ideal_spot.targets import IdealTempTarget, WeatherTarget
 
 
@@ -39,6 +40,20 @@ class _DummyDataWeatherTarget(WeatherTarget):
 
         return df
 
+    async def generate_forecast_data_async(self, spot: Spot, metrics: Set[str], session=None) -> DataFrame:
+        return self.generate_forecast_data(spot, metrics)
+
+
+class _CountingWeatherTarget(_DummyDataWeatherTarget):
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key)
+        self.calls = []
+
+    def generate_forecast_data(self, spot: Spot, metrics: Set[str]) -> DataFrame:
+        self.calls.append((spot.get_lat(), spot.get_long(), frozenset(metrics)))
+        return super().generate_forecast_data(spot, metrics)
+
 
 class TestEvaluateSpots:
 
@@ -68,6 +83,31 @@ class TestEvaluateSpots:
             else:
                 raise AssertionError('Did not expect spot')
 
+    def test_generate_spots_collection(self):
+
+        df = DataFrame([
+            {'spot_name': 'spot_a', 'spot_lat': 78.0, 'spot_long': 104.0},
+            {'spot_name': 'spot_b', 'spot_lat': 2.3, 'spot_long': 101.2},
+            {'spot_name': 'spot_a', 'spot_lat': 1.0, 'spot_long': 1.0},
+        ])
+
+        spots = EvaluateSpots.generate_spots(df, 'spot_name', 'spot_lat', 'spot_long', as_collection=True)
+
+        assert isinstance(spots, SpotCollection)
+        assert len(spots) == 2
+
+        target = _DummyDataWeatherTarget('not used')
+        target = IdealTempTarget(target, 'ideal_temp', datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20), 220.0)
+
+        for score_spots in [EvaluateSpots.score_spots, EvaluateSpots.score_spots_vectorized]:
+
+            spots = score_spots(spots, target, {'ideal_temp': 2.0})
+            report = EvaluateSpots.generate_score_report(spots)
+
+            assert list(report['name']) == ['spot_b', 'spot_a']
+            assert [round(score, 4) for score in report['overall_score']] == [1.862, 1.3453]
+            assert [round(score, 4) for score in report['ideal_temp']] == [0.931, 0.6727]
+
     def test_score_spots_ideal_temp(self):
 
         spot_a = Spot('spot_a', 78.0, 104.0)
@@ -91,6 +131,120 @@ class TestEvaluateSpots:
             else:
                 raise AssertionError('Did not expect spot %s' % spot.get_name())
 
+    def test_score_spots_workers(self):
+
+        target = _DummyDataWeatherTarget('not used')
+        target = IdealTempTarget(target, 'ideal_temp', datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20), 220.0)
+        score_weights = {'ideal_temp': 2.0}
+
+        serial_spots = EvaluateSpots.score_spots({Spot('spot_a', 78.0, 104.0), Spot('spot_b', 2.3, 101.2)},
+                                                 target, score_weights)
+        parallel_spots = EvaluateSpots.score_spots({Spot('spot_a', 78.0, 104.0), Spot('spot_b', 2.3, 101.2)},
+                                                   target, score_weights, workers=4)
+
+        serial_scores = {spot.get_name(): spot.get_overall_score() for spot in serial_spots}
+        parallel_scores = {spot.get_name(): spot.get_overall_score() for spot in parallel_spots}
+
+        assert parallel_scores == serial_scores
+        assert round(parallel_scores['spot_a'], 4) == 1.3453
+        assert round(parallel_scores['spot_b'], 4) == 1.862
+
+    def test_iter_score_spots_top_report(self):
+
+        target = _DummyDataWeatherTarget('not used')
+        target = IdealTempTarget(target, 'ideal_temp', datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20), 220.0)
+
+        spots = [Spot('spot_a', 78.0, 104.0), Spot('spot_b', 2.3, 101.2)]
+        report = EvaluateSpots.generate_top_score_report(EvaluateSpots.iter_score_spots(spots, target, workers=2), 1,
+                                                         ['ideal_temp'])
+
+        assert report.get_spot_count() == 2
+        assert list(report.get_report()['name']) == ['spot_b']
+        assert list(report.get_score_report('ideal_temp')['name']) == ['spot_b']
+
+    def test_iter_score_spots_window(self):
+
+        target = _DummyDataWeatherTarget('not used')
+        target = IdealTempTarget(target, 'ideal_temp', datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20), 220.0)
+
+        read_count = [0]
+
+        def generate_spots():
+            for i in range(100):
+                read_count[0] += 1
+                yield Spot('spot_%d' % i, 2.3, 101.2)
+
+        scored_spots = EvaluateSpots.iter_score_spots(generate_spots(), target, workers=2)
+
+        # Spots are only read ahead by the window of in flight spots
+        assert next(scored_spots).get_name() == 'spot_0'
+        assert read_count[0] <= 5
+
+        assert [spot.get_name() for spot in scored_spots] == ['spot_%d' % i for i in range(1, 100)]
+
+    def test_evaluate_weight_profiles(self):
+
+        spot_a = Spot('spot_a', 0.0, 0.0)
+        spot_a.set_scores({'wind': 1.0, 'rain': 0.5})
+        spot_b = Spot('spot_b', 0.0, 0.0)
+        spot_b.set_scores({'wind': 0.25, 'rain': 0.0, 'temp': 1.0})
+
+        score_weight_maps = {'default': None, 'windy': {'wind': 4.0, 'rain': -1.0}, 'dry': {'rain': -10.0}}
+
+        for spots in [{spot_a, spot_b}, SpotCollection.from_spots([spot_a, spot_b])]:
+
+            overall_scores, rankings = EvaluateSpots.evaluate_weight_profiles(spots, score_weight_maps)
+
+            assert list(overall_scores.columns) == ['default', 'windy', 'dry']
+            assert overall_scores.loc['spot_a'].tolist() == [1.5, 3.5, -4.0]
+            assert overall_scores.loc['spot_b'].tolist() == [1.25, 2.0, 1.25]
+            assert rankings.loc['spot_a'].tolist() == [1, 1, 2]
+            assert rankings.loc['spot_b'].tolist() == [2, 2, 1]
+
+            for profile_name, score_weight_map in score_weight_maps.items():
+                for spot in [spot_a, spot_b]:
+                    assert overall_scores.loc[spot.get_name(), profile_name] == \
+                        EvaluateSpots.calculate_overall_score(spot.get_scores(), score_weight_map)
+
+    def test_score_spots_async(self):
+
+        target = _DummyDataWeatherTarget('not used')
+        target = IdealTempTarget(target, 'ideal_temp', datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20), 220.0)
+
+        spots = {Spot('spot_a', 78.0, 104.0), Spot('spot_b', 2.3, 101.2)}
+        spots = run(EvaluateSpots.score_spots_async(spots, target, {'ideal_temp': 2.0}, concurrency=1))
+
+        scores = {spot.get_name(): spot.get_overall_score() for spot in spots}
+
+        assert round(scores['spot_a'], 4) == 1.3453
+        assert round(scores['spot_b'], 4) == 1.862
+
+    def test_score_spots_multi_target(self):
+
+        base_target = _CountingWeatherTarget('not used')
+        warm_target = IdealTempTarget(base_target, 'ideal_temp', datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20),
+                                      220.0)
+        cold_target = IdealTempTarget(base_target, 'ideal_temp', datetime(2019, 1, 1, 6), datetime(2019, 1, 2, 2),
+                                      300.0)
+
+        spots = {Spot('spot_a', 78.0, 104.0), Spot('spot_a_copy', 78.0, 104.0), Spot('spot_b', 2.3, 101.2)}
+        target_spots = EvaluateSpots.score_spots_multi_target(spots, {'warm': warm_target, 'cold': cold_target},
+                                                              {'warm': {'ideal_temp': 2.0}}, workers=2)
+
+        assert sorted(base_target.calls) == [(2.3, 101.2, frozenset({'temp'})), (78.0, 104.0, frozenset({'temp'}))]
+        assert set(target_spots) == {'warm', 'cold'}
+
+        for target_name, target in [('warm', warm_target), ('cold', cold_target)]:
+
+            score_weights = {'ideal_temp': 2.0} if target_name == 'warm' else None
+            expected_spots = EvaluateSpots.score_spots({Spot('spot_a', 78.0, 104.0), Spot('spot_b', 2.3, 101.2)},
+                                                       target, score_weights)
+            expected_scores = {spot.get_name(): spot.get_overall_score() for spot in expected_spots}
+            scores = {spot.get_name(): spot.get_overall_score() for spot in target_spots[target_name]}
+
+            assert scores == {'spot_a': expected_scores['spot_a'], 'spot_a_copy': expected_scores['spot_a'],
+                              'spot_b': expected_scores['spot_b']}
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -1,29 +1,70 @@
+from asyncio import run
+from datetime import datetime
+import os
 
 import pytest
 
-from ideal_spot.feed import ForecastWeatherFeed, ForecastWeatherFeedFactory
+from ideal_spot.cache import FORECAST_CYCLE, ForecastCache
+from ideal_spot.feed import ForecastWeatherFeed, ForecastWeatherFeedFactory, GroupWeatherFeed, LazyClientSession
+from ideal_spot.server import ForecastServer, generate_forecast_payload, generate_group_payload
+from ideal_spot.spots import Spot
+from ideal_spot.targets import GroupWeatherTarget, IdealTempTarget, IdealWindTarget, NewRainTarget, WeatherTarget
+from ideal_spot.transport import RecordReplayTransport, TransportError, WeatherTransport
 
-# OpenWeatherMap free API key
-TEST_API_KEY = '79094518408cb847574557c958eeec91'
+# Feeds are served by a local stand-in for the OpenWeatherMap API
+TEST_API_KEY = 'test'
+
+# City id the stand-in leaves out of group responses
+UNKNOWN_CITY_ID = 999999
+
+
+@pytest.fixture(scope='module')
+def forecast_server():
+    with ForecastServer(missing_city_ids=[UNKNOWN_CITY_ID]) as server:
+        yield server
+
+
+@pytest.fixture
+def transport(forecast_server):
+    return WeatherTransport(max_retries=0, base_url=forecast_server.get_url())
 
 
 class TestForecastWeatherFeed:
 
-    def test_generate_data(self):
+    def test_generate_data(self, transport):
 
-        feed = ForecastWeatherFeed(TEST_API_KEY, 40.0, 104.0)
+        feed = ForecastWeatherFeed(TEST_API_KEY, 40.0, 104.0, transport)
 
         data = feed.get_data()
 
         assert len(data.index) == 40
         assert set(data.columns) == {'datetime'}
 
+    def test_generate_data_async(self, transport):
+
+        pytest.importorskip('aiohttp')
+
+        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0, transport).generate_feed({'temp', 'rain'})
+
+        async def get_data():
+            async with LazyClientSession() as session:
+                # The session is only opened by the first request
+                assert session.get_session() is None
+                data = await feed.get_data_async(session)
+                assert session.get_session() is not None
+                return data
+
+        data = run(get_data())
+
+        assert data.equals(feed.get_data())
+        assert run(feed.get_data_async()).equals(data)
+
 
 class TestTemperatureForecastDecorator:
 
-    def test_generate_data(self):
+    def test_generate_data(self, transport):
 
-        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0).generate_feed({'temp'})
+        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0, transport).generate_feed({'temp'})
 
         data = feed.get_data()
 
@@ -33,9 +74,9 @@ class TestTemperatureForecastDecorator:
 
 class TestRainForecastDecorator:
 
-    def test_generate_data(self):
+    def test_generate_data(self, transport):
 
-        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0).generate_feed({'rain'})
+        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0, transport).generate_feed({'rain'})
 
         data = feed.get_data()
 
@@ -45,9 +86,9 @@ class TestRainForecastDecorator:
 
 class TestSnowForecastDecorator:
 
-    def test_generate_data(self):
+    def test_generate_data(self, transport):
 
-        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0).generate_feed({'snow'})
+        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0, transport).generate_feed({'snow'})
 
         data = feed.get_data()
 
@@ -57,9 +98,9 @@ class TestSnowForecastDecorator:
 
 class TestCloudForecastDecorator:
 
-    def test_generate_data(self):
+    def test_generate_data(self, transport):
 
-        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0).generate_feed({'cloud'})
+        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0, transport).generate_feed({'cloud'})
 
         data = feed.get_data()
 
@@ -69,9 +110,9 @@ class TestCloudForecastDecorator:
 
 class TestWindForecastDecorator:
 
-    def test_generate_data(self):
+    def test_generate_data(self, transport):
 
-        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0).generate_feed({'wind'})
+        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0, transport).generate_feed({'wind'})
 
         data = feed.get_data()
 
@@ -81,9 +122,9 @@ class TestWindForecastDecorator:
 
 class TestForecastWeatherFeedFactory:
 
-    def test_generate_data_all_metrics(self):
+    def test_generate_data_all_metrics(self, transport):
 
-        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0).generate_feed({'temp', 'rain', 'snow',
+        feed = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0, transport).generate_feed({'temp', 'rain', 'snow',
                                                                                     'cloud', 'wind'})
 
         data = feed.get_data()
@@ -93,5 +134,212 @@ class TestForecastWeatherFeedFactory:
                                      'rain', 'snow', 'cloud', 'wind'}
 
 
+class TestGroupWeatherFeed:
+
+    def test_get_data(self, forecast_server, transport):
+
+        feed = GroupWeatherFeed(TEST_API_KEY, [1, 2, UNKNOWN_CITY_ID], transport)
+
+        data = feed.get_data()
+
+        assert set(data) == {1, 2}
+        assert feed.get_city_data(UNKNOWN_CITY_ID) is None
+        assert list(data[2].columns) == ['datetime', 'temp', 'temp_min', 'temp_max', 'cloud', 'wind']
+        assert data[2]['temp'].tolist() == [generate_group_payload([2], 0)['list'][0]['main']['temp']]
+        assert data[2]['datetime'].tolist() == [datetime.fromtimestamp(forecast_server.get_start())]
+
+    def test_group_size(self):
+
+        with pytest.raises(AssertionError):
+            GroupWeatherFeed(TEST_API_KEY, list(range(GroupWeatherFeed.MAX_GROUP_SIZE + 1)))
+
+
+class TestGroupWeatherTarget:
+
+    def test_generate_forecast_data(self, forecast_server, transport):
+
+        spot_city_ids = {'spot_%d' % i: 100 + i for i in range(45)}
+        spot_city_ids['unknown'] = UNKNOWN_CITY_ID
+
+        target = GroupWeatherTarget(TEST_API_KEY, spot_city_ids, transport)
+        start = datetime.fromtimestamp(forecast_server.get_start())
+        IdealWindTarget(IdealTempTarget(target, 'temp', start, start, 280.0), 'wind', start, start, 5.0)
+
+        assert [len(city_group) for city_group in target.get_city_groups()] == [20, 20, 6]
+
+        for i in range(45):
+            data = target.generate_forecast_data(Spot('spot_%d' % i, 1.0, 2.0), {'temp', 'wind'})
+            assert data['temp'].tolist() == [270.0 + (100 + i) % 40]
+
+        assert transport.get_stats()['requests'] == 3
+
+        # Rain is not provided by the group endpoint and is joined from the forecast endpoint
+        data = target.generate_forecast_data(Spot('spot_3', 1.0, 2.0), {'temp', 'rain'})
+
+        assert transport.get_stats()['requests'] == 4
+        assert len(data) == 41
+        assert data['temp'].count() == 1
+        assert data['rain'].count() == 40
+        assert data.index.is_monotonic_increasing
+
+        # A city missing from the group response falls back to the forecast endpoint
+        data = target.generate_forecast_data(Spot('unknown', 1.0, 2.0), {'temp'})
+
+        assert transport.get_stats()['requests'] == 5
+        assert data['temp'].count() == 40
+
+        data = target.generate_forecast_data(Spot('no_city', 1.0, 2.0), {'wind'})
+
+        assert transport.get_stats()['requests'] == 6
+        assert data['wind'].count() == 40
+
+        # Groups are fetched again once the group cache is reset
+        target.get_group_cache().clear()
+        target.generate_forecast_data(Spot('spot_0', 1.0, 2.0), {'temp'})
+
+        assert transport.get_stats()['requests'] == 7
+
+    def test_group_cache_expiry(self, transport):
+
+        now = [0.0]
+        group_cache = ForecastCache(align_to_cycle=True, clock=lambda: now[0])
+        target = GroupWeatherTarget(TEST_API_KEY, {'spot_a': 1}, transport, group_cache=group_cache)
+        feed = GroupWeatherFeed(TEST_API_KEY, [1], transport, target.get_group_cache())
+
+        feed.get_city_data(1)
+        now[0] = FORECAST_CYCLE - 1.0
+        feed.get_city_data(1)
+
+        assert transport.get_stats()['requests'] == 1
+
+        now[0] = FORECAST_CYCLE
+        feed.get_city_data(1)
+
+        assert transport.get_stats()['requests'] == 2
+
+    def test_group_cache_failure(self, forecast_server, transport):
+
+        group_cache = ForecastCache(align_to_cycle=True)
+
+        with ForecastServer(error_rate=1.0) as failing_server:
+            failing_transport = WeatherTransport(max_retries=0, base_url=failing_server.get_url())
+            with pytest.raises(TransportError):
+                GroupWeatherFeed(TEST_API_KEY, [1, 2], failing_transport, group_cache).get_city_data(1)
+
+        # The failed call is not cached so the group recovers as soon as the API does
+        data = GroupWeatherFeed(TEST_API_KEY, [1, 2], transport, group_cache).get_city_data(1)
+
+        assert transport.get_stats()['requests'] == 1
+        assert data['temp'].tolist() == [generate_group_payload([1], 0)['list'][0]['main']['temp']]
+
+    def test_future_window(self, forecast_server, transport):
+
+        # Windows after the observation are scored on the forecast as if no group data existed
+        start = datetime.fromtimestamp(forecast_server.get_start() + 86400)
+        end = datetime.fromtimestamp(forecast_server.get_start() + 2 * 86400)
+
+        group_target = IdealTempTarget(GroupWeatherTarget(TEST_API_KEY, {'spot_a': 1}, transport),
+                                       'temp', start, end, 280.0)
+        forecast_target = IdealTempTarget(WeatherTarget(TEST_API_KEY, transport), 'temp', start, end, 280.0)
+
+        group_spot = Spot('spot_a', 1.0, 2.0)
+        group_target.evaluate_spot(group_spot)
+        forecast_spot = Spot('spot_a', 1.0, 2.0)
+        forecast_target.evaluate_spot(forecast_spot)
+
+        assert group_spot.get_scores()['temp'] == forecast_spot.get_scores()['temp']
+        assert group_spot.get_scores()['temp'] > 0.0
+
+    def test_score_spots(self, forecast_server, transport):
+
+        target = GroupWeatherTarget(TEST_API_KEY, {'spot_a': 1, 'spot_b': 2}, transport)
+        start = datetime.fromtimestamp(forecast_server.get_start())
+        target = IdealTempTarget(target, 'temp', start, start, 280.0)
+        target = NewRainTarget(target, 'rain', start, datetime.fromtimestamp(forecast_server.get_start() + 86400))
+
+        spot = Spot('spot_b', 1.0, 2.0)
+        target.evaluate_spot(spot)
+
+        # Group temperature of city 2 is 272.0 at the start, rain is summed over the first day of the forecast
+        rain = sum(row.get('rain', dict()).get('3h', 0.0)
+                   for row in generate_forecast_payload(1.0, 2.0, forecast_server.get_start())['list']
+                   if row['dt'] <= forecast_server.get_start() + 86400)
+
+        assert rain > 0.0
+        assert spot.get_scores() == pytest.approx({'temp': 1.0 - 8.0 / 200.0, 'rain': min(1.0, rain / 10.0)})
+
+
+class TestForecastServer:
+
+    def test_errors(self):
+
+        with ForecastServer(error_rate=1.0) as server:
+            transport = WeatherTransport(max_retries=2, backoff_base=0.001, base_url=server.get_url())
+            with pytest.raises(TransportError):
+                transport.get(server.get_url() + '/data/2.5/forecast?lat=1.0&lon=2.0')
+
+            assert server.get_stats() == {'requests': 3, 'errors': 3, 'throttled': 0}
+            assert transport.get_stats()['retries'] == 2
+
+    def test_rate_limit(self):
+
+        with ForecastServer(calls_per_minute=6) as server:
+            transport = WeatherTransport(max_retries=0, base_url=server.get_url())
+            feed = ForecastWeatherFeed(TEST_API_KEY, 1.0, 2.0, transport)
+
+            assert len(feed.get_data()) == 40
+            with pytest.raises(TransportError) as error:
+                feed.get_data()
+
+            assert error.value.get_status() == 429
+
+            assert server.get_stats() == {'requests': 2, 'errors': 0, 'throttled': 1}
+
+
+class TestRecordReplayTransport:
+
+    def test_record_replay(self, tmp_path):
+
+        with ForecastServer() as server:
+            transport = RecordReplayTransport(str(tmp_path), 'record', base_url=server.get_url())
+            recorded_data = ForecastWeatherFeedFactory('recorded key', 40.0, 104.0, transport).generate_feed(
+                {'temp'}).get_data()
+
+        # The server is gone so every response is replayed from the recordings
+        transport = RecordReplayTransport(str(tmp_path), 'replay', base_url='http://127.0.0.1:9')
+        data = ForecastWeatherFeedFactory(TEST_API_KEY, 40.0, 104.0, transport).generate_feed({'temp'}).get_data()
+
+        assert data.equals(recorded_data)
+        assert transport.get_stats()['requests'] == 0
+
+        with pytest.raises(AssertionError):
+            ForecastWeatherFeed(TEST_API_KEY, 41.0, 104.0, transport).get_data()
+
+    def test_auto(self, forecast_server, tmp_path):
+
+        transport = RecordReplayTransport(str(tmp_path), 'auto', base_url=forecast_server.get_url())
+
+        ForecastWeatherFeed(TEST_API_KEY, 40.0, 104.0, transport).get_data()
+        ForecastWeatherFeed(TEST_API_KEY, 40.0, 104.0, transport).get_data()
+
+        assert transport.get_stats()['requests'] == 1
+
+    def test_auto_errors(self, tmp_path):
+
+        # Failed responses are raised but never recorded
+        with ForecastServer(error_rate=1.0) as server:
+            transport = RecordReplayTransport(str(tmp_path), 'auto', max_retries=0, base_url=server.get_url())
+
+            with pytest.raises(TransportError):
+                ForecastWeatherFeed(TEST_API_KEY, 40.0, 104.0, transport).get_data()
+
+            assert os.listdir(str(tmp_path)) == []
+
+            with pytest.raises(TransportError):
+                ForecastWeatherFeed(TEST_API_KEY, 40.0, 104.0, transport).get_data()
+
+            assert server.get_stats()['requests'] == 2
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+from typing import Set
+
+import numpy as np
+from pandas import DataFrame, Series
+import pytest
+
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.incremental import IncrementalEvaluator
+from ideal_spot.spots import Spot
+from ideal_spot.targets import IdealTempTarget, IdealWindTarget, NewRainTarget, WeatherTarget, \
+    WeatherTargetDecorator
+
+DAY_ONE = (datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 18))
+DAY_TWO = (datetime(2019, 1, 2, 6), datetime(2019, 1, 2, 18))
+
+
+class _CountingDecorator(WeatherTargetDecorator):
+
+    def __init__(self, target: WeatherTarget, name: str):
+        super().__init__(target, name)
+        self.calls = 0
+
+    def get_forecast_metrics(self) -> Set[str]:
+        return super().get_forecast_metrics()
+
+    def _calculate_score(self, spot: Spot, forecast_data: DataFrame = None) -> float:
+        self.calls += 1
+        return float(len(forecast_data.index))
+
+
+def _generate_data(wind: float, day_two_wind: float = None) -> DataFrame:
+
+    times = [datetime(2019, 1, 1) + timedelta(hours=3 * i) for i in range(16)]
+    winds = [wind if time < datetime(2019, 1, 2) or day_two_wind is None else day_two_wind for time in times]
+
+    return DataFrame({'datetime': times, 'wind': winds, 'temp': [290.0] * 16, 'rain': [0.5] * 16})
+
+
+def _generate_target() -> WeatherTarget:
+    target = WeatherTarget('not used')
+    target = IdealWindTarget(target, 'wind_day_one', *DAY_ONE, 10.0)
+    target = IdealWindTarget(target, 'wind_day_two', *DAY_TWO, 10.0)
+    target = IdealTempTarget(target, 'temp_day_one', *DAY_ONE, 295.0)
+    target = NewRainTarget(target, 'rain_day_two', *DAY_TWO)
+    target = _CountingDecorator(target, 'custom')
+    return target
+
+
+class TestIncrementalEvaluator:
+
+    def test_update(self):
+
+        target = _generate_target()
+        score_weights = {'wind_day_one': 2.0, 'wind_day_two': 2.0, 'custom': 0.0}
+        evaluator = IncrementalEvaluator(target, score_weights)
+
+        spots = [Spot('spot_a', 0.0, 0.0), Spot('spot_b', 1.0, 1.0), Spot('spot_c', 2.0, 2.0)]
+        result = evaluator.update(spots, {'spot_a': _generate_data(8.0), 'spot_b': _generate_data(9.5),
+                                          'spot_c': _generate_data(11.5)})
+
+        assert result.get_recalculated_score_count() == 15
+        assert result.get_rescored_spots() == {'spot_a', 'spot_b', 'spot_c'}
+        assert result.get_rank_changes() == {'spot_a': (None, 3), 'spot_b': (None, 1), 'spot_c': (None, 2)}
+        assert target.calls == 3
+
+        fresh_data = {'spot_a': _generate_data(8.0, 10.0), 'spot_b': _generate_data(9.5),
+                      'spot_c': _generate_data(11.5)}
+        result = evaluator.update(spots, fresh_data)
+
+        assert result.get_recalculated_score_count() == 2
+        assert result.get_rescored_spots() == {'spot_a'}
+        assert result.get_rank_changes() == {'spot_a': (3, 2), 'spot_c': (2, 3)}
+        assert list(result.get_report()['name']) == ['spot_b', 'spot_a', 'spot_c']
+        assert target.calls == 4
+
+        expected_spot = Spot('spot_a', 0.0, 0.0)
+        expected_spot.set_scores(target.calculate_scores(expected_spot, fresh_data['spot_a']))
+
+        assert spots[0].get_scores() == pytest.approx(expected_spot.get_scores())
+        assert spots[0].get_overall_score() == \
+            pytest.approx(EvaluateSpots.calculate_overall_score(expected_spot.get_scores(), score_weights))
+        assert evaluator.get_ranks() == {'spot_a': 2, 'spot_b': 1, 'spot_c': 3}
+
+    def test_update_unchanged(self):
+
+        evaluator = IncrementalEvaluator(_generate_target())
+
+        spots = [Spot('spot_a', 0.0, 0.0)]
+        evaluator.update(spots, {'spot_a': _generate_data(8.0)})
+        result = evaluator.update(spots, {'spot_a': _generate_data(8.0)})
+
+        assert result.get_recalculated_score_count() == 0
+        assert result.get_rescored_spots() == set()
+        assert result.get_rank_changes() == {}
+
+    def test_update_ranks(self):
+
+        target = IdealWindTarget(WeatherTarget('not used'), 'wind_day_one', *DAY_ONE, 10.0)
+        evaluator = IncrementalEvaluator(target)
+        random = np.random.default_rng(3)
+
+        spots = [Spot('spot_%d' % i, 0.0, 0.0) for i in range(40)]
+        winds = {spot.get_name(): float(random.choice([4.0, 8.0, 10.0, 13.0])) for spot in spots}
+
+        for i in range(6):
+
+            # Some spots are new in each update and others get a new wind forecast
+            update_spots = spots[:10 + 6 * i]
+            for spot in random.choice(update_spots, 5, replace=False):
+                winds[spot.get_name()] = float(random.choice([4.0, 8.0, 10.0, 13.0]))
+
+            previous_ranks = dict(evaluator.get_ranks())
+            result = evaluator.update(update_spots, {spot.get_name(): _generate_data(winds[spot.get_name()])
+                                                     for spot in update_spots}, generate_report=False)
+
+            overall_scores = Series({spot.get_name(): spot.get_overall_score() for spot in update_spots})
+            expected_ranks = overall_scores.rank(method='min', ascending=False).astype(int).to_dict()
+
+            assert result.get_report() is None
+            assert evaluator.get_ranks() == expected_ranks
+            assert result.get_rank_changes() == {name: (previous_ranks.get(name), rank)
+                                                 for name, rank in expected_ranks.items()
+                                                 if previous_ranks.get(name) != rank}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
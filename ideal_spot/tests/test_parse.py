@@ -0,0 +1,99 @@
+from datetime import datetime
+from json import dumps, loads
+import time
+
+import numpy as np
+from pandas import DatetimeIndex
+import pytest
+
+from ideal_spot.feed import ForecastWeatherFeedFactory
+from ideal_spot.parse import parse_forecast, to_local_datetime64
+
+
+def _generate_api_data() -> bytes:
+
+    hourly_data = []
+    for hour in range(40):
+        hour_data = {'dt': 1546308000 + hour * 10800,
+                     'main': {'temp': 280.25 + hour, 'temp_min': 279.5, 'temp_max': 281.75},
+                     'clouds': {'all': hour % 100}, 'wind': {'speed': 0.5 * hour}}
+        if hour % 3 == 0:
+            hour_data['rain'] = {'3h': 0.125 * hour}
+        if hour % 4 == 0:
+            hour_data['snow'] = {}
+        hourly_data.append(hour_data)
+
+    return dumps({'cod': '200', 'list': hourly_data}).encode()
+
+
+class TestParseForecast:
+
+    def test_parse_forecast(self):
+
+        api_data = _generate_api_data()
+        fields = {'temp': ('main', 'temp', None), 'rain': ('rain', '3h', 0.0), 'snow': ('snow', '3h', 0.0)}
+
+        for json_loads in [None, loads]:
+
+            columns = parse_forecast(api_data, fields, json_loads)
+
+            assert list(columns) == ['datetime', 'temp', 'rain', 'snow']
+            assert columns['datetime'].dtype == np.dtype('datetime64[s]')
+            assert columns['temp'].dtype == np.float32
+
+            hourly_data = loads(api_data)['list']
+            for i, hour_data in enumerate(hourly_data):
+                assert columns['datetime'][i].astype(datetime) == datetime.fromtimestamp(hour_data['dt'])
+                assert columns['temp'][i] == np.float32(hour_data['main']['temp'])
+                assert columns['rain'][i] == np.float32(hour_data.get('rain', {}).get('3h', 0.0))
+                assert columns['snow'][i] == 0.0
+
+    def test_parse_forecast_required(self):
+
+        with pytest.raises(KeyError):
+            parse_forecast(_generate_api_data(), {'rain': ('rain', '3h', None)})
+
+    def test_to_local_datetime64(self):
+
+        timestamps = np.array([0, 1552212000, 1572744600, 1585000000], dtype=np.int64)
+
+        local = to_local_datetime64(timestamps)
+
+        assert [value.astype(datetime) for value in local] == [datetime.fromtimestamp(timestamp)
+                                                               for timestamp in timestamps]
+
+    def test_to_local_datetime64_two_transitions(self, monkeypatch):
+
+        monkeypatch.setenv('TZ', 'America/New_York')
+        time.tzset()
+
+        try:
+            # Both ends fall in standard time with daylight saving time in between
+            timestamps = 1700000000 + 86400 * np.arange(400, dtype=np.int64)
+
+            local = to_local_datetime64(timestamps)
+
+            assert [value.astype(datetime) for value in local] == [datetime.fromtimestamp(int(timestamp))
+                                                                   for timestamp in timestamps]
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+
+class TestForecastWeatherFeedParse:
+
+    def test_generate_data_all_metrics(self):
+
+        feed = ForecastWeatherFeedFactory('not used', 40.0, 104.0).generate_feed({'temp', 'rain', 'snow',
+                                                                                 'cloud', 'wind'})
+        data = feed._generate_data(_generate_api_data())
+
+        assert len(data.index) == 40
+        assert set(data.columns) == {'datetime', 'temp', 'temp_min', 'temp_max', 'rain', 'snow', 'cloud', 'wind'}
+        assert isinstance(data.index, DatetimeIndex)
+        assert data.index.is_monotonic_increasing
+        assert round(float(data['rain'].sum()), 4) == round(sum(0.125 * hour for hour in range(0, 40, 3)), 4)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+from typing import Set
+
+from pandas import DataFrame, read_csv, read_parquet
+import pytest
+
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.pipeline import CsvScoreSink, read_spot_chunks, ScoreSink, SpotPipeline
+from ideal_spot.report import TopScoreReport
+from ideal_spot.spots import Spot
+from ideal_spot.targets import IdealTempTarget, NewRainTarget, WeatherTarget
+
+
+class _LatitudeWeatherTarget(WeatherTarget):
+
+    def generate_forecast_data(self, spot: Spot, metrics: Set[str]) -> DataFrame:
+        times = [datetime(2019, 1, 1) + timedelta(hours=3 * i) for i in range(16)]
+        return DataFrame({'datetime': times,
+                          'temp': [250.0 + abs(spot.get_lat()) + i for i in range(16)],
+                          'rain': [abs(spot.get_long()) % 3 * 0.1 for _ in range(16)]})
+
+
+class _MemorySink(ScoreSink):
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, df: DataFrame):
+        self.chunks.append(df)
+
+    def close(self):
+        self.closed = True
+
+
+def _generate_target() -> WeatherTarget:
+    target = _LatitudeWeatherTarget('not used')
+    target = IdealTempTarget(target, 'temp', datetime(2019, 1, 1, 3), datetime(2019, 1, 1, 21), 280.0)
+    target = NewRainTarget(target, 'rain', datetime(2019, 1, 1), datetime(2019, 1, 2))
+    return target
+
+
+def _write_spots(path: str, count: int):
+    DataFrame({'spot_name': ['spot_%d' % i for i in range(count)],
+               'spot_lat': [float(i) for i in range(count)],
+               'spot_long': [float(-i) for i in range(count)],
+               'other': ['not used'] * count}).to_csv(path, index=False)
+
+
+class TestReadSpotChunks:
+
+    def test_read_csv(self, tmp_path):
+
+        path = str(tmp_path / 'spots.csv')
+        _write_spots(path, 25)
+
+        chunks = list(read_spot_chunks(path, 'spot_name', 'spot_lat', 'spot_long', 10))
+
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+        assert list(chunks[2].get_names()) == ['spot_%d' % i for i in range(20, 25)]
+
+    def test_read_parquet(self, tmp_path):
+
+        pytest.importorskip('pyarrow')
+
+        path = str(tmp_path / 'spots.parquet')
+        DataFrame({'n': ['a', 'b', 'c'], 'lat': [1.0, 2.0, 3.0], 'long': [4.0, 5.0, 6.0]}).to_parquet(path)
+
+        chunks = list(read_spot_chunks(path, 'n', 'lat', 'long', 2))
+
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+
+
+class TestSpotPipeline:
+
+    def test_run(self):
+
+        target = _generate_target()
+        score_weights = {'rain': -1.0}
+
+        spots = EvaluateSpots.score_spots({Spot('spot_%d' % i, float(i), float(-i)) for i in range(30)}, target,
+                                          score_weights)
+        expected_scores = {spot.get_name(): spot.get_overall_score() for spot in spots}
+
+        for vectorized in [False, True]:
+
+            chunks = [EvaluateSpots.generate_spots(DataFrame({'n': ['spot_%d' % i for i in range(start, start + 10)],
+                                                              'lat': [float(i) for i in range(start, start + 10)],
+                                                              'long': [float(-i) for i in range(start, start + 10)]}),
+                                                   'n', 'lat', 'long', as_collection=True)
+                      for start in range(0, 30, 10)]
+
+            sink = _MemorySink()
+            report = TopScoreReport(3)
+            spot_count = SpotPipeline(target, score_weights, vectorized=vectorized).run(iter(chunks), sink, report)
+
+            assert spot_count == 30
+            assert sink.closed
+            assert len(sink.chunks) == 3
+
+            for chunk in sink.chunks:
+                for name, overall_score in zip(chunk['name'], chunk['overall_score']):
+                    assert overall_score == pytest.approx(expected_scores[name], abs=1e-6)
+
+            expected_top = sorted(expected_scores, key=lambda name: expected_scores[name], reverse=True)[:3]
+            assert list(report.get_report()['name']) == expected_top
+
+    def test_run_file(self, tmp_path):
+
+        source_path = str(tmp_path / 'spots.csv')
+        output_path = str(tmp_path / 'scores.csv')
+        _write_spots(source_path, 25)
+
+        spot_count = SpotPipeline(_generate_target(), workers=2).run_file(source_path, 'spot_name', 'spot_lat',
+                                                                          'spot_long', output_path, chunk_size=7)
+        scores = read_csv(output_path)
+
+        assert spot_count == 25
+        assert len(scores.index) == 25
+        assert list(scores.columns) == ['name', 'lat', 'long', 'overall_score', 'temp', 'rain']
+
+    def test_run_file_parquet(self, tmp_path):
+
+        pytest.importorskip('pyarrow')
+
+        source_path = str(tmp_path / 'spots.csv')
+        output_path = str(tmp_path / 'scores.parquet')
+        _write_spots(source_path, 25)
+
+        SpotPipeline(_generate_target()).run_file(source_path, 'spot_name', 'spot_lat', 'spot_long', output_path,
+                                                  chunk_size=10)
+
+        assert len(read_parquet(output_path).index) == 25
+
+    def test_csv_sink(self, tmp_path):
+
+        path = str(tmp_path / 'scores.csv')
+
+        sink = CsvScoreSink(path)
+        sink.write(DataFrame({'name': ['a'], 'overall_score': [1.0]}))
+        sink.write(DataFrame({'name': ['b'], 'overall_score': [2.0]}))
+
+        assert list(read_csv(path)['name']) == ['a', 'b']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
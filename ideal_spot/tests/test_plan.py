@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+from typing import Set
+
+import numpy as np
+from pandas import DataFrame
+import pytest
+
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.plan import ScoringPlan
+from ideal_spot.spots import Spot
+from ideal_spot.targets import IdealTempTarget, IdealWindTarget, NewRainTarget, RangeTargetDecorator, WeatherTarget
+from ideal_spot.tests.helpers import RandomDataWeatherTarget
+
+
+class _CustomScoreDecorator(RangeTargetDecorator):
+
+    def get_forecast_metrics(self) -> Set[str]:
+        return super().get_forecast_metrics()
+
+    def _calculate_score(self, spot: Spot, forecast_data: DataFrame = None) -> float:
+        return 1.0
+
+
+def _generate_target(shift: timedelta = timedelta()) -> WeatherTarget:
+
+    target = RandomDataWeatherTarget(step_counts=(10, 39), max_start_step=2)
+    target = IdealWindTarget(target, 'wind_day_one', datetime(2019, 1, 1, 6) + shift,
+                             datetime(2019, 1, 1, 14) + shift, 10.0)
+    target = IdealWindTarget(target, 'wind_day_two', datetime(2019, 1, 2, 6) + shift,
+                             datetime(2019, 1, 2, 14) + shift, 10.0)
+    target = IdealTempTarget(target, 'temp_day_one', datetime(2019, 1, 1, 6) + shift,
+                             datetime(2019, 1, 1, 14) + shift, 295.0)
+    target = IdealTempTarget(target, 'temp_late', datetime(2019, 1, 9) + shift, datetime(2019, 1, 10) + shift, 500.0)
+    target = NewRainTarget(target, 'rain_day_one', datetime(2019, 1, 1, 6) + shift, datetime(2019, 1, 1, 14) + shift)
+    target = NewRainTarget(target, 'rain_all', datetime(2019, 1, 1) + shift, datetime(2019, 1, 7) + shift)
+    return target
+
+
+def _generate_short_target(shift: timedelta = timedelta()) -> WeatherTarget:
+
+    target = RandomDataWeatherTarget(step_counts=(10, 39), max_start_step=2)
+    target = IdealWindTarget(target, 'wind_day_one', datetime(2019, 1, 1, 6) + shift,
+                             datetime(2019, 1, 1, 14) + shift, 10.0)
+    target = IdealTempTarget(target, 'temp_day_two', datetime(2019, 1, 2) + shift, datetime(2019, 1, 2, 12) + shift,
+                             295.0)
+    target = NewRainTarget(target, 'rain_all', datetime(2019, 1, 1) + shift, datetime(2019, 1, 3) + shift)
+    return target
+
+
+class TestScoringPlan:
+
+    def test_score_spots_vectorized(self):
+
+        target = _generate_target()
+        score_weights = {'wind_day_one': 2.0, 'wind_day_two': 2.0, 'rain_day_one': -0.5, 'rain_all': -0.5}
+
+        spots = {Spot('spot_%d' % i, 1.0 + i, 2.0 * i) for i in range(25)}
+        vectorized_spots = EvaluateSpots.score_spots_vectorized(spots, target, score_weights, workers=4)
+
+        expected_spots = EvaluateSpots.score_spots({Spot('spot_%d' % i, 1.0 + i, 2.0 * i) for i in range(25)},
+                                                   target, score_weights)
+        expected_spots = {spot.get_name(): spot for spot in expected_spots}
+
+        for spot in vectorized_spots:
+
+            expected_spot = expected_spots[spot.get_name()]
+
+            assert list(spot.get_scores()) == list(expected_spot.get_scores())
+            for score_name, score in spot.get_scores().items():
+                assert score == pytest.approx(expected_spot.get_scores()[score_name], abs=1e-6)
+            assert spot.get_overall_score() == pytest.approx(expected_spot.get_overall_score(), abs=1e-6)
+
+    def test_compile(self):
+
+        plan = ScoringPlan(_generate_target())
+
+        assert plan.get_metrics() == ['rain', 'temp', 'wind']
+        assert plan.get_score_names() == ['wind_day_one', 'wind_day_two', 'temp_day_one', 'temp_late',
+                                          'rain_day_one', 'rain_all']
+
+        target = _CustomScoreDecorator(_generate_target(), 'custom', datetime(2019, 1, 1), datetime(2019, 1, 2),
+                                       'temp', 1.0, 0.0, 'sum')
+        with pytest.raises(AssertionError):
+            ScoringPlan(target)
+
+    def test_score_cube(self):
+
+        target = _generate_target()
+        spots = {Spot('spot_%d' % i, 1.0 + i, 2.0 * i) for i in range(5)}
+
+        cube = EvaluateSpots.generate_forecast_cube(spots, target)
+        scores = ScoringPlan(target).score_cube(cube)
+
+        assert scores.shape == (5, 6)
+
+        cube_spots = EvaluateSpots.score_spots_vectorized({Spot('spot_0', 0.0, 0.0)}, target, cube=cube)
+        expected_spots = EvaluateSpots.score_spots({Spot('spot_0', 1.0, 0.0)}, target)
+
+        assert next(iter(cube_spots)).get_overall_score() == \
+            pytest.approx(next(iter(expected_spots)).get_overall_score(), abs=1e-6)
+
+    def test_score_window_starts(self):
+
+        target = _generate_target()
+        plan = ScoringPlan(target)
+        spots = {Spot('spot_%d' % i, 1.0 + i, 2.0 * i) for i in range(5)}
+        cube = EvaluateSpots.generate_forecast_cube(spots, target)
+
+        shifts = [timedelta(hours=hours) for hours in (-6, 0, 3, 9, 30)]
+        starts = np.array([plan.get_anchor() + shift for shift in shifts], dtype='datetime64[us]')
+        scores = plan.score_window_starts(cube.get_times(), cube.get_values(), cube.get_metrics(), starts)
+
+        assert scores.shape == (5, len(shifts), 6)
+        np.testing.assert_allclose(scores[:, 1], plan.score_cube(cube), atol=1e-9)
+
+        for k, shift in enumerate(shifts):
+            expected_scores = ScoringPlan(_generate_target(shift)).score_cube(cube)
+            np.testing.assert_allclose(scores[:, k], expected_scores, atol=1e-9)
+
+    def test_find_best_windows(self):
+
+        target = _generate_short_target()
+        score_weights = {'wind_day_one': 2.0, 'rain_all': -0.5}
+        spots = {Spot('spot_%d' % i, 1.0 + i, 2.0 * i) for i in range(10)}
+        cube = EvaluateSpots.generate_forecast_cube(spots, target)
+
+        best_windows = EvaluateSpots.find_best_windows(spots, target, score_weights, top_n=5, cube=cube)
+
+        assert len(best_windows) == 5
+        assert list(best_windows.columns[:6]) == ['name', 'lat', 'long', 'start', 'end', 'overall_score']
+        assert best_windows['overall_score'].is_monotonic_decreasing
+        assert (best_windows['end'] - best_windows['start'] == timedelta(days=2)).all()
+
+        # Every start time the forecast covers is considered, so no explicit shift can beat the best window
+        best_score = best_windows['overall_score'].iloc[0]
+        for hours in range(-24, 72, 3):
+            shifted_target = _generate_short_target(timedelta(hours=hours))
+            if datetime(2019, 1, 3) + timedelta(hours=hours) > cube.get_times()[-1].astype(datetime):
+                continue
+            shifted_spots = EvaluateSpots.score_spots_vectorized(spots, shifted_target, score_weights, cube=cube)
+            assert max(spot.get_overall_score() for spot in shifted_spots) <= best_score + 1e-9
+
+        best = best_windows.iloc[0]
+        shifted_target = _generate_short_target(best['start'] - datetime(2019, 1, 1))
+        shifted_spots = EvaluateSpots.score_spots_vectorized({Spot(best['name'], 0.0, 0.0)}, shifted_target,
+                                                             score_weights, cube=cube)
+        assert next(iter(shifted_spots)).get_overall_score() == pytest.approx(best['overall_score'], abs=1e-9)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,119 @@
+import pickle
+from typing import Set
+
+from pandas import DataFrame
+import pytest
+
+from ideal_spot.cache import ForecastCache
+from ideal_spot.cube import ForecastCube
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.plan import ScoringPlan
+from ideal_spot.processes import _strip_caches, ProcessPoolEvaluator
+from ideal_spot.spots import Spot, SpotCollection
+from ideal_spot.targets import WeatherTarget, WeatherTargetDecorator
+from ideal_spot.tests.helpers import generate_spots, generate_target, RandomDataWeatherTarget
+from ideal_spot.transport import WeatherTransport
+
+
+class _MinTempDecorator(WeatherTargetDecorator):
+
+    def get_forecast_metrics(self) -> Set[str]:
+        return self.target.get_forecast_metrics()
+
+    def _calculate_score(self, spot: Spot, forecast_data: DataFrame = None) -> float:
+        return float(forecast_data['temp_min'].min()) / 250.0 + len(forecast_data.index)
+
+
+def _generate_target(cache: ForecastCache = None) -> WeatherTarget:
+    return generate_target(RandomDataWeatherTarget(transport=WeatherTransport(calls_per_minute=60), cache=cache))
+
+
+def _generate_spots() -> Set[Spot]:
+    return set(generate_spots(30))
+
+
+class TestProcessPoolEvaluator:
+
+    def test_score_spots(self):
+
+        score_weights = {'wind': 2.0, 'rain': -0.5}
+        target = _generate_target(ForecastCache())
+
+        spots = ProcessPoolEvaluator(target, score_weights, processes=2, chunk_size=7).score_spots(_generate_spots())
+
+        expected_spots = EvaluateSpots.score_spots(_generate_spots(), target, score_weights)
+        expected_spots = {spot.get_name(): spot for spot in expected_spots}
+
+        assert len(spots) == 30
+        for spot in spots:
+            expected_spot = expected_spots[spot.get_name()]
+            assert list(spot.get_scores()) == list(expected_spot.get_scores())
+            assert spot.get_scores() == pytest.approx(expected_spot.get_scores(), abs=1e-6)
+            assert spot.get_overall_score() == pytest.approx(expected_spot.get_overall_score(), abs=1e-6)
+
+    def test_score_collection(self):
+
+        target = _generate_target()
+        collection = SpotCollection.from_spots(_generate_spots())
+        cube = EvaluateSpots.generate_forecast_cube(collection, target)
+
+        ProcessPoolEvaluator(target, processes=2).score_spots(collection, cube=cube)
+
+        expected_spots = EvaluateSpots.score_spots_vectorized(SpotCollection.from_spots(_generate_spots()), target,
+                                                              cube=cube)
+
+        assert collection.get_overall_scores() == pytest.approx(expected_spots.get_overall_scores(), abs=1e-6)
+
+    def test_custom_decorator(self):
+
+        target = _MinTempDecorator(_generate_target(), 'min_temp')
+
+        spots = ProcessPoolEvaluator(target, processes=2).score_spots(_generate_spots())
+
+        expected_spots = EvaluateSpots.score_spots(_generate_spots(), target)
+        expected_scores = {spot.get_name(): spot.get_scores() for spot in expected_spots}
+
+        for spot in spots:
+            assert spot.get_scores() == pytest.approx(expected_scores[spot.get_name()], abs=1e-6)
+
+    def test_missing_columns(self):
+
+        target = _generate_target()
+        cube = EvaluateSpots.generate_forecast_cube(_generate_spots(), target)
+
+        # Rain is read by a Range decorator but left out of the cube
+        cube = ForecastCube(cube.get_names(), cube.get_times(), ['temp', 'wind'], cube.get_values()[:, :, 1:])
+
+        with pytest.raises(AssertionError):
+            ProcessPoolEvaluator(target).score_spots(_generate_spots(), cube=cube)
+
+    def test_strip_caches(self):
+
+        cache = ForecastCache()
+        cache.set(1.0, 2.0, b'{}')
+        target = _generate_target(cache)
+
+        stripped_target = _strip_caches(target)
+
+        assert ScoringPlan.get_decorators(stripped_target)[0].target.get_cache() is None
+        assert [decorator.name for decorator in ScoringPlan.get_decorators(stripped_target)] == ['wind', 'temp', 'rain']
+        assert target.get_cache() is cache
+        assert len(pickle.dumps(stripped_target)) < len(pickle.dumps(target))
+
+    def test_pickle_target(self, tmp_path):
+
+        cache = ForecastCache(str(tmp_path / 'cache.db'))
+        cache.set(1.0, 2.0, b'{}')
+
+        target = pickle.loads(pickle.dumps(_generate_target(cache)))
+
+        assert target.get_cache().get(1.0, 2.0) == b'{}'
+        assert target.get_transport().get_rate_limiter().get_calls_per_minute() == 60
+        assert target.get_transport().get_stats()['requests'] == 0
+
+        target.get_cache().close()
+        cache.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,64 @@
+import pytest
+
+from ideal_spot.report import TopScoreReport
+from ideal_spot.spots import Spot
+
+
+def _generate_spots(count: int):
+
+    for i in range(count):
+        spot = Spot('spot_%d' % i, float(i), float(-i))
+        spot.set_scores({'wind': (i * 7 % count) / count, 'temp': 1.0 - i / count})
+        spot.set_overall_score(float((i * 13) % count))
+        yield spot
+
+
+class TestTopScoreReport:
+
+    def test_get_report(self):
+
+        report = TopScoreReport(5).add_spots(_generate_spots(100))
+
+        df = report.get_report()
+
+        assert report.get_spot_count() == 100
+        assert len(report.heap) == 5
+        assert list(df['overall_score']) == [99.0, 98.0, 97.0, 96.0, 95.0]
+        assert list(df.columns) == ['name', 'lat', 'long', 'overall_score', 'wind', 'temp']
+
+        expected = sorted(_generate_spots(100), key=lambda spot: spot.get_overall_score(), reverse=True)[:5]
+        assert list(df['name']) == [spot.get_name() for spot in expected]
+
+    def test_get_score_report(self):
+
+        report = TopScoreReport(3, ['temp']).add_spots(_generate_spots(50))
+
+        assert list(report.get_score_report('temp')['name']) == ['spot_0', 'spot_1', 'spot_2']
+
+        with pytest.raises(AssertionError):
+            report.get_score_report('wind')
+
+    def test_partial_report(self):
+
+        report = TopScoreReport(2)
+
+        assert len(report.get_report().index) == 0
+
+        for spot in _generate_spots(10):
+            report.add_spot(spot)
+            if report.get_spot_count() == 3:
+                assert list(report.get_report()['overall_score']) == [6.0, 3.0]
+
+        assert list(report.get_report()['overall_score']) == [9.0, 8.0]
+
+    def test_ties(self):
+
+        spots = [Spot('spot_%d' % i, 0.0, 0.0) for i in range(4)]
+
+        report = TopScoreReport(2).add_spots(spots)
+
+        assert list(report.get_report()['name']) == ['spot_0', 'spot_1']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from typing import Set
+
+import numpy as np
+from pandas import DataFrame
+import pytest
+
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.search import GridCell, SpotSearch
+from ideal_spot.spots import Spot
+from ideal_spot.targets import IdealWindTarget, WeatherTarget
+
+
+PEAK_LAT = 52.37
+PEAK_LONG = 4.21
+
+
+class _SmoothDataWeatherTarget(WeatherTarget):
+    """
+    Wind speed is ideal at a single location and falls away smoothly
+    """
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key)
+        self.call_count = 0
+
+    def generate_forecast_data(self, spot: Spot, metrics: Set[str]) -> DataFrame:
+
+        self.call_count += 1
+
+        distance = np.hypot(spot.get_lat() - PEAK_LAT, spot.get_long() - PEAK_LONG)
+        times = [datetime(2019, 1, 1) + timedelta(hours=3 * i) for i in range(8)]
+
+        return DataFrame({'datetime': times, 'wind': np.full(len(times), 10.0 + 4.0 * distance)})
+
+
+def _generate_target() -> WeatherTarget:
+    target = _SmoothDataWeatherTarget('not used')
+    return IdealWindTarget(target, 'wind', datetime(2019, 1, 1), datetime(2019, 1, 2), 10.0)
+
+
+def _get_best_spot(spots: Set[Spot]) -> Spot:
+    return max(spots, key=lambda spot: spot.get_overall_score())
+
+
+class TestSpotSearch:
+
+    def test_search(self):
+
+        target = _generate_target()
+        search = SpotSearch(target, grid_size=4)
+
+        spots = search.search(50.0, 2.0, 55.0, 7.0, api_call_budget=60)
+        best_spot = _get_best_spot(spots)
+
+        assert search.get_api_call_count() <= 60
+        assert target.target.call_count == search.get_api_call_count()
+        assert np.hypot(best_spot.get_lat() - PEAK_LAT, best_spot.get_long() - PEAK_LONG) < 0.05
+
+        # A dense grid with more requests gets no closer to the ideal location
+        lats, longs = np.meshgrid(np.linspace(50.0, 55.0, 12), np.linspace(2.0, 7.0, 12))
+        grid_spots = {Spot('%d' % i, lat, long) for i, (lat, long) in enumerate(zip(lats.ravel(), longs.ravel()))}
+        grid_best_spot = _get_best_spot(EvaluateSpots.score_spots(grid_spots, _generate_target()))
+
+        assert best_spot.get_overall_score() > grid_best_spot.get_overall_score()
+
+    def test_budget(self):
+
+        target = _generate_target()
+        search = SpotSearch(target, grid_size=4)
+
+        spots = search.search(50.0, 2.0, 55.0, 7.0, api_call_budget=10)
+
+        assert len(spots) == 10
+        assert search.get_api_call_count() == 10
+
+        search = SpotSearch(_generate_target(), grid_size=2, max_depth=1)
+        spots = search.search(50.0, 2.0, 55.0, 7.0, api_call_budget=1000)
+
+        assert search.get_api_call_count() == len(spots) == 4 + 4 * 8
+
+    def test_split(self):
+
+        cells = GridCell(0.0, 0.0, 3.0, 6.0).split(3)
+
+        assert len(cells) == 9
+        assert cells[4].get_center() == (1.5, 3.0)
+        assert all(cell.get_depth() == 1 for cell in cells)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,120 @@
+import os
+from typing import Set
+
+import pytest
+
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.sharding import ShardedRunner, SQLiteShardQueue
+from ideal_spot.spots import Spot
+from ideal_spot.tests.helpers import generate_spots, generate_target, RandomDataWeatherTarget
+
+
+def _generate_spots() -> Set[Spot]:
+    return set(generate_spots(30, -40.0, 2.5, -100.0, 7.0))
+
+
+class TestShardedRunner:
+
+    def test_run(self, tmp_path):
+
+        score_weights = {'wind': 2.0, 'rain': -0.5}
+        runner = ShardedRunner(generate_target(RandomDataWeatherTarget()), str(tmp_path),
+                               score_weight_map=score_weights, geohash_precision=2)
+
+        report = runner.run(_generate_spots())
+
+        expected_spots = EvaluateSpots.score_spots(_generate_spots(), generate_target(
+            RandomDataWeatherTarget()), score_weights)
+        expected_scores = {spot.get_name(): spot.get_overall_score() for spot in expected_spots}
+
+        assert len(runner.get_shard_ids()) > 1
+        assert len(report) == 30
+        assert list(report['rank']) == list(range(1, 31))
+        assert report['overall_score'].is_monotonic_decreasing
+        for name, overall_score in zip(report['name'], report['overall_score']):
+            assert overall_score == pytest.approx(expected_scores[name])
+
+    def test_resume(self, tmp_path):
+
+        failing_spot = next(spot for spot in _generate_spots() if spot.get_name() == 'spot_17')
+
+        fetch_target = RandomDataWeatherTarget(failing_lat=failing_spot.get_lat())
+        runner = ShardedRunner(generate_target(fetch_target), str(tmp_path), geohash_precision=2)
+
+        with pytest.raises(ConnectionError):
+            runner.run(_generate_spots())
+
+        missing_shard_ids = runner.get_missing_shard_ids()
+        assert len(missing_shard_ids) > 0
+        assert len(missing_shard_ids) < len(runner.get_shard_ids())
+
+        with pytest.raises(AssertionError):
+            runner.merge()
+
+        runner.get_queue().close()
+
+        # A restarted run only evaluates the shards which have no saved scores
+        fetch_target = RandomDataWeatherTarget()
+        runner = ShardedRunner(generate_target(fetch_target), str(tmp_path), geohash_precision=2)
+
+        assert runner.prepare(_generate_spots()) == missing_shard_ids
+        assert runner.work() == len(missing_shard_ids)
+        assert 'spot_17' in fetch_target.fetches
+        assert len(fetch_target.fetches) < 30
+
+        report = runner.merge()
+        assert sorted(report['name']) == sorted(spot.get_name() for spot in _generate_spots())
+        assert not any(file_name.endswith('.tmp') for file_name in os.listdir(str(tmp_path)))
+
+    def test_changed_spots(self, tmp_path):
+
+        runner = ShardedRunner(generate_target(), str(tmp_path), geohash_precision=2)
+        runner.prepare(_generate_spots())
+
+        spots = _generate_spots()
+        spots.add(Spot('spot_new', 10.0, 10.0))
+
+        # A restart with other spots would otherwise score the shards written for the first spot set
+        with pytest.raises(AssertionError):
+            runner.prepare(spots)
+
+        with pytest.raises(AssertionError):
+            ShardedRunner(generate_target(), str(tmp_path), geohash_precision=3).prepare(_generate_spots())
+
+        assert runner.prepare(_generate_spots()) == runner.get_shard_ids()
+
+
+class TestSQLiteShardQueue:
+
+    def test_claim(self, tmp_path):
+
+        now = [0.0]
+        queue = SQLiteShardQueue(str(tmp_path / 'queue.db'), claim_timeout=10.0, clock=lambda: now[0])
+        queue.put(['b', 'a'])
+
+        assert queue.claim() == 'a'
+        queue.complete('a')
+        assert queue.claim() == 'b'
+        assert queue.claim() is None
+        assert queue.get_status_counts() == {'done': 1, 'claimed': 1}
+
+        # A claimed shard which is never completed is handed out again
+        now[0] = 11.0
+        assert queue.claim() == 'b'
+
+        # Queueing again leaves done and claimed shards alone
+        other_queue = SQLiteShardQueue(str(tmp_path / 'queue.db'), claim_timeout=10.0, clock=lambda: now[0])
+        other_queue.put(['a', 'b', 'c'])
+        assert other_queue.get_status_counts() == {'done': 1, 'pending': 1, 'claimed': 1}
+        assert other_queue.claim() == 'c'
+        assert other_queue.claim() is None
+
+        queue.release('b')
+        assert other_queue.claim() == 'b'
+
+        other_queue.close()
+        queue.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
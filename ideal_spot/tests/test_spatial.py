@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+from typing import Set
+
+import numpy as np
+from pandas import DataFrame
+import pytest
+
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.spatial import decode_geohash_bounds, encode_geohash, GeohashIndex, GridIndex
+from ideal_spot.spots import Spot, SpotCollection
+from ideal_spot.targets import IdealTempTarget, WeatherTarget
+
+
+class _CountingWeatherTarget(WeatherTarget):
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key)
+        self.calls = []
+
+    def generate_forecast_data(self, spot: Spot, metrics: Set[str]) -> DataFrame:
+
+        self.calls.append((spot.get_lat(), spot.get_long()))
+
+        times = [datetime(2019, 1, 1) + timedelta(hours=3 * i) for i in range(8)]
+        return DataFrame({'datetime': times, 'temp': np.full(len(times), 280.0 + spot.get_lat())})
+
+
+def _generate_spots() -> Set[Spot]:
+    return {Spot('ramp_a', 52.3701, 4.2101), Spot('ramp_b', 52.3712, 4.2138), Spot('trailhead', 52.3745, 4.2179),
+            Spot('far', 48.1, 11.6)}
+
+
+class TestSpatial:
+
+    def test_geohash(self):
+
+        assert encode_geohash(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+        assert encode_geohash(57.64911, 10.40744, 5) == 'u4pru'
+
+        min_lat, min_long, max_lat, max_long = decode_geohash_bounds('u4pru')
+        assert min_lat <= 57.64911 <= max_lat
+        assert min_long <= 10.40744 <= max_long
+
+        index = GeohashIndex(5)
+        lat, long = index.get_cell_center('u4pru')
+        assert index.get_cell(lat, long) == 'u4pru'
+
+    def test_group_spots(self):
+
+        cell_spots = GridIndex(0.01).group_spots(_generate_spots())
+
+        assert sorted(len(spot_list) for spot_list in cell_spots.values()) == [1, 3]
+
+        cell_spots = GridIndex(0.001).group_spots(_generate_spots())
+
+        assert len(cell_spots) == 4
+
+    def test_score_spots_snapped(self):
+
+        score_weights = {'temp': 2.0}
+
+        for spatial_index, spots, workers in [(GridIndex(0.01), _generate_spots(), None),
+                                              (GeohashIndex(5), SpotCollection.from_spots(_generate_spots()), 2)]:
+
+            fetch_target = _CountingWeatherTarget('not used')
+            target = IdealTempTarget(fetch_target, 'temp', datetime(2019, 1, 1), datetime(2019, 1, 2), 330.0)
+
+            spots = EvaluateSpots.score_spots_snapped(spots, target, score_weights, spatial_index, workers)
+            scored_spots = {spot.get_name(): spot for spot in spots}
+            cell_spots = spatial_index.group_spots(_generate_spots())
+
+            # Forecast data is fetched once for the center of each cell
+            assert sorted(fetch_target.calls) == sorted(spatial_index.get_cell_center(cell) for cell in cell_spots)
+
+            for cell, spot_list in cell_spots.items():
+
+                center_spot = Spot(str(cell), *spatial_index.get_cell_center(cell))
+                EvaluateSpots.score_spots({center_spot}, target, score_weights)
+
+                for spot in spot_list:
+                    assert scored_spots[spot.get_name()].get_scores() == center_spot.get_scores()
+                    assert scored_spots[spot.get_name()].get_overall_score() == center_spot.get_overall_score()
+
+        assert len(cell_spots) == 2
+
+    def test_generate_forecast_cube_snapped(self):
+
+        fetch_target = _CountingWeatherTarget('not used')
+        target = IdealTempTarget(fetch_target, 'temp', datetime(2019, 1, 1), datetime(2019, 1, 2), 330.0)
+
+        cube = EvaluateSpots.generate_forecast_cube(_generate_spots(), target, spatial_index=GridIndex(0.01))
+
+        assert len(fetch_target.calls) == 2
+        assert sorted(cube.get_names()) == ['far', 'ramp_a', 'ramp_b', 'trailhead']
+
+        spots = EvaluateSpots.score_spots_vectorized(_generate_spots(), target, cube=cube)
+        expected_spots = EvaluateSpots.score_spots_snapped(_generate_spots(), target, spatial_index=GridIndex(0.01))
+        expected_scores = {spot.get_name(): spot.get_overall_score() for spot in expected_spots}
+
+        for spot in spots:
+            assert spot.get_overall_score() == pytest.approx(expected_scores[spot.get_name()], abs=1e-6)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
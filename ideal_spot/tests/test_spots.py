@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import numpy as np
+from pandas import DataFrame
+import pytest
+
+from ideal_spot.spots import Spot, SpotCollection, SpotView
+
+
+class TestSpot:
+
+    def test_slots(self):
+
+        spot = Spot('spot_a', 1.0, 2.0)
+
+        assert not hasattr(spot, '__dict__')
+        with pytest.raises(AttributeError):
+            spot.elevation = 10.0
+
+
+class TestSpotCollection:
+
+    def test_duplicates(self):
+
+        collection = SpotCollection(['spot_a', 'spot_b', 'spot_a', 'spot_c'], [1.0, 2.0, 3.0, 4.0],
+                                    [5.0, 6.0, 7.0, 8.0])
+
+        assert len(collection) == 3
+        assert list(collection.get_names()) == ['spot_a', 'spot_b', 'spot_c']
+        assert list(collection.get_lats()) == [1.0, 2.0, 4.0]
+        assert collection.get_spot_index('spot_c') == 2
+
+    def test_spot_view(self):
+
+        collection = SpotCollection.from_dataframe(DataFrame({'n': ['spot_a', 'spot_b'], 'lat': [1.0, 2.0],
+                                                              'long': [3.0, 4.0]}), 'n', 'lat', 'long')
+
+        spot = collection.get_spot(1)
+
+        assert isinstance(spot, SpotView)
+        assert spot == Spot('spot_b', 0.0, 0.0)
+        assert (spot.get_name(), spot.get_lat(), spot.get_long()) == ('spot_b', 2.0, 4.0)
+
+        spot.set_scores({'wind': 0.5, 'temp': 0.25})
+        spot.set_overall_score(0.75)
+        collection.get_spot(0).set_scores({'rain': 1.0})
+
+        assert spot.get_scores() == {'wind': 0.5, 'temp': 0.25}
+        assert spot.get_overall_score() == 0.75
+        assert collection.get_score_names() == ['wind', 'temp', 'rain']
+        np.testing.assert_array_equal(collection.get_score_matrix(['rain', 'wind']), [[1.0, np.nan], [np.nan, 0.5]])
+
+        spot.set_scores({'rain': 0.0})
+
+        assert spot.get_scores() == {'rain': 0.0}
+
+    def test_from_spots(self):
+
+        spot_a = Spot('spot_a', 1.0, 2.0)
+        spot_a.set_scores({'wind': 0.5})
+        spot_a.set_overall_score(0.5)
+
+        collection = SpotCollection.from_spots([spot_a, Spot('spot_b', 3.0, 4.0), Spot('spot_a', 5.0, 6.0)])
+
+        assert len(collection) == 2
+        assert [spot.get_name() for spot in collection] == ['spot_a', 'spot_b']
+        assert collection.get_spot(0).get_scores() == {'wind': 0.5}
+        assert collection.get_spot(1).get_scores() == {}
+        assert list(collection.get_overall_scores()) == [0.5, 0.0]
+
+    def test_to_dataframe(self):
+
+        collection = SpotCollection(['spot_a', 'spot_b'], [1.0, 2.0], [3.0, 4.0])
+        collection.set_score_matrix(['wind', 'temp'], np.array([[0.1, 0.2], [0.3, 0.4]]))
+        collection.set_overall_scores(np.array([0.3, 0.7]))
+
+        df = collection.to_dataframe()
+
+        assert list(df.columns) == ['name', 'lat', 'long', 'overall_score', 'wind', 'temp']
+        assert list(df['temp']) == [0.2, 0.4]
+
+    def test_get_spot_scores_lock(self):
+
+        collection = SpotCollection(['spot_a', 'spot_b'], [1.0, 2.0], [3.0, 4.0])
+        collection.set_spot_scores(0, {'wind': 0.5})
+
+        # Reads wait for a writer which is adding score columns
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with collection.lock:
+                scores = executor.submit(collection.get_spot_scores, 0)
+                with pytest.raises(TimeoutError):
+                    scores.result(timeout=0.1)
+                collection._get_score_column('temp')[0] = 0.25
+
+            assert scores.result() == {'wind': 0.5, 'temp': 0.25}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -1,10 +1,14 @@
 from datetime import datetime
 from typing import Set
 
-from pandas import DataFrame
+import numpy as np
+from pandas import DataFrame, DatetimeIndex
 import pytest
 
-from targets import RangeTargetDecorator, WeatherTarget, IdealValueTargetDecorator
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.spots import Spot
+from ideal_spot.targets import ForecastWindows, IdealValueTargetDecorator, RangeTargetDecorator, WeatherTarget, \
+    WeatherTargetDecorator
 
 
 class _DummyRangeTargetDecorator(RangeTargetDecorator):
@@ -42,6 +46,28 @@ class TestRangeTargetDecorator:
         assert len(mean_score) == 1
         assert round(mean_score['mean_test'], 5) == 0.32
 
+    def test_calculate_score_forecast_data(self):
+
+        df_a = DataFrame([
+            {'datetime': datetime(2019, 1, 1, 8), 'value': 2.1},
+            {'datetime': datetime(2019, 1, 1, 14), 'value': 3.2},
+        ])
+        df_b = DataFrame([
+            {'datetime': datetime(2019, 1, 1, 8), 'value': 6.0},
+            {'datetime': datetime(2019, 1, 1, 14), 'value': 1.0},
+        ])
+
+        target = WeatherTarget('not used')
+        target = _DummyRangeTargetDecorator(target, 'sum_test', datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20),
+                                            'value', 10.0, 0.0, 'sum')
+
+        scores_a = target.calculate_scores(None, df_a)
+        scores_b = target.calculate_scores(None, df_b)
+
+        assert round(scores_a['sum_test'], 5) == 0.53
+        assert round(scores_b['sum_test'], 5) == 0.7
+        assert target.get_forecast_data() is None
+
 
 class _DummyIdealValueTargetDecorator(IdealValueTargetDecorator):
 
@@ -81,5 +107,129 @@ class TestIdealValueTargetDecorator:
         assert round(scores['ideal_test'], 5) == 0.68
 
 
+class _CustomRangeTargetDecorator(_DummyRangeTargetDecorator):
+
+    def _calculate_score(self, spot: Spot, forecast_data: DataFrame = None) -> float:
+        return float(len(forecast_data.index))
+
+
+class _LegacyTargetDecorator(WeatherTargetDecorator):
+    """
+    Decorator written against the old API reading its forecast from the target
+    """
+
+    def get_forecast_metrics(self) -> Set[str]:
+        return self.target.get_forecast_metrics()
+
+    def _calculate_score(self, spot: Spot) -> float:
+        return float(self.get_forecast_data()['value'].sum())
+
+
+class _SpotDataWeatherTarget(WeatherTarget):
+
+    def generate_forecast_data(self, spot: Spot, metrics: Set[str]) -> DataFrame:
+        return DataFrame([
+            {'datetime': datetime(2019, 1, 1, 8), 'value': spot.get_lat()},
+            {'datetime': datetime(2019, 1, 1, 14), 'value': spot.get_long()},
+        ])
+
+
+class TestLegacyTargetDecorator:
+
+    def test_evaluate_spot(self):
+
+        target = _SpotDataWeatherTarget('not used')
+        target = _DummyRangeTargetDecorator(target, 'sum_test', datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20),
+                                            'value', 10.0, 0.0, 'sum')
+        target = _LegacyTargetDecorator(target, 'legacy')
+
+        assert not target.is_stateless()
+
+        spot = Spot('spot_a', 1.0, 2.0)
+        target.evaluate_spot(spot)
+
+        assert spot.get_scores() == pytest.approx({'sum_test': 0.3, 'legacy': 3.0})
+        assert list(target.get_forecast_data()['value']) == [1.0, 2.0]
+
+        # Data passed explicitly reaches the old decorator through the target
+        assert target.calculate_scores(spot, target.generate_forecast_data(Spot('spot_b', 2.0, 3.0), set())) == \
+            pytest.approx({'sum_test': 0.5, 'legacy': 5.0})
+
+    def test_score_spots_workers(self):
+
+        target = _LegacyTargetDecorator(_SpotDataWeatherTarget('not used'), 'legacy')
+        spots = {Spot('spot_%d' % i, float(i), 1.0) for i in range(50)}
+
+        EvaluateSpots.score_spots(spots, target, workers=8)
+
+        assert all(spot.get_scores() == {'legacy': spot.get_lat() + 1.0} for spot in spots)
+
+
+class TestForecastWindows:
+
+    def test_calculate_scores_shared_windows(self):
+
+        df = DataFrame([
+            {'datetime': datetime(2019, 1, 1, 1), 'value': 1.0},
+            {'datetime': datetime(2019, 1, 1, 8), 'value': 2.1},
+            {'datetime': datetime(2019, 1, 1, 14), 'value': 3.2},
+            {'datetime': datetime(2019, 1, 1, 20), 'value': 4.3},
+            {'datetime': datetime(2019, 1, 2, 1), 'value': 5.4},
+        ])
+
+        day_one = (datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20))
+        day_two = (datetime(2019, 1, 1, 12), datetime(2019, 1, 2, 2))
+
+        target = WeatherTarget('not used')
+        target = _DummyRangeTargetDecorator(target, 'sum_one', *day_one, 'value', 10.0, 0.0, 'sum')
+        target = _DummyIdealValueTargetDecorator(target, 'ideal_one', *day_one, 'value', 10.0, 0.0, 5.0)
+        target = _DummyRangeTargetDecorator(target, 'mean_one', *day_one, 'value', 10.0, 0.0, 'mean')
+        target = _DummyRangeTargetDecorator(target, 'sum_two', *day_two, 'value', 20.0, 0.0, 'sum')
+        target = _CustomRangeTargetDecorator(target, 'custom', *day_two, 'value', 20.0, 0.0, 'sum')
+
+        windows = ForecastWindows(df)
+        scores = target._calculate_window_scores(None, windows)
+
+        assert len(windows.windows) == 2
+        assert len(windows.aggregates) == 3
+        assert round(scores['sum_one'], 5) == 0.96
+        assert round(scores['ideal_one'], 5) == 0.82
+        assert round(scores['mean_one'], 5) == 0.32
+        assert round(scores['sum_two'], 5) == 0.645
+        assert scores['custom'] == 5.0
+        assert target.calculate_scores(None, df) == scores
+
+    def test_get_window(self):
+
+        times = [datetime(2019, 1, 1, hour) for hour in range(0, 24, 3)]
+        df = DataFrame({'datetime': times, 'value': [float(i) for i in range(len(times))]},
+                       index=DatetimeIndex(times))
+
+        windows = ForecastWindows(df)
+        window = windows.get_window(datetime(2019, 1, 1, 5), datetime(2019, 1, 1, 12))
+
+        assert windows.get_window_bounds(datetime(2019, 1, 1, 5), datetime(2019, 1, 1, 12)) == (2, 5)
+        assert list(window['value']) == [2.0, 3.0, 4.0]
+        assert np.shares_memory(windows._get_column('value'), df['value'].to_numpy())
+        assert windows.get_aggregate(datetime(2019, 1, 1, 5), datetime(2019, 1, 1, 12), 'value', 'sum') == 9.0
+        assert windows.get_aggregate(datetime(2019, 1, 2), datetime(2019, 1, 3), 'value', 'sum') == 0.0
+        assert np.isnan(windows.get_aggregate(datetime(2019, 1, 2), datetime(2019, 1, 3), 'value', 'mean'))
+
+    def test_get_window_unsorted(self):
+
+        df = DataFrame([
+            {'datetime': datetime(2019, 1, 1, 14), 'value': 3.2},
+            {'datetime': datetime(2019, 1, 1, 1), 'value': 1.0},
+            {'datetime': datetime(2019, 1, 2, 1), 'value': 5.4},
+            {'datetime': datetime(2019, 1, 1, 8), 'value': 2.1},
+        ])
+
+        windows = ForecastWindows(df)
+
+        assert list(windows.get_window(datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20))['value']) == [2.1, 3.2]
+        assert round(windows.get_aggregate(datetime(2019, 1, 1, 6), datetime(2019, 1, 1, 20), 'value', 'mean'),
+                     5) == 2.65
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
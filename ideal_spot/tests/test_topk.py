@@ -0,0 +1,126 @@
+from datetime import datetime
+from typing import Set
+
+import numpy as np
+from pandas import DataFrame
+import pytest
+
+from ideal_spot.cache import ForecastCache
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.plan import ScoringPlan
+from ideal_spot.server import ForecastServer
+from ideal_spot.spatial import GridIndex
+from ideal_spot.spots import Spot
+from ideal_spot.targets import IdealTempTarget, IdealWindTarget, NewRainTarget, RangeTargetDecorator, WeatherTarget
+from ideal_spot.tests.helpers import generate_spots, generate_target, RandomDataWeatherTarget
+from ideal_spot.topk import TopKEvaluator
+from ideal_spot.transport import WeatherTransport
+
+
+class _CustomScoreDecorator(RangeTargetDecorator):
+
+    def get_forecast_metrics(self) -> Set[str]:
+        return super().get_forecast_metrics()
+
+    def _calculate_score(self, spot: Spot, forecast_data: DataFrame = None) -> float:
+        return spot.get_lat() / 100.0
+
+
+def _generate_server_target(fetch_target: WeatherTarget, start: int) -> WeatherTarget:
+
+    range_start = datetime.fromtimestamp(start)
+    range_end = datetime.fromtimestamp(start + 86400)
+
+    target = IdealWindTarget(fetch_target, 'wind', range_start, range_end, 10.0)
+    target = IdealTempTarget(target, 'temp', range_start, range_end, 295.0)
+    target = NewRainTarget(target, 'rain', range_start, range_end)
+    return target
+
+
+class TestTopKEvaluator:
+
+    def test_evaluate(self):
+
+        score_weights = {'wind': 5.0, 'temp': 2.0, 'rain': -0.5}
+        fetch_target = RandomDataWeatherTarget()
+        evaluator = TopKEvaluator(generate_target(fetch_target), 10, score_weights)
+
+        top_spots = evaluator.evaluate(generate_spots(200))
+
+        expected_spots = EvaluateSpots.score_spots(generate_spots(200), generate_target(fetch_target), score_weights)
+        expected_spots = sorted(expected_spots, key=lambda spot: spot.get_overall_score(), reverse=True)[:10]
+
+        assert [spot.get_name() for spot in top_spots] == [spot.get_name() for spot in expected_spots]
+        for spot, expected_spot in zip(top_spots, expected_spots):
+            assert spot.get_scores() == pytest.approx(expected_spot.get_scores())
+            assert spot.get_overall_score() == pytest.approx(expected_spot.get_overall_score())
+
+        stats = evaluator.get_stats()
+        assert stats['pruned_spots'] > 0
+        assert stats['scored_decorators'] < 3 * 200
+
+    def test_score_bounds(self):
+
+        target = generate_target(RandomDataWeatherTarget())
+        wind, temp, rain = ScoringPlan.get_decorators(target)
+
+        assert ScoringPlan.get_score_bounds(rain) == (0.0, 1.0)
+        assert ScoringPlan.get_score_bounds(wind) == pytest.approx((1.0 - 30.0 / 40.0, 1.0))
+        assert ScoringPlan.get_score_bounds(temp) == pytest.approx((1.0 - 105.0 / 200.0, 1.0))
+
+        temp = IdealTempTarget(target, 'temp', datetime(2019, 1, 1), datetime(2019, 1, 2), 500.0)
+        assert ScoringPlan.get_score_bounds(temp) == pytest.approx((1.0 - 300.0 / 200.0, 1.0 - 100.0 / 200.0))
+
+        custom = _CustomScoreDecorator(target, 'custom', datetime(2019, 1, 1), datetime(2019, 1, 2), 'temp', 1.0, 0.0,
+                                       'sum')
+        assert ScoringPlan.get_score_bounds(custom) == (-np.inf, np.inf)
+
+    def test_unbounded_decorator(self):
+
+        fetch_target = RandomDataWeatherTarget()
+        target = _CustomScoreDecorator(generate_target(fetch_target), 'custom', datetime(2019, 1, 1),
+                                       datetime(2019, 1, 2), 'temp', 1.0, 0.0, 'sum')
+
+        top_spots = TopKEvaluator(target, 5).evaluate(generate_spots(200))
+
+        expected_spots = EvaluateSpots.score_spots(generate_spots(200), target)
+        expected_spots = sorted(expected_spots, key=lambda spot: spot.get_overall_score(), reverse=True)[:5]
+
+        assert [spot.get_name() for spot in top_spots] == [spot.get_name() for spot in expected_spots]
+
+    def test_coarse_skipped_fetches(self):
+
+        random = np.random.default_rng(7)
+        spots = [Spot('spot_%d' % i, round(random.uniform(40.0, 50.0), 4), round(random.uniform(0.0, 20.0), 4))
+                 for i in range(200)]
+        score_weights = {'wind': 1.0, 'temp': 1.0, 'rain': -1.0}
+        coarse_index = GridIndex(2.0)
+
+        with ForecastServer() as server:
+            transport = WeatherTransport(max_retries=0, base_url=server.get_url())
+            fetch_target = WeatherTarget('not used', transport, ForecastCache(max_entries=1000))
+            target = _generate_server_target(fetch_target, server.get_start())
+
+            # Forecasts of the coarse cell centers are already cached
+            for cell in coarse_index.group_spots(spots):
+                lat, long = coarse_index.get_cell_center(cell)
+                fetch_target.generate_forecast_data(Spot(str(cell), lat, long), target.get_forecast_metrics())
+            transport.reset_stats()
+
+            evaluator = TopKEvaluator(target, 5, score_weights, coarse_index)
+            top_spots = evaluator.evaluate(spots)
+
+            expected_target = _generate_server_target(WeatherTarget('not used', WeatherTransport(
+                base_url=server.get_url())), server.get_start())
+            expected_spots = EvaluateSpots.score_spots(spots, expected_target, score_weights)
+            expected_spots = sorted(expected_spots, key=lambda spot: spot.get_overall_score(), reverse=True)[:5]
+
+        assert [spot.get_name() for spot in top_spots] == [spot.get_name() for spot in expected_spots]
+
+        stats = evaluator.get_stats()
+        assert stats['coarse_pruned_spots'] > 0
+        assert transport.get_stats()['requests'] == len(spots) - stats['skipped_fetches']
+        assert transport.get_stats()['requests'] < len(spots) / 2
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import monotonic, sleep
+
+import pytest
+
+from ideal_spot.feed import ForecastWeatherFeedFactory
+from ideal_spot.transport import get_default_transport, RateLimiter, TransportError, WeatherTransport
+
+
+class _DummyResponse:
+
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {}
+
+
+class _DummySession:
+
+    def __init__(self, status_codes):
+        self.status_codes = list(status_codes)
+        self.urls = []
+
+    def get(self, url: str, timeout: float = None) -> _DummyResponse:
+        self.urls.append(url)
+        status_code = self.status_codes.pop(0)
+        return _DummyResponse(status_code, b'status %d' % status_code)
+
+
+class _BlockingSession(_DummySession):
+
+    def __init__(self, release: Event):
+        super().__init__([200])
+        self.release = release
+
+    def get(self, url: str, timeout: float = None) -> _DummyResponse:
+        self.release.wait(5.0)
+        return super().get(url, timeout)
+
+
+class TestRateLimiter:
+
+    def test_reserve(self):
+
+        limiter = RateLimiter(60.0)
+
+        assert limiter.reserve() == 0.0
+        assert round(limiter.reserve(), 1) == 1.0
+        assert round(limiter.reserve(), 1) == 2.0
+
+    def test_reserve_burst(self):
+
+        limiter = RateLimiter(120.0, burst=2)
+
+        assert limiter.reserve() == 0.0
+        assert limiter.reserve() == 0.0
+        assert round(limiter.reserve(), 1) == 0.5
+
+
+class TestWeatherTransport:
+
+    def test_get_retries(self):
+
+        transport = WeatherTransport(max_retries=3, backoff_base=0.0)
+        transport.session = _DummySession([429, 503, 200])
+
+        assert transport.get('http://test') == b'status 200'
+        assert transport.get_stats() == {'requests': 3, 'retries': 2, 'throttled': 0, 'coalesced': 0}
+
+    def test_get_retries_exhausted(self):
+
+        transport = WeatherTransport(max_retries=1, backoff_base=0.0)
+        transport.session = _DummySession([500, 500, 200])
+
+        with pytest.raises(TransportError) as error:
+            transport.get('http://test/data?lat=1.0&appid=secret')
+
+        assert error.value.get_status() == 500
+        assert error.value.get_url() == 'http://test/data?lat=1.0'
+        assert transport.get_stats() == {'requests': 2, 'retries': 1, 'throttled': 0, 'coalesced': 0}
+
+    def test_get_throttled(self):
+
+        transport = WeatherTransport(calls_per_minute=6000.0)
+        transport.session = _DummySession([200, 200, 200])
+
+        for _ in range(3):
+            transport.get('http://test')
+
+        assert transport.get_stats() == {'requests': 3, 'retries': 0, 'throttled': 2, 'coalesced': 0}
+
+    def test_get_coalesced(self):
+
+        release = Event()
+        transport = WeatherTransport()
+        transport.session = _BlockingSession(release)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = [executor.submit(transport.get, 'http://test') for _ in range(4)]
+
+            # The request is released either way so a failure never blocks the executor shutdown
+            deadline = monotonic() + 5.0
+            while transport.get_stats()['coalesced'] < 3 and monotonic() < deadline:
+                sleep(0.001)
+            coalesced = transport.get_stats()['coalesced']
+            release.set()
+
+        assert coalesced == 3
+        assert [result.result() for result in results] == [b'status 200'] * 4
+        assert transport.session.urls == ['http://test']
+        assert transport.get_stats()['requests'] == 1
+
+    def test_get_backoff(self):
+
+        transport = WeatherTransport(backoff_base=1.0, backoff_max=5.0)
+
+        for attempt in range(6):
+            assert 0.0 <= transport.get_backoff(attempt) <= min(5.0, 2 ** attempt)
+
+        assert transport.get_backoff(0, '3') >= 3.0
+        assert transport.get_backoff(0, '100') == 5.0
+
+
+class TestForecastWeatherFeedTransport:
+
+    def test_transport(self):
+
+        transport = WeatherTransport()
+
+        feed = ForecastWeatherFeedFactory('not used', 40.0, 104.0, transport).generate_feed({'temp', 'wind'})
+        assert feed.get_transport() is transport
+
+        feed = ForecastWeatherFeedFactory('not used', 40.0, 104.0).generate_feed({'temp', 'wind'})
+        assert feed.get_transport() is get_default_transport()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,207 @@
+from heapq import heappush, heapreplace
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from ideal_spot.evaluate import EvaluateSpots
+from ideal_spot.plan import ScoringPlan
+from ideal_spot.spatial import SpatialIndex
+from ideal_spot.spots import Spot
+from ideal_spot.targets import ForecastWindows, WeatherTarget
+
+
+class TopKEvaluator:
+    """
+    Top K evaluation which stops scoring a spot as soon as it can no
+    longer reach the current top K. Every decorator score lies within
+    known bounds, so the highest overall score a spot can still reach
+    is the sum of its weighted scores so far and the best weighted
+    score of each remaining decorator. Decorators are scored in order
+    of decreasing absolute weight so this bound tightens quickly.
+
+    Spots with cached forecast data are scored first to raise the top K
+    threshold cheaply. Given a coarse spatial index, a spot without cached
+    data is first bounded using the cached forecast of its coarse cell
+    center: each decorator score on the coarse data is widened by the
+    tolerance, and the spot is never fetched when this bound cannot beat
+    the threshold. The result is exact as long as no decorator score of a
+    spot differs from the score at its cell center by more than the
+    tolerance.
+    """
+
+    def __init__(self, target: WeatherTarget, k: int, score_weight_map: Dict[str, float] = None,
+                 coarse_index: SpatialIndex = None, tolerance: float = 0.1):
+        assert k > 0, 'K %s must be positive' % str(k)
+        assert tolerance >= 0.0, 'Tolerance %s must not be negative' % str(tolerance)
+
+        self.target = target
+        self.k = k
+        self.score_weight_map = score_weight_map if score_weight_map is not None else dict()
+        self.coarse_index = coarse_index
+        self.tolerance = tolerance
+
+        # Only the last decorator with a given name determines its score
+        decorators = dict()
+        for decorator in ScoringPlan.get_decorators(target):
+            decorators.pop(decorator.name, None)
+            decorators[decorator.name] = decorator
+        self.decorators = list(decorators.values())
+
+        weights = [self.score_weight_map.get(decorator.name, 1.0) for decorator in self.decorators]
+        bounds = [ScoringPlan.get_score_bounds(decorator) for decorator in self.decorators]
+        self.weighted_bounds = list(zip(self.decorators, weights, bounds))
+        max_contributions = [self._get_max_contribution(weight, bound) for weight, bound in zip(weights, bounds)]
+
+        # Unbounded decorators are scored first since no spot can be pruned before they are known
+        order = sorted(range(len(self.decorators)),
+                       key=lambda i: (np.isfinite(max_contributions[i]), -abs(weights[i])))
+        self.ordered_decorators = [(self.decorators[i], weights[i]) for i in order]
+
+        # Highest total contribution of the decorators from each position onwards
+        self.remaining_max = np.append(np.cumsum([max_contributions[i] for i in order][::-1])[::-1], 0.0)
+
+        self.stats = dict()
+
+    def get_k(self) -> int:
+        return self.k
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Counts of the last evaluation, scored decorators, pruned spots,
+        spots whose forecast data was never fetched and spots pruned on
+        the coarse data of their cell
+        """
+        return self.stats
+
+    def evaluate(self, spots: Iterable[Spot]) -> List[Spot]:
+        """
+        Find the K spots with the highest overall score
+
+        Parameters
+        ----------
+        spots : Iterable[Spot]
+            Un-scored candidate spots
+
+        Returns
+        -------
+        List[Spot]
+            Top K spots sorted by overall score with all scores set,
+            ties keep the spot scored first
+        """
+
+        self.stats = {'scored_decorators': 0, 'pruned_spots': 0, 'skipped_fetches': 0, 'coarse_pruned_spots': 0}
+
+        spots = list(spots)
+        cache = self.target.get_cache()
+        if cache is not None:
+            cached = [cache.contains(spot.get_lat(), spot.get_long()) for spot in spots]
+            order = sorted(range(len(spots)), key=lambda i: not cached[i])
+        else:
+            cached = [False] * len(spots)
+            order = range(len(spots))
+
+        metrics = self.target.get_forecast_metrics()
+        coarse_windows = dict()
+        heap = []
+
+        for position, i in enumerate(order):
+
+            spot = spots[i]
+            threshold = heap[0][0] if len(heap) == self.k else -np.inf
+
+            # A spot which can at best tie the threshold never replaces a spot scored before it
+            if self.remaining_max[0] <= threshold:
+                self.stats['pruned_spots'] += 1
+                self.stats['skipped_fetches'] += 1
+                continue
+
+            # Spots which must be fetched are first bounded on the cached data of their coarse cell
+            if not cached[i] and len(heap) == self.k and \
+                    self._get_coarse_bound(spot, metrics, coarse_windows) <= threshold:
+                self.stats['pruned_spots'] += 1
+                self.stats['skipped_fetches'] += 1
+                self.stats['coarse_pruned_spots'] += 1
+                continue
+
+            windows = ForecastWindows(self.target.generate_forecast_data(spot, metrics))
+            scores = self._score_spot(spot, windows, threshold)
+            if scores is None:
+                self.stats['pruned_spots'] += 1
+                continue
+
+            spot.set_scores({decorator.name: scores[decorator.name] for decorator in self.decorators})
+            spot.set_overall_score(EvaluateSpots.calculate_overall_score(spot.get_scores(), self.score_weight_map))
+
+            # Negative position keeps the spot scored first when scores are tied
+            entry = (spot.get_overall_score(), -position, spot)
+            if len(heap) < self.k:
+                heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapreplace(heap, entry)
+
+        return [spot for _, _, spot in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def get_report(self, spots: Iterable[Spot]) -> DataFrame:
+        """
+        Score report of the top K spots
+        """
+        return EvaluateSpots.generate_score_report(set(self.evaluate(spots)))
+
+    def _score_spot(self, spot: Spot, windows: ForecastWindows, threshold: float) -> Dict[str, float]:
+
+        scores = dict()
+        overall_score = 0.0
+
+        for position, (decorator, weight) in enumerate(self.ordered_decorators):
+
+            if overall_score + self.remaining_max[position] <= threshold:
+                return None
+
+            score = decorator._calculate_window_score(spot, windows)
+            scores[decorator.name] = score
+            overall_score += score * weight
+            self.stats['scored_decorators'] += 1
+
+        return scores
+
+    def _get_coarse_bound(self, spot: Spot, metrics: Set[str], coarse_windows: Dict) -> float:
+        """
+        Highest overall score the spot can reach given the cached forecast
+        of its coarse cell center, infinite without cached coarse data
+        """
+
+        cache = self.target.get_cache()
+        if self.coarse_index is None or cache is None:
+            return np.inf
+
+        cell = self.coarse_index.get_cell(spot.get_lat(), spot.get_long())
+        if cell not in coarse_windows:
+            lat, long = self.coarse_index.get_cell_center(cell)
+            coarse_windows[cell] = None
+            if cache.contains(lat, long):
+                coarse_windows[cell] = ForecastWindows(self.target.generate_forecast_data(Spot(str(cell), lat, long),
+                                                                                          metrics))
+
+        windows = coarse_windows[cell]
+        if windows is None:
+            return np.inf
+
+        bound = 0.0
+        for decorator, weight, (lo, hi) in self.weighted_bounds:
+
+            # The tolerance says nothing about decorators with their own score scale
+            if not np.isfinite(lo) or not np.isfinite(hi):
+                return np.inf
+
+            score = decorator._calculate_window_score(spot, windows)
+            bound += self._get_max_contribution(weight, (max(lo, score - self.tolerance),
+                                                         min(hi, score + self.tolerance)))
+
+        return bound
+
+    @staticmethod
+    def _get_max_contribution(weight: float, bounds: Tuple[float, float]) -> float:
+        if weight == 0.0:
+            return 0.0
+        return max(weight * bounds[0], weight * bounds[1])
@@ -0,0 +1,386 @@
+from asyncio import CancelledError, get_running_loop, sleep as async_sleep
+from concurrent.futures import Future
+from hashlib import sha1
+import os
+from random import uniform
+from threading import get_ident, Lock
+from time import monotonic, sleep
+from typing import Dict, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from requests import HTTPError, Session
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+OPEN_WEATHER_MAP_URL = 'http://api.openweathermap.org'
+
+
+class TransportError(HTTPError):
+    """
+    Raised when the final response to a request is not successful, after
+    any retries of rate limited or failed responses
+    """
+
+    def __init__(self, status: int, url: str):
+        # The API key is left out of the URL so errors can be logged safely
+        parsed_url = urlparse(url)
+        url = parsed_url._replace(query=urlencode([(name, value) for name, value in parse_qsl(parsed_url.query)
+                                                   if name != 'appid'])).geturl()
+
+        super().__init__('Request failed with status %d: %s' % (status, url))
+        self.status = status
+        self.url = url
+
+    def get_status(self) -> int:
+        return self.status
+
+    def get_url(self) -> str:
+        return self.url
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter which spreads calls evenly over a
+    calls per minute budget, a burst of tokens may be allowed
+    """
+
+    def __init__(self, calls_per_minute: float, burst: int = 1):
+        assert calls_per_minute > 0, 'Calls per minute %s must be positive' % str(calls_per_minute)
+        assert burst >= 1, 'Burst %s must be at least one' % str(burst)
+
+        self.calls_per_minute = calls_per_minute
+        self.burst = burst
+
+        self.tokens = float(burst)
+        self.last_refill = monotonic()
+        self.lock = Lock()
+
+    def get_calls_per_minute(self) -> float:
+        return self.calls_per_minute
+
+    def reserve(self) -> float:
+        """
+        Take a token from the bucket and return the number of
+        seconds the caller must wait before using it
+        """
+
+        with self.lock:
+            now = monotonic()
+            rate = self.calls_per_minute / 60.0
+            self.tokens = min(float(self.burst), self.tokens + (now - self.last_refill) * rate)
+            self.last_refill = now
+            self.tokens -= 1.0
+
+            wait = 0.0
+            if self.tokens < 0.0:
+                wait = -self.tokens / rate
+
+        return wait
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait > 0.0:
+            sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        wait = self.reserve()
+        if wait > 0.0:
+            await async_sleep(wait)
+        return wait
+
+
+class WeatherTransport:
+    """
+    Shared HTTP transport for weather feeds with a persistent connection
+    pool, an optional rate limiter and jittered exponential backoff
+    retries for rate limited or failed responses. Concurrent requests
+    for the same URL are coalesced into a single call.
+    """
+
+    def __init__(self, calls_per_minute: float = None, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, pool_size: int = 10, timeout: float = 30.0, base_url: str = None):
+        assert max_retries >= 0, 'Max retries %s must not be negative' % str(max_retries)
+
+        # Feeds build their API calls on the base URL, which may point at a stand-in server
+        self.base_url = (base_url if base_url is not None else OPEN_WEATHER_MAP_URL).rstrip('/')
+
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self.rate_limiter = None
+        if calls_per_minute is not None:
+            self.rate_limiter = RateLimiter(calls_per_minute)
+
+        self.session = Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'coalesced': 0}
+        self.stats_lock = Lock()
+
+        self.in_flight = dict()
+        self.in_flight_async = dict()
+        self.in_flight_lock = Lock()
+
+    def __getstate__(self) -> Dict:
+        # Sessions, locks and in flight requests belong to the process which created them so a copy
+        # is rebuilt from the configuration, each copy applies the rate limit on its own
+        calls_per_minute = None
+        if self.rate_limiter is not None:
+            calls_per_minute = self.rate_limiter.get_calls_per_minute()
+
+        return {'calls_per_minute': calls_per_minute, 'max_retries': self.max_retries,
+                'backoff_base': self.backoff_base, 'backoff_max': self.backoff_max, 'pool_size': self.pool_size,
+                'timeout': self.timeout, 'base_url': self.base_url}
+
+    def __setstate__(self, state: Dict):
+        self.__init__(**state)
+
+    def get(self, url: str) -> bytes:
+
+        with self.in_flight_lock:
+            future = self.in_flight.get(url)
+            coalesced = future is not None
+            if not coalesced:
+                future = Future()
+                self.in_flight[url] = future
+
+        if coalesced:
+            self._count('coalesced')
+            return future.result()
+
+        try:
+            content = self._get(url)
+            future.set_result(content)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.in_flight_lock:
+                del self.in_flight[url]
+
+        return content
+
+    async def get_async(self, session, url: str) -> bytes:
+
+        key = (id(get_running_loop()), url)
+        future = self.in_flight_async.get(key)
+
+        if future is not None:
+            self._count('coalesced')
+            return await future
+
+        future = get_running_loop().create_future()
+        self.in_flight_async[key] = future
+
+        try:
+            content = await self._get_async(session, url)
+            future.set_result(content)
+        except CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case no other caller is waiting
+            future.exception()
+            raise
+        finally:
+            del self.in_flight_async[key]
+
+        return content
+
+    def _get(self, url: str) -> bytes:
+        return self._check_response(url, *self._get_response(url))
+
+    async def _get_async(self, session, url: str) -> bytes:
+        return self._check_response(url, *(await self._get_response_async(session, url)))
+
+    @staticmethod
+    def _check_response(url: str, status: int, content: bytes) -> bytes:
+        if not 200 <= status < 300:
+            raise TransportError(status, url)
+        return content
+
+    def _get_response(self, url: str) -> Tuple[int, bytes]:
+        """
+        Status and content of the final response once retries are done
+        """
+
+        attempt = 0
+        while True:
+
+            self._throttle(self.rate_limiter.acquire() if self.rate_limiter is not None else 0.0)
+
+            response = self.session.get(url, timeout=self.timeout)
+            self._count('requests')
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                return response.status_code, response.content
+
+            self._count('retries')
+            sleep(self.get_backoff(attempt, response.headers.get('Retry-After')))
+            attempt += 1
+
+    async def _get_response_async(self, session, url: str) -> Tuple[int, bytes]:
+
+        attempt = 0
+        while True:
+
+            self._throttle(await self.rate_limiter.acquire_async() if self.rate_limiter is not None else 0.0)
+
+            async with session.get(url) as response:
+                self._count('requests')
+
+                if response.status not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response.status, await response.read()
+
+                retry_after = response.headers.get('Retry-After')
+
+            self._count('retries')
+            await async_sleep(self.get_backoff(attempt, retry_after))
+            attempt += 1
+
+    def get_backoff(self, attempt: int, retry_after: str = None) -> float:
+        """
+        Full jitter exponential backoff, a Retry-After header given
+        in seconds is used as a lower bound
+        """
+
+        backoff = uniform(0.0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+        if retry_after is not None:
+            try:
+                backoff = max(backoff, min(self.backoff_max, float(retry_after)))
+            except ValueError:
+                pass
+
+        return backoff
+
+    def get_base_url(self) -> str:
+        return self.base_url
+
+    def get_rate_limiter(self) -> RateLimiter:
+        return self.rate_limiter
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.stats_lock:
+            return dict(self.stats)
+
+    def reset_stats(self):
+        with self.stats_lock:
+            for stat_name in self.stats:
+                self.stats[stat_name] = 0
+
+    def _count(self, stat_name: str):
+        with self.stats_lock:
+            self.stats[stat_name] += 1
+
+    def _throttle(self, wait: float):
+        if wait > 0.0:
+            self._count('throttled')
+
+
+class RecordReplayTransport(WeatherTransport):
+    """
+    Transport which records responses to a directory and replays them
+    without network access. Recordings are keyed by the API path and
+    query without the API key, so responses recorded from the live API
+    replay against any base URL. In replay mode a request without a
+    recording fails, in record mode every request is fetched and saved
+    and in auto mode only requests without a recording are fetched.
+    """
+
+    MODES = ('replay', 'record', 'auto')
+
+    def __init__(self, path: str, mode: str = 'replay', **kwargs):
+        assert mode in RecordReplayTransport.MODES, 'Mode %s must be one of %s' % (mode,
+                                                                                 str(RecordReplayTransport.MODES))
+        super().__init__(**kwargs)
+
+        self.path = path
+        self.mode = mode
+        os.makedirs(path, exist_ok=True)
+
+    def __getstate__(self) -> Dict:
+        state = super().__getstate__()
+        state.update({'path': self.path, 'mode': self.mode})
+        return state
+
+    def get_mode(self) -> str:
+        return self.mode
+
+    def get_recording_key(self, url: str) -> str:
+        parsed_url = urlparse(url)
+        query = sorted((name, value) for name, value in parse_qsl(parsed_url.query) if name != 'appid')
+        return '%s?%s' % (parsed_url.path, urlencode(query))
+
+    def _get(self, url: str) -> bytes:
+
+        content = self._load_recording(url)
+        if content is None:
+            status, content = self._get_response(url)
+            self._store_recording(url, status, content)
+            content = self._check_response(url, status, content)
+
+        return content
+
+    async def _get_async(self, session, url: str) -> bytes:
+
+        content = self._load_recording(url)
+        if content is None:
+            status, content = await self._get_response_async(session, url)
+            self._store_recording(url, status, content)
+            content = self._check_response(url, status, content)
+
+        return content
+
+    def _get_recording_path(self, url: str) -> str:
+        return os.path.join(self.path, sha1(self.get_recording_key(url).encode()).hexdigest() + '.json')
+
+    def _load_recording(self, url: str) -> bytes:
+
+        recording_path = self._get_recording_path(url)
+
+        if self.mode != 'record' and os.path.exists(recording_path):
+            with open(recording_path, 'rb') as recording_file:
+                return recording_file.read()
+
+        assert self.mode != 'replay', 'No recorded response for %s' % self.get_recording_key(url)
+        return None
+
+    def _store_recording(self, url: str, status: int, content: bytes):
+
+        # Errors and rate limited responses are raised to the caller but never replayed
+        if not 200 <= status < 300:
+            return
+
+        # Recordings are written to a temporary file first so concurrent readers never see a partial file
+        recording_path = self._get_recording_path(url)
+        temporary_path = '%s.%d.%d.tmp' % (recording_path, os.getpid(), get_ident())
+        with open(temporary_path, 'wb') as recording_file:
+            recording_file.write(content)
+        os.replace(temporary_path, recording_path)
+
+
+_default_transport = None
+_default_transport_lock = Lock()
+
+
+def get_default_transport() -> WeatherTransport:
+    """
+    Transport shared by all feeds which are not configured with one
+    """
+
+    global _default_transport
+
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = WeatherTransport()
+
+    return _default_transport
@@ -7,7 +7,8 @@ config = {
     'url': 'https://github.com/rosspalmer/IdealSpot',
     'license': 'MIT',
     'version': '0.1.0',
-    'install_requires': ['pandas'],
+    'install_requires': ['numpy', 'pandas', 'requests'],
+    'extras_require': {'async': ['aiohttp'], 'json': ['orjson'], 'parquet': ['pyarrow']},
     'packages': find_packages(),
     'scripts': [],
     'name': 'ideal_spot'